@@ -0,0 +1,29 @@
+#!/usr/bin/env bash
+# Inicia vários processos do Streamlit atrás do nginx (deploy/nginx.conf), todos usando o
+# mesmo cache em SQLite, para que as sessões não disputem um único núcleo.
+#
+# Uso: deploy/iniciar_workers.sh [número de processos] [porta inicial]
+set -euo pipefail
+
+WORKERS="${1:-${STREAMLIT_WORKERS:-4}}"
+PORTA_INICIAL="${2:-${STREAMLIT_PORTA_INICIAL:-8501}}"
+
+cd "$(dirname "$0")/.."
+
+# O arquivo do cache fica, por padrão, numa pasta privada do usuário (ver CACHE_SQLITE_CAMINHO no README)
+export CACHE_BACKEND=sqlite
+
+pids=()
+trap 'kill "${pids[@]}" 2>/dev/null' EXIT INT TERM
+
+for ((i = 0; i < WORKERS; i++)); do
+    porta=$((PORTA_INICIAL + i))
+    streamlit run main.py \
+        --server.port "$porta" \
+        --server.address 127.0.0.1 \
+        --server.headless true &
+    pids+=("$!")
+    echo "Processo $i na porta $porta (pid $!)"
+done
+
+wait
@@ -0,0 +1 @@
+# Código compartilhado entre as páginas do relatório de diagnóstico.
@@ -0,0 +1,132 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from diagnostico.cache import cache_compartilhado
+from diagnostico.consultas import DEPENDENCIAS, PAGINAS
+from diagnostico.dados import assinaturas_tabelas, materializar
+from diagnostico.mudancas import afetado, assinatura_dataset
+
+logger = logging.getLogger(__name__)
+
+INTERVALO_PADRAO = int(os.getenv('AQUECIMENTO_INTERVALO', '900'))  # segundos
+# Intervalo entre as verificações de mudança nas tabelas de origem; a cada AQUECIMENTO_INTERVALO
+# todos os datasets são refeitos, mudando ou não
+INTERVALO_DETECCAO = int(os.getenv('DETECCAO_INTERVALO', '60'))  # segundos
+MAX_CONSULTAS_PARALELAS = int(os.getenv('AQUECIMENTO_PARALELISMO', '4'))
+
+_lock = threading.Lock()
+_thread = None
+_parar = threading.Event()
+
+
+def datasets_das_paginas(paginas=None):
+    nomes = []
+    for pagina in paginas or PAGINAS:
+        for nome in PAGINAS[pagina]:
+            if nome not in nomes:
+                nomes.append(nome)
+    return nomes
+
+
+def _materializar_em_paralelo(nomes, versao, chaves):
+    # Grava os datasets no snapshot `versao` e acrescenta as chaves novas em `chaves`; quem falhar
+    # fica com a entrada do snapshot anterior, se houver. Devolve os que falharam.
+    with ThreadPoolExecutor(max_workers=MAX_CONSULTAS_PARALELAS) as executor:
+        futuros = {executor.submit(materializar, nome, versao, chaves): nome for nome in nomes}
+        novas, falhas = {}, []
+        for futuro in as_completed(futuros):
+            try:
+                novas[futuros[futuro]] = futuro.result()
+            except Exception as e:
+                logger.warning("Erro ao aquecer o dataset %s: %s", futuros[futuro], e)
+                falhas.append(futuros[futuro])
+    chaves.update(novas)
+    return falhas
+
+
+def aquecer(paginas=None, completo=True):
+    """Materializa os datasets das páginas num snapshot novo e o publica de uma vez.
+
+    Primeiro os datasets lidos do banco, depois os derivados, calculados com as bases do
+    mesmo snapshot. Até a publicação, as páginas continuam lendo o snapshot anterior.
+    Sem `completo`, só são refeitos os datasets cujas tabelas de origem mudaram desde o
+    snapshot anterior (os demais seguem com a mesma entrada); sem mudanças, ou sem as
+    assinaturas das tabelas para comparar, nada é refeito até a próxima rodada completa.
+    """
+    nomes = datasets_das_paginas(paginas)
+    derivados = [nome for nome in nomes if nome in DEPENDENCIAS]
+    bases = [nome for nome in nomes if nome not in DEPENDENCIAS]
+    for nome in derivados:
+        bases += [dep for dep in DEPENDENCIAS[nome] if dep not in bases]
+
+    anterior = cache_compartilhado.snapshot_atual()
+    chaves = dict(anterior.chaves) if anterior is not None else {}
+    anteriores = dict(anterior.assinaturas) if anterior is not None else {}
+    tabelas = assinaturas_tabelas()
+    if not completo and anterior is not None:
+        # Sem as assinaturas, não há como saber o que mudou: espera a rodada completa
+        if tabelas is None:
+            return anterior
+        bases = [nome for nome in bases if nome not in chaves or afetado(nome, anteriores, tabelas)]
+        # Um derivado também é refeito quando alguma base dele é (ex.: nova tentativa de uma base que falhou)
+        derivados = [
+            nome for nome in derivados
+            if nome not in chaves or afetado(nome, anteriores, tabelas) or set(DEPENDENCIAS[nome]) & set(bases)
+        ]
+        if not bases and not derivados:
+            return anterior
+        logger.info("Tabelas de origem alteradas; refazendo %s", bases + derivados)
+
+    versao = cache_compartilhado.nova_versao()
+    falhas = _materializar_em_paralelo(bases, versao, chaves)
+    falhas += _materializar_em_paralelo(derivados, versao, chaves)
+    # Cada dataset refeito guarda a assinatura das suas tabelas; quem falhou fica com a anterior,
+    # para que só ele seja tentado de novo na próxima rodada
+    falhas += [nome for nome in derivados if set(DEPENDENCIAS[nome]) & set(falhas)]
+    assinaturas = dict(anteriores)
+    for nome in bases + derivados:
+        if nome not in falhas:
+            assinaturas[nome] = assinatura_dataset(nome, tabelas)
+    return cache_compartilhado.publicar_snapshot(versao, chaves, assinaturas)
+
+
+def _executar(intervalo):
+    # Com vários processos, só o que tem o lease do aquecimento executa as consultas; se ele parar,
+    # o lease expira e outro processo assume na rodada seguinte. Entre as rodadas completas, a cada
+    # INTERVALO_DETECCAO só os datasets com tabelas alteradas são refeitos.
+    # Uma rodada que falha é registrada no log e a thread segue para a próxima; o lease é liberado na
+    # falha (outro processo pode tentar antes) e quando a thread termina.
+    ultima_completa = None
+    try:
+        while not _parar.is_set():
+            if cache_compartilhado.backend.adquirir('aquecimento', intervalo * 2):
+                completo = ultima_completa is None or time.monotonic() - ultima_completa >= intervalo
+                try:
+                    aquecer(completo=completo)
+                except Exception:
+                    logger.exception("Erro na rodada %s do aquecimento", "completa" if completo else "de detecção")
+                    cache_compartilhado.backend.liberar('aquecimento')
+                else:
+                    if completo:
+                        ultima_completa = time.monotonic()
+            _parar.wait(min(INTERVALO_DETECCAO, intervalo))
+    finally:
+        cache_compartilhado.backend.liberar('aquecimento')
+
+
+def iniciar_aquecimento(intervalo=INTERVALO_PADRAO):
+    # Inicia uma única thread por processo; chamadas seguintes não fazem nada
+    global _thread
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _parar.clear()
+            _thread = threading.Thread(target=_executar, args=(intervalo,), name='aquecimento-cache', daemon=True)
+            _thread.start()
+    return _thread
+
+
+def parar_aquecimento():
+    _parar.set()
@@ -0,0 +1,248 @@
+# Busca por trecho de texto nas colunas de nomes (aluno, escola, turma), sem diferenciar acentos nem
+# maiúsculas. Um índice de trigramas por dataset, versão e coluna evita varrer todas as linhas a
+# cada tecla digitada no filtro.
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_object_dtype
+
+from diagnostico.singleflight import SingleFlight
+
+# Número de índices (dataset, versão, coluna) mantidos em memória
+MAX_INDICES_EM_CACHE = int(os.getenv('BUSCA_INDICES_MAX', '32'))
+# Letras processadas de uma vez na construção do índice de trigramas
+LETRAS_POR_LOTE = 500000
+
+# Colunas de nomes filtradas pela chave normalizada (sem acentos, minúsculas), o que junta grafias
+# diferentes do mesmo nome ("SAO JOSE", "São José")
+COLUNAS_CHAVE = ('nome_escola', 'cidade_escola')
+# Colunas com menos valores distintos que isso são filtradas por lista de valores, e não por texto
+MIN_DISTINTOS_TEXTO = 10
+
+
+def normalizar(texto):
+    # "São Paulo" -> "sao paulo"
+    texto = str(texto)
+    if texto.isascii():
+        return texto.lower()
+    decomposto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).lower()
+
+
+def _aceitos_por_linha(codigos, ids, num_valores):
+    # Máscara das linhas a partir dos valores distintos aceitos; o código -1 (nulo) nunca é aceito
+    aceitos = np.zeros(num_valores + 1, dtype=bool)
+    aceitos[ids] = True
+    return aceitos[codigos]
+
+
+class IndiceTrigramas:
+    """Índice de trigramas sobre os valores distintos de uma coluna de texto.
+
+    Cada trigrama (e cada trecho de 1 ou 2 letras) aponta para os valores distintos que o
+    contêm. Uma busca de até 3 letras é a própria lista; nas mais longas, só os valores da
+    menor lista entre os trigramas do texto digitado são conferidos por inteiro.
+
+    O índice é montado em NumPy, em lotes de valores do mesmo tamanho: cada lote vira uma
+    matriz de letras sem preenchimento, cada trecho vira um número e as listas são fatias de
+    um único vetor ordenado por trecho. A memória temporária fica limitada ao lote.
+    """
+
+    def __init__(self, serie):
+        codigos, valores = pd.factorize(serie)
+        self.codigos = codigos
+        self.num_valores = len(valores)
+        self.normalizados = normalizados = [normalizar(valor) for valor in valores]
+
+        # Letras como inteiros de 1 a len(alfabeto); com alfabetos pequenos os trechos cabem em int32
+        alfabeto = sorted(set(''.join(normalizados)))
+        self._letras = {letra: i + 1 for i, letra in enumerate(alfabeto)}
+        self._base = base = len(alfabeto) + 1
+        tipo = np.int32 if base ** 3 < 2 ** 31 else np.int64
+        self._tabela = np.zeros(ord(alfabeto[-1]) + 1 if alfabeto else 1, dtype=tipo)
+        self._tabela[[ord(letra) for letra in alfabeto]] = np.arange(1, base, dtype=tipo)
+
+        tamanhos = np.fromiter(map(len, normalizados), dtype=np.int64, count=self.num_valores)
+        ordem = np.argsort(tamanhos, kind='stable')
+        tamanhos_ordenados = tamanhos[ordem]
+        partes = []
+        for tamanho in np.unique(tamanhos_ordenados[tamanhos_ordenados > 0]).tolist():
+            primeiro, ultimo = np.searchsorted(tamanhos_ordenados, [tamanho, tamanho + 1])
+            lote = max(LETRAS_POR_LOTE // tamanho, 1)
+            for inicio in range(primeiro, ultimo, lote):
+                partes.append(self._trechos(ordem[inicio:min(inicio + lote, ultimo)], tamanho))
+
+        # Cada par é trecho * num_valores + valor; os lotes são copiados (e soltos) um a um num vetor só,
+        # ordenado no lugar, o que deixa as listas de cada trecho contíguas
+        pares = np.empty(sum(len(parte) for parte in partes), dtype=np.int64)
+        fim = 0
+        while partes:
+            parte = partes.pop()
+            pares[fim:fim + len(parte)] = parte
+            fim += len(parte)
+        pares.sort()
+        chaves = np.empty(len(pares), dtype=tipo)
+        self._donos = np.empty(len(pares), dtype=np.int32)
+        for inicio in range(0, len(pares), LETRAS_POR_LOTE):
+            fatia = slice(inicio, inicio + LETRAS_POR_LOTE)
+            chaves[fatia], self._donos[fatia] = np.divmod(pares[fatia], max(self.num_valores, 1))
+        del pares
+        inicios = np.flatnonzero(np.r_[True, chaves[1:] != chaves[:-1]]) if len(chaves) else np.array([], dtype=int)
+        self._chaves = chaves[inicios]
+        self._inicios = np.r_[inicios, len(chaves)]
+
+    def _trechos(self, ids, tamanho):
+        # Pares (trecho, valor) distintos dos valores `ids`, todos com `tamanho` letras; um trecho é um
+        # número na base do alfabeto, e o par vai num só inteiro
+        texto = ''.join(self.normalizados[i] for i in ids.tolist())
+        pontos = np.frombuffer(texto.encode('utf-32-le'), dtype=np.uint32).reshape(len(ids), tamanho)
+        letras = self._tabela[pontos]
+        base = self._base
+        uma = letras * base ** 2
+        duas = uma[:, :-1] + letras[:, 1:] * base
+        tres = duas[:, :-1] + letras[:, 2:]
+        locais = np.arange(len(ids), dtype=np.int64)
+        chaves = np.concatenate([uma.ravel(), duas.ravel(), tres.ravel()]).astype(np.int64)
+        locais = np.concatenate([np.repeat(locais, trechos.shape[1]) for trechos in (uma, duas, tres)])
+        # Tira as repetições de um trecho no mesmo valor
+        chaves, locais = np.divmod(np.unique(chaves * len(ids) + locais), len(ids))
+        return chaves * max(self.num_valores, 1) + ids[locais]
+
+    def _lista(self, trecho):
+        # Ids dos valores que contêm `trecho` (1 a 3 letras)
+        chave = 0
+        for posicao in range(3):
+            letra = self._letras.get(trecho[posicao]) if posicao < len(trecho) else 0
+            if letra is None:
+                return self._donos[:0]
+            chave = chave * self._base + letra
+        i = np.searchsorted(self._chaves, chave)
+        if i == len(self._chaves) or self._chaves[i] != chave:
+            return self._donos[:0]
+        return self._donos[self._inicios[i]:self._inicios[i + 1]]
+
+    def valores_com(self, texto):
+        # Ids dos valores distintos que contêm `texto` (já normalizado)
+        if not texto:
+            return np.arange(self.num_valores)
+        if len(texto) <= 3:
+            return self._lista(texto)
+        menor = None
+        for i in range(len(texto) - 2):
+            lista = self._lista(texto[i:i + 3])
+            if menor is None or len(lista) < len(menor):
+                menor = lista
+            if not len(menor):
+                break
+        normalizados = self.normalizados
+        return [i for i in menor.tolist() if texto in normalizados[i]]
+
+    def buscar(self, texto):
+        return _aceitos_por_linha(self.codigos, self.valores_com(normalizar(texto)), self.num_valores)
+
+
+class IndiceChaves:
+    """Chaves normalizadas (sem acentos, minúsculas) de uma coluna de nomes, como escola ou cidade.
+
+    As chaves ficam ordenadas e codificadas como dicionário (um código por linha); as linhas
+    ficam agrupadas por chave numa permutação, então as linhas de uma chave, ou de todas as
+    chaves com um prefixo, são uma única fatia: a busca custa o número de linhas encontradas.
+    """
+
+    def __init__(self, serie):
+        codigos, valores = pd.factorize(serie)
+        normalizados = np.array([normalizar(valor) for valor in valores], dtype=object)
+        self.chaves, mapa = np.unique(normalizados, return_inverse=True)
+        # Rótulo de exibição de cada chave, em ordem de chave: a primeira grafia encontrada
+        primeiros = np.unique(mapa, return_index=True)[1]
+        self.rotulos = dict(zip(self.chaves.tolist(), np.asarray(valores)[primeiros].tolist()))
+
+        # Código da chave de cada linha (-1 para nulos) e as linhas agrupadas por chave
+        self.codigos = np.append(mapa, -1)[codigos]
+        ordem = np.argsort(self.codigos, kind='stable')
+        self._ordem = ordem[np.count_nonzero(self.codigos < 0):]
+        self._inicios = np.searchsorted(self.codigos[self._ordem], np.arange(len(self.chaves) + 1))
+
+    def _fatia(self, primeira, ultima):
+        return self._ordem[self._inicios[primeira]:self._inicios[ultima]]
+
+    def linhas(self, chaves):
+        # Posições das linhas com alguma das `chaves` (já normalizadas)
+        posicoes = np.searchsorted(self.chaves, chaves)
+        fatias = [
+            self._fatia(i, i + 1) for i, chave in zip(posicoes.tolist(), chaves)
+            if i < len(self.chaves) and self.chaves[i] == chave
+        ]
+        return np.concatenate(fatias) if fatias else self._ordem[:0]
+
+    def linhas_com_prefixo(self, texto):
+        prefixo = normalizar(texto)
+        primeira = np.searchsorted(self.chaves, prefixo)
+        ultima = np.searchsorted(self.chaves, prefixo + '\U0010ffff')
+        return self._fatia(primeira, ultima)
+
+    def posicoes(self, chaves):
+        # Mesmas linhas de `linhas`, em ordem crescente: o custo é o número de linhas encontradas
+        return np.sort(self.linhas(chaves))
+
+
+def contem(serie, texto):
+    # Mesma busca sem índice (para DataFrames fora do cache): confere só os valores distintos
+    codigos, valores = pd.factorize(serie)
+    texto = normalizar(texto)
+    ids = [i for i, valor in enumerate(valores) if texto in normalizar(valor)]
+    return _aceitos_por_linha(codigos, ids, len(valores))
+
+
+# ------------------------- CACHE DOS ÍNDICES ----------------------------
+_indices = OrderedDict()
+_lock_indices = threading.Lock()
+_construcoes = SingleFlight()
+
+
+def _memorizar(chave, construir):
+    # chave: (tipo, dataset, versão, coluna)
+    with _lock_indices:
+        if chave in _indices:
+            _indices.move_to_end(chave)
+            return _indices[chave]
+    # Sessões que pedem o mesmo índice ao mesmo tempo esperam uma única construção
+    indice = _construcoes.executar(chave, construir)
+    tipo, nome, versao, coluna = chave
+    with _lock_indices:
+        # Os índices de versões mais antigas da mesma coluna saem primeiro
+        for antiga in [c for c in _indices if (c[0], c[1], c[3]) == (tipo, nome, coluna) and c[2] < versao]:
+            del _indices[antiga]
+        _indices[chave] = indice
+        while len(_indices) > MAX_INDICES_EM_CACHE:
+            _indices.popitem(last=False)
+    return indice
+
+
+def indice_texto(chave, serie):
+    """Índice de trigramas de `serie` para a chave (dataset, versão, coluna), construído uma vez por versão."""
+    return _memorizar(('texto', *chave), lambda: IndiceTrigramas(serie))
+
+
+def colunas_de_texto(df, estatisticas):
+    # Colunas que a barra lateral filtra por trecho de texto (ver filtros.widgets_filtros)
+    return [
+        coluna for coluna in df.columns
+        if coluna not in COLUNAS_CHAVE and is_object_dtype(df[coluna])
+        and estatisticas[coluna].cardinalidade >= MIN_DISTINTOS_TEXTO
+    ]
+
+
+def preparar_indices_texto(nome, versao, df, estatisticas):
+    """Constrói os índices de texto da versão `versao` do dataset, para que a primeira busca não espere."""
+    for coluna in colunas_de_texto(df, estatisticas):
+        indice_texto((nome, versao, coluna), df[coluna])
+
+
+def indice_chaves(chave, serie):
+    """Chaves normalizadas de `serie` para a chave (dataset, versão, coluna), construídas uma vez por versão."""
+    return _memorizar(('chaves', *chave), lambda: IndiceChaves(serie))
@@ -0,0 +1,442 @@
+import itertools
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from diagnostico.singleflight import SingleFlight
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+TTL_PADRAO = int(os.getenv('CACHE_TTL', '600'))  # segundos
+# Cache só do processo (memoria) ou compartilhado entre os processos da máquina (sqlite)
+BACKEND_PADRAO = os.getenv('CACHE_BACKEND', 'memoria')
+# O arquivo guarda objetos serializados com pickle: fica numa pasta privada do usuário (ver _pasta_privada)
+CAMINHO_SQLITE = os.getenv('CACHE_SQLITE_CAMINHO', os.path.join(
+    os.getenv('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')), 'diagnostico', 'cache.sqlite3',
+))
+# Tempo máximo que um processo segura a atualização de um dataset antes que outro possa assumir
+LEASE_TTL = int(os.getenv('CACHE_LEASE_TTL', '900'))  # segundos
+INTERVALO_ESPERA = 0.5  # segundos entre as verificações de quem espera outro processo atualizar
+
+_versoes = itertools.count(1)
+
+
+@dataclass(frozen=True)
+class Entrada:
+    dados: pd.DataFrame
+    atualizado_em: datetime
+    versao: int = field(default_factory=lambda: next(_versoes))
+    # Relógio de parede, e não monotônico, para que a idade valha entre processos
+    criado_em: float = field(default_factory=time.time)
+
+    def expirada(self, ttl):
+        return time.time() - self.criado_em > ttl
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    # Datasets materializados numa mesma rodada de atualização: dataset -> chave da entrada no backend
+    versao: int
+    criado_em: datetime
+    chaves: dict
+    # Assinatura das tabelas de origem de cada dataset quando foi materializado: dataset -> assinatura
+    assinaturas: dict = field(default_factory=dict)
+
+    def para_json(self):
+        return json.dumps({
+            'versao': self.versao, 'criado_em': self.criado_em.isoformat(), 'chaves': self.chaves,
+            'assinaturas': self.assinaturas,
+        })
+
+    @classmethod
+    def de_json(cls, valor):
+        dados = json.loads(valor)
+        return cls(
+            dados['versao'], datetime.fromisoformat(dados['criado_em']), dados['chaves'], dados.get('assinaturas', {}),
+        )
+
+
+def chave_no_snapshot(nome, versao):
+    return f'{nome}@{versao}'
+
+
+# ------------------------- BACKENDS ------------------------------------
+def _pasta_privada(caminho):
+    """Cria (com permissão 0700) ou confere a pasta do arquivo `caminho` e o próprio arquivo.
+
+    Quem consegue gravar no arquivo do cache executa código no dashboard (pickle), então a
+    pasta e o arquivo precisam ser deste usuário, sem acesso de grupo nem de outros.
+    """
+    pasta = os.path.dirname(os.path.abspath(caminho))
+    os.makedirs(pasta, mode=0o700, exist_ok=True)
+    _conferir_privado(pasta)
+    if not os.path.exists(caminho):
+        os.close(os.open(caminho, os.O_CREAT | os.O_WRONLY, 0o600))
+    _conferir_privado(caminho)
+
+
+def _conferir_privado(alvo):
+    if not hasattr(os, 'getuid'):
+        return
+    info = os.stat(alvo)
+    if info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(
+            f"{alvo} precisa ser do usuário atual e sem acesso de grupo e outros (chmod 700 na pasta, "
+            f"600 no arquivo) para guardar o cache; ajuste as permissões ou mude CACHE_SQLITE_CAMINHO."
+        )
+
+
+class BackendMemoria:
+    # Entradas num dicionário do processo; sem concorrência entre processos, o lease é sempre concedido
+
+    def __init__(self):
+        self._entradas = {}
+        self._ponteiros = {}
+        self._lock = threading.Lock()
+
+    def ler(self, chave):
+        return self._entradas.get(chave)
+
+    def chaves(self):
+        return list(self._entradas)
+
+    def versoes(self):
+        # {chave: versão} de todas as entradas, sem ler os dados
+        return {chave: entrada.versao for chave, entrada in list(self._entradas.items())}
+
+    def gravar(self, chave, dados):
+        entrada = Entrada(dados, datetime.now())
+        with self._lock:
+            self._entradas[chave] = entrada
+        return entrada
+
+    def remover(self, chaves):
+        with self._lock:
+            for chave in chaves:
+                self._entradas.pop(chave, None)
+
+    def esquecer(self, manter):
+        pass
+
+    def nova_versao(self):
+        return next(_versoes)
+
+    def ler_ponteiro(self, nome):
+        return self._ponteiros.get(nome)
+
+    def trocar_ponteiro(self, nome, valor):
+        self._ponteiros[nome] = valor
+
+    def adquirir(self, nome, ttl):
+        return True
+
+    def liberar(self, nome):
+        pass
+
+
+class BackendSQLite:
+    """Entradas num arquivo SQLite compartilhado pelos processos da mesma máquina.
+
+    Os DataFrames são gravados serializados com pickle; cada processo guarda a última
+    versão que leu de cada chave e só desserializa de novo quando a versão no arquivo muda.
+    Os leases garantem que só um processo por vez executa a atualização de um dataset.
+    Os ponteiros (ex.: o snapshot atual) são trocados com um único comando, atômico no SQLite.
+    Uma entrada grande demais para um BLOB do SQLite fica só na memória deste processo; os
+    demais não a encontram e consultam o dataset por conta própria.
+    """
+
+    def __init__(self, caminho=CAMINHO_SQLITE):
+        _pasta_privada(caminho)
+        self.caminho = caminho
+        self.dono = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        self._local = threading.local()
+        self._lidas = {}
+        # Entradas que não couberam no arquivo
+        self._locais = {}
+        with self._conexao() as conexao:
+            conexao.execute('PRAGMA journal_mode=WAL')
+            conexao.execute(
+                'CREATE TABLE IF NOT EXISTS entradas ('
+                'chave TEXT PRIMARY KEY, versao INTEGER NOT NULL, atualizado_em TEXT NOT NULL, '
+                'criado_em REAL NOT NULL, dados BLOB NOT NULL)'
+            )
+            conexao.execute('CREATE TABLE IF NOT EXISTS versoes (versao INTEGER PRIMARY KEY AUTOINCREMENT)')
+            conexao.execute(
+                'CREATE TABLE IF NOT EXISTS leases (nome TEXT PRIMARY KEY, dono TEXT NOT NULL, expira_em REAL NOT NULL)'
+            )
+            conexao.execute('CREATE TABLE IF NOT EXISTS ponteiros (nome TEXT PRIMARY KEY, valor TEXT NOT NULL)')
+
+    def _conexao(self):
+        # Uma conexão por thread; o sqlite3 não deixa compartilhar conexões entre threads
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+            self._local.conexao = conexao
+        return conexao
+
+    def ler(self, chave):
+        if chave in self._locais:
+            return self._locais[chave]
+        conexao = self._conexao()
+        linha = conexao.execute('SELECT versao FROM entradas WHERE chave = ?', (chave,)).fetchone()
+        if linha is None:
+            return None
+        entrada = self._lidas.get(chave)
+        if entrada is not None and entrada.versao == linha[0]:
+            return entrada
+        linha = conexao.execute(
+            'SELECT versao, atualizado_em, criado_em, dados FROM entradas WHERE chave = ?', (chave,),
+        ).fetchone()
+        versao, atualizado_em, criado_em, dados = linha
+        entrada = Entrada(pickle.loads(dados), datetime.fromisoformat(atualizado_em), versao, criado_em)
+        self._lidas[chave] = entrada
+        return entrada
+
+    def gravar(self, chave, dados):
+        conexao = self._conexao()
+        blob = pickle.dumps(dados, protocol=pickle.HIGHEST_PROTOCOL)
+        versao = conexao.execute('INSERT INTO versoes DEFAULT VALUES').lastrowid
+        entrada = Entrada(dados, datetime.now(), versao)
+        try:
+            conexao.execute(
+                'INSERT OR REPLACE INTO entradas (chave, versao, atualizado_em, criado_em, dados) VALUES (?, ?, ?, ?, ?)',
+                (chave, versao, entrada.atualizado_em.isoformat(), entrada.criado_em, blob),
+            )
+        except (sqlite3.DataError, OverflowError) as e:
+            # Acima do limite de BLOB do SQLite (~1 GB): a entrada fica só na memória deste processo
+            logger.warning("Entrada %s grande demais para o cache em SQLite (%d bytes), mantida só em memória: %s",
+                           chave, len(blob), e)
+            conexao.execute('DELETE FROM entradas WHERE chave = ?', (chave,))
+            self._lidas.pop(chave, None)
+            self._locais[chave] = entrada
+            return entrada
+        self._locais.pop(chave, None)
+        self._lidas[chave] = entrada
+        return entrada
+
+    def chaves(self):
+        return [linha[0] for linha in self._conexao().execute('SELECT chave FROM entradas')] + list(self._locais)
+
+    def versoes(self):
+        versoes = dict(self._conexao().execute('SELECT chave, versao FROM entradas').fetchall())
+        versoes.update({chave: entrada.versao for chave, entrada in list(self._locais.items())})
+        return versoes
+
+    def remover(self, chaves):
+        conexao = self._conexao()
+        for chave in chaves:
+            conexao.execute('DELETE FROM entradas WHERE chave = ?', (chave,))
+            self._lidas.pop(chave, None)
+            self._locais.pop(chave, None)
+
+    def esquecer(self, manter):
+        # Solta as cópias desserializadas dos snapshots que este processo não vai mais ler
+        for chave in [chave for chave in self._lidas if '@' in chave and chave not in manter]:
+            self._lidas.pop(chave, None)
+
+    def nova_versao(self):
+        return self._conexao().execute('INSERT INTO versoes DEFAULT VALUES').lastrowid
+
+    def ler_ponteiro(self, nome):
+        linha = self._conexao().execute('SELECT valor FROM ponteiros WHERE nome = ?', (nome,)).fetchone()
+        return linha[0] if linha is not None else None
+
+    def trocar_ponteiro(self, nome, valor):
+        self._conexao().execute('INSERT OR REPLACE INTO ponteiros (nome, valor) VALUES (?, ?)', (nome, valor))
+
+    def adquirir(self, nome, ttl):
+        # Concede o lease se ninguém o tem, se o anterior expirou ou se já é deste processo
+        conexao = self._conexao()
+        agora = time.time()
+        conexao.execute('BEGIN IMMEDIATE')
+        try:
+            linha = conexao.execute('SELECT dono, expira_em FROM leases WHERE nome = ?', (nome,)).fetchone()
+            if linha is not None and linha[0] != self.dono and linha[1] > agora:
+                return False
+            conexao.execute(
+                'INSERT OR REPLACE INTO leases (nome, dono, expira_em) VALUES (?, ?, ?)', (nome, self.dono, agora + ttl),
+            )
+            return True
+        finally:
+            conexao.execute('COMMIT')
+
+    def liberar(self, nome):
+        self._conexao().execute('DELETE FROM leases WHERE nome = ? AND dono = ?', (nome, self.dono))
+
+
+def criar_backend(nome=BACKEND_PADRAO):
+    if nome == 'sqlite':
+        return BackendSQLite()
+    if nome == 'memoria':
+        return BackendMemoria()
+    raise ValueError(f"Backend de cache inválido: {nome}")
+
+
+# ------------------------- CACHE ---------------------------------------
+class CacheCompartilhado:
+    """Cache de datasets compartilhado por todas as sessões do processo.
+
+    Cada entrada é substituída inteira (troca atômica de referência), então uma
+    sessão nunca enxerga um dataset pela metade enquanto ele é atualizado.
+    Entradas expiradas continuam sendo servidas enquanto uma única atualização
+    roda em segundo plano (stale-while-revalidate). Com um backend compartilhado,
+    a atualização também é única entre os processos: quem não tem o lease espera
+    a versão nova gravada pelo processo que tem.
+
+    Além das entradas por dataset, o cache guarda snapshots: todos os datasets de uma rodada
+    de atualização, gravados com a versão do snapshot na chave e publicados juntos pela troca
+    de um único ponteiro. Quem lê um snapshot vê todos os datasets da mesma rodada.
+    """
+
+    def __init__(self, ttl=TTL_PADRAO, backend=None):
+        self.ttl = ttl
+        self.backend = backend or BackendMemoria()
+        self._atualizacoes = SingleFlight()
+        self._snapshot = (None, None)
+
+    def entrada(self, chave):
+        return self.backend.ler(chave)
+
+    def substituir(self, chave, dados):
+        return self.backend.gravar(chave, dados)
+
+    def _carregar(self, chave, carregador):
+        anterior = self.backend.ler(chave)
+        lease = f'dataset:{chave}'
+        while True:
+            if self.backend.adquirir(lease, LEASE_TTL):
+                try:
+                    # Outro processo pode ter gravado uma versão nova antes de liberar o lease
+                    atual = self.backend.ler(chave)
+                    if atual is not None and anterior is not None and atual.versao != anterior.versao:
+                        return atual
+                    return self.substituir(chave, carregador())
+                finally:
+                    self.backend.liberar(lease)
+            # Outro processo está atualizando: espera a versão nova (ou o lease ficar livre)
+            time.sleep(INTERVALO_ESPERA)
+            atual = self.backend.ler(chave)
+            if atual is not None and (anterior is None or atual.versao != anterior.versao):
+                return atual
+
+    def atualizar(self, chave, carregador):
+        # Se outra thread já está atualizando a chave, espera por ela em vez de repetir a consulta
+        return self._atualizacoes.executar(chave, lambda: self._carregar(chave, carregador))
+
+    def atualizar_em_segundo_plano(self, chave, carregador):
+        if self._atualizacoes.em_andamento(chave):
+            return
+        threading.Thread(
+            target=self._atualizar_sem_erro, args=(chave, carregador),
+            name=f'atualizacao-{chave}', daemon=True,
+        ).start()
+
+    def _atualizar_sem_erro(self, chave, carregador):
+        try:
+            self.atualizar(chave, carregador)
+        except Exception as e:
+            logger.warning("Erro ao atualizar o dataset %s: %s", chave, e)
+
+    def obter_entrada(self, chave, carregador):
+        entrada = self.backend.ler(chave)
+        if entrada is not None:
+            if entrada.expirada(self.ttl):
+                self.atualizar_em_segundo_plano(chave, carregador)
+            return entrada
+        # Sem nada para servir: a sessão espera a consulta (a sua ou a que já está em andamento)
+        return self.atualizar(chave, carregador)
+
+    def metricas(self):
+        return self._atualizacoes.metricas()
+
+    # ------------------------- SNAPSHOTS -------------------------------
+    def snapshot_atual(self):
+        valor = self.backend.ler_ponteiro('snapshot')
+        if valor is None:
+            return None
+        lido, snapshot = self._snapshot
+        if valor != lido:
+            anterior, snapshot = snapshot, Snapshot.de_json(valor)
+            self._snapshot = (valor, snapshot)
+            # Outro processo pode ter publicado: as cópias locais de snapshots mais antigos saem da memória
+            self.backend.esquecer(set(snapshot.chaves.values()) | set(anterior.chaves.values() if anterior else ()))
+        return snapshot
+
+    def nova_versao(self):
+        return self.backend.nova_versao()
+
+    def materializar(self, nome, versao, dados):
+        # Grava o dataset na chave do snapshot `versao`, que ninguém lê antes da publicação
+        chave = chave_no_snapshot(nome, versao)
+        return chave, self.substituir(chave, dados)
+
+    def publicar_snapshot(self, versao, chaves, assinaturas=None):
+        """Torna o snapshot `versao` ({dataset: chave}) o atual, trocando só o ponteiro.
+
+        O snapshot anterior continua legível para as páginas que ainda o estão usando; as
+        entradas de snapshots mais antigos que ele são removidas.
+        """
+        anterior = self.snapshot_atual()
+        snapshot = Snapshot(versao, datetime.now(), dict(chaves), dict(assinaturas or {}))
+        self.backend.trocar_ponteiro('snapshot', snapshot.para_json())
+        manter = set(snapshot.chaves.values()) | set(anterior.chaves.values() if anterior else ())
+        self.backend.remover([chave for chave in self.backend.chaves() if '@' in chave and chave not in manter])
+        return snapshot
+
+    def versoes_vivas(self, nome):
+        """Versões das entradas do dataset `nome` que ainda podem ser lidas.
+
+        São as do snapshot atual e do anterior (as mais antigas já foram removidas na
+        publicação), a de um snapshot ainda sendo materializado e a entrada por dataset.
+        """
+        prefixo = chave_no_snapshot(nome, '')
+        return {versao for chave, versao in self.backend.versoes().items() if chave == nome or chave.startswith(prefixo)}
+
+    def obter(self, chave, carregador):
+        # Cópia para que as páginas possam alterar o DataFrame sem afetar o cache
+        return self.obter_entrada(chave, carregador).dados.copy()
+
+
+class MemoriaPorVersao:
+    """Valores derivados de datasets do cache (estatísticas, índices), um por versão.
+
+    A chave é o nome do dataset ou uma tupla que começa por ele. Fica guardado o valor de cada
+    versão ainda viva do dataset (a do snapshot atual e a do anterior, que sessões fixadas nele
+    continuam lendo); as demais saem quando um valor novo é guardado. Sessões que pedem o mesmo
+    valor ao mesmo tempo esperam um único cálculo.
+    """
+
+    def __init__(self, cache=None):
+        self._cache = cache
+        self._valores = {}
+        self._lock = threading.Lock()
+        self._calculos = SingleFlight()
+
+    def obter(self, chave, versao, calcular):
+        with self._lock:
+            por_versao = self._valores.get(chave, {})
+            if versao in por_versao:
+                return por_versao[versao]
+        valor = self._calculos.executar((chave, versao), calcular)
+        nome = chave[0] if isinstance(chave, tuple) else chave
+        vivas = (self._cache or cache_compartilhado).versoes_vivas(nome) | {versao}
+        with self._lock:
+            por_versao = {v: valor_v for v, valor_v in self._valores.get(chave, {}).items() if v in vivas}
+            por_versao[versao] = valor
+            self._valores[chave] = por_versao
+        return valor
+
+
+cache_compartilhado = CacheCompartilhado(backend=criar_backend())
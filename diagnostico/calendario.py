@@ -0,0 +1,68 @@
+# Dimensão de calendário das séries mensais: as sondagens são agrupadas por (ano, mês) inteiros, que
+# ordenam corretamente, e os nomes dos meses só entram na hora de exibir.
+import numpy as np
+import pandas as pd
+
+MESES = [
+    'Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
+    'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro',
+]
+
+# Mês 0: sondagem sem mês informado
+SEM_MES = 'Sem mês'
+
+
+def nome_mes(mes):
+    mes = int(mes)
+    return MESES[mes - 1] if 1 <= mes <= 12 else SEM_MES
+
+
+def numero_mes(valores):
+    # Mês como inteiro (Int8), venha do driver como número, texto ou Decimal; o que não é mês vira nulo
+    meses = pd.to_numeric(pd.Series(valores, dtype=object), errors='coerce')
+    return meses.where((meses % 1 == 0) & meses.between(0, 12)).astype('Int8')
+
+
+def periodos(anos, meses):
+    # Chave inteira do mês (ex.: 202403 para março de 2024), na mesma ordem do calendário
+    return np.asarray(anos, dtype=np.int32) * 100 + np.asarray(meses, dtype=np.int32)
+
+
+def dimensao_calendario(chaves):
+    """Uma linha por período de `chaves` (ano * 100 + mês), em ordem, com os rótulos de exibição."""
+    chaves = np.unique(np.asarray(chaves, dtype=np.int32))
+    anos, meses = np.divmod(chaves, 100)
+    nomes = [nome_mes(mes) for mes in meses.tolist()]
+    return pd.DataFrame({
+        'periodo': chaves,
+        'ano': anos.astype(np.int16),
+        'mes': meses.astype(np.int8),
+        'nome_mes': nomes,
+        'rotulo': [f"{nome[:3]}/{ano}" for nome, ano in zip(nomes, anos.tolist())],
+    })
+
+
+def serie_mensal(df, coluna_ano='ano_sondagem', coluna_mes='mes_sondagem', **agregacoes):
+    """Agrega `df` por (ano, mês) com os mesmos argumentos nomeados de `DataFrame.agg`.
+
+    O resultado vem em ordem de calendário, com as colunas da dimensão (periodo, ano, mes,
+    nome_mes, rotulo) seguidas das agregações.
+    """
+    agrupado = df.groupby([coluna_ano, coluna_mes], sort=True).agg(**agregacoes).reset_index()
+    agrupado.insert(0, 'periodo', periodos(agrupado[coluna_ano], agrupado[coluna_mes]))
+    agrupado = agrupado.drop(columns=[coluna_ano, coluna_mes])
+    return dimensao_calendario(agrupado['periodo']).merge(agrupado, on='periodo')
+
+
+def comparacao_anual(serie, coluna):
+    """`coluna` de uma `serie_mensal` com um mês por linha e um ano por coluna (ano contra ano).
+
+    Inclui a variação percentual do último ano em relação ao anterior, quando houver dois anos.
+    """
+    tabela = serie.pivot_table(index='mes', columns='ano', values=coluna, aggfunc='sum').sort_index()
+    tabela.index = [nome_mes(mes) for mes in tabela.index]
+    tabela.columns = [str(ano) for ano in tabela.columns]
+    if tabela.shape[1] >= 2:
+        anterior, atual = tabela.columns[-2], tabela.columns[-1]
+        tabela['variacao_%'] = ((tabela[atual] / tabela[anterior].replace(0, np.nan) - 1) * 100).round(2)
+    return tabela
@@ -0,0 +1,141 @@
+import logging
+import os
+import threading
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+
+from diagnostico.consultas import TEMPO_MAXIMO_MS
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ------------------------- CONEXÃO COM O BANCO DE DADOS -----------------
+# Perfil principal: o mesmo banco usado pela ferramenta dos professores.
+# Perfil analítico: réplica de leitura usada pelas consultas do relatório, com pool
+# e tempo máximo de execução próprios, para que o relatório não pese no banco principal.
+TEMPO_MAXIMO_PADRAO_MS = int(os.getenv('DB_ANALITICO_TEMPO_MAXIMO_MS', '60000'))
+FALLBACK_PRINCIPAL = os.getenv('DB_FALLBACK_PRINCIPAL', '0') == '1'
+
+_lock = threading.Lock()
+_engines = {}
+
+
+def _connection_string(prefixo):
+    # O perfil analítico herda usuário, senha e banco do principal quando não informados
+    user = os.getenv(f'{prefixo}_USER', os.getenv('DB_USER'))
+    password = os.getenv(f'{prefixo}_PASSWORD', os.getenv('DB_PASSWORD'))
+    host = os.getenv(f'{prefixo}_HOST')
+    database = os.getenv(f'{prefixo}_NAME', os.getenv('DB_NAME'))
+    return f'mysql+pymysql://{user}:{password}@{host}/{database}'
+
+
+def _criar_engine_principal():
+    return create_engine(_connection_string('DB'), pool_pre_ping=True)
+
+
+# Folga do socket sobre o maior tempo máximo, para que o hint ou o KILL QUERY encerrem a consulta antes
+MARGEM_LEITURA_S = 30
+
+
+def _criar_engine_analitico():
+    tempo_maximo_ms = TEMPO_MAXIMO_PADRAO_MS
+    # O socket precisa esperar a consulta mais longa (as pesadas têm limites próprios em TEMPO_MAXIMO_MS)
+    maior_tempo_ms = max([tempo_maximo_ms, *TEMPO_MAXIMO_MS.values()])
+    return create_engine(
+        _connection_string('DB_ANALITICO'),
+        pool_size=int(os.getenv('DB_ANALITICO_POOL_SIZE', '5')),
+        max_overflow=int(os.getenv('DB_ANALITICO_MAX_OVERFLOW', '5')),
+        pool_recycle=3600,
+        pool_pre_ping=True,
+        pool_timeout=int(os.getenv('DB_ANALITICO_POOL_TIMEOUT', '10')),
+        connect_args={
+            # Tempo máximo de qualquer SELECT da sessão, mesmo sem o hint na consulta
+            'init_command': f'SET SESSION max_execution_time = {tempo_maximo_ms}',
+            'read_timeout': maior_tempo_ms // 1000 + MARGEM_LEITURA_S,
+        },
+    )
+
+
+def _engine(perfil, criar):
+    # Um único engine (e pool de conexões) por perfil e por processo, compartilhado por todas as sessões
+    with _lock:
+        if perfil not in _engines:
+            _engines[perfil] = criar()
+        return _engines[perfil]
+
+
+def engine_principal():
+    return _engine('principal', _criar_engine_principal)
+
+
+def engine_analitico():
+    if not os.getenv('DB_ANALITICO_HOST'):
+        return None
+    return _engine('analitico', _criar_engine_analitico)
+
+
+def conectar_leitura():
+    # Conexão para as consultas do relatório. Sem réplica configurada, lê do principal como antes;
+    # com réplica, só recorre ao principal quando ela estiver fora e DB_FALLBACK_PRINCIPAL=1.
+    engine = engine_analitico()
+    if engine is None:
+        return engine_principal().connect()
+    try:
+        return engine.connect()
+    except OperationalError as e:
+        if not FALLBACK_PRINCIPAL:
+            raise
+        logger.warning("Réplica analítica indisponível, usando o banco principal: %s", e)
+        return engine_principal().connect()
+
+
+def cancelar_consulta(engine, id_conexao):
+    # KILL QUERY precisa de outra conexão: a original está ocupada com a consulta
+    with engine.connect() as conexao:
+        conexao.exec_driver_sql(f'KILL QUERY {int(id_conexao)}')
+
+
+def _posicao_select_principal(query):
+    # Posição logo após o SELECT de nível mais alto (fora das CTEs e subconsultas),
+    # ignorando comentários e strings
+    profundidade = 0
+    i = 0
+    n = len(query)
+    while i < n:
+        c = query[i]
+        if query.startswith('--', i) or c == '#':
+            fim = query.find('\n', i)
+            i = n if fim == -1 else fim
+        elif query.startswith('/*', i):
+            fim = query.find('*/', i + 2)
+            i = n if fim == -1 else fim + 2
+        elif c in ("'", '"', '`'):
+            fim = query.find(c, i + 1)
+            i = n if fim == -1 else fim + 1
+        elif c == '(':
+            profundidade += 1
+            i += 1
+        elif c == ')':
+            profundidade -= 1
+            i += 1
+        elif (
+            profundidade == 0
+            and query[i:i + 6].upper() == 'SELECT'
+            and (i == 0 or not (query[i - 1].isalnum() or query[i - 1] == '_'))
+            and (i + 6 == n or not (query[i + 6].isalnum() or query[i + 6] == '_'))
+        ):
+            return i + 6
+        else:
+            i += 1
+    return None
+
+
+def com_tempo_maximo(query, tempo_maximo_ms):
+    # Adiciona o hint MAX_EXECUTION_TIME ao SELECT principal da consulta
+    posicao = _posicao_select_principal(query)
+    if posicao is None or tempo_maximo_ms is None:
+        return query
+    return f'{query[:posicao]} /*+ MAX_EXECUTION_TIME({int(tempo_maximo_ms)}) */{query[posicao:]}'
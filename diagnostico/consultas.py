@@ -0,0 +1,751 @@
+# Consultas SQL usadas pelo relatório, compartilhadas entre as páginas, o aquecimento do cache e o relatório.
+
+# ------------------------- MAIN.PY -------------------------------------
+
+logins_query = '''SELECT distinct
+    t.id as id_professor,
+    t.auth_id as id_nova_escola,
+    t.confirmed as confirmado,
+    t.active as ativo,
+    t.created_at as data_criacao,
+    t.updated_at as data_atualizacao,
+    t.onboarding_completed as onboarding_completo
+FROM teacher t
+WHERE t.auth_id NOT IN ('3','6','18','64','1466346', '1581795','5844577','5273215', '6317922', '5844577','175689','1980922','2051263','2241909','2347872','2607842','2988478','3457137','3693288','3693431','3912304','4681737','4813648','5106338','5326020','5331581','5722986','5726715','5740041','6132779', '6183405', '6361801','6447188','6470829','6491287')'''
+
+total_onboardings_query = "SELECT COUNT(t.auth_id) AS total_onboardings FROM teacher t WHERE t.onboarding_completed = 1 AND t.auth_id NOT IN ('3','6','18','64','1466346', '1581795','5844577', '6317922', '5844577','175689','1980922','2051263','2241909','2347872','2607842','2988478','3457137','3693288','3693431','3912304','4681737','4813648','5106338','5326020','5331581','5722986','5726715','5740041','6132779', '6183405', '6361801','6447188','6470829','6491287');"
+
+total_alunos_query = "SELECT COUNT(distinct s.id) AS total_students FROM student s WHERE s.active = 1;"
+
+total_sondagens_query = "SELECT COUNT(distinct da.id) AS total_diagnosis FROM diagnostic_assessment da;"
+
+total_turmas_query = "SELECT COUNT(distinct cl.id) AS total_classes FROM class cl;"
+
+alunos_por_turma_query = """SELECT
+    t.id AS id_professor,
+    c.id AS id_turma,
+    c.name AS nome_turma,
+    c.year AS ano_turma,
+    s.id AS id_aluno,
+    s.name AS nome_aluno,
+    sc.cod_inep AS cod_inep,
+    sc.name AS nome_escola,
+    sc.municipio AS cidade_escola,
+    sc.uf AS estado_escola,
+    da.id AS id_avaliacao,
+    da.month AS mes_avaliacao,
+    dh.id AS hipotese,
+    dh.name AS nome_hipotese,
+    MAX(das.comment) AS comentario,
+    MAX(da.created_at) AS data_criacao_avaliacao
+FROM
+    teacher t
+INNER JOIN
+    diagnostic_assessment da ON t.id = da.teacher_id
+INNER JOIN
+    class c ON c.id = da.class_id
+INNER JOIN
+    student s ON s.class_id = c.id
+INNER JOIN
+    diagnostic_assessment_students das ON das.student_id = s.id
+INNER JOIN
+    diagnostic_assessment_type_hypothesis dh ON dh.id = das.hypothesis_id
+INNER JOIN
+    school sc ON sc.cod_inep = c.cod_inep
+GROUP BY
+    t.id, c.id, c.name, c.year, s.id, s.name, sc.cod_inep, sc.name, sc.municipio, sc.uf, da.id, da.month, dh.id, dh.name
+ORDER BY
+    data_criacao_avaliacao DESC;"""
+
+evolucao_alunos_query = '''SELECT
+    das.student_id AS id_aluno,
+    s.name AS nome_aluno,
+    MIN(dh.ordering) AS ordem_inicial,
+    MAX(dh.ordering) AS ordem_final,
+    MIN(dh.name) AS estado_inicial,
+    MAX(dh.name) AS estado_final,
+    MIN(das.created_at) AS data_inicial,
+    MAX(das.created_at) AS data_final
+FROM
+    diagnostic_assessment_students das
+INNER JOIN
+    student s ON das.student_id = s.id
+INNER JOIN
+    diagnostic_assessment_type_hypothesis dh ON das.hypothesis_id = dh.id
+GROUP BY
+    das.student_id, s.name
+HAVING
+    MIN(dh.ordering) <> MAX(dh.ordering)  -- Verifica se houve evolução
+ORDER BY
+    nome_aluno;'''
+
+contagem_evolucao_query = '''SELECT
+    COUNT(*) AS total_students_with_evolution
+FROM (
+    SELECT
+        das.student_id
+    FROM
+        diagnostic_assessment_students das
+    INNER JOIN
+        diagnostic_assessment_type_hypothesis dh ON das.hypothesis_id = dh.id
+    GROUP BY
+        das.student_id
+    HAVING
+        MIN(dh.ordering) <> MAX(dh.ordering)
+        AND COUNT(DISTINCT das.created_at) > 1 
+) AS evolved_students;'''
+
+contagem_distinta_evolucao_query = '''SELECT
+    COUNT(DISTINCT das.student_id) AS total_alunos_distintos_com_evolucao
+FROM
+    diagnostic_assessment_students das
+INNER JOIN
+    student s ON das.student_id = s.id
+INNER JOIN
+    diagnostic_assessment_type_hypothesis dh ON das.hypothesis_id = dh.id
+GROUP BY
+    das.student_id
+HAVING
+    MIN(dh.ordering) <> MAX(dh.ordering);'''
+
+professores_mais_de_uma_turma_query = '''SELECT
+    COUNT(DISTINCT t.id) AS total_teachers_with_multiple_classes
+FROM
+    teacher t
+INNER JOIN
+    class c ON t.id = c.teacher_id
+GROUP BY
+    t.id
+HAVING
+    COUNT(c.id) > 1;'''
+
+turmas_mais_de_uma_sondagem_query = '''SELECT
+    COUNT(DISTINCT da.class_id) AS total_classes_with_multiple_assessments
+FROM
+    diagnostic_assessment da
+GROUP BY
+    da.class_id
+HAVING
+    COUNT(da.id) > 1;
+'''
+
+rank_hipoteses_query = '''WITH ranked_hypotheses AS (
+    SELECT
+        das.student_id,
+        s.name AS nome_aluno,
+        s.class_id,
+        c.name AS nome_turma,
+        c.year AS ano_turma,
+        sc.cod_inep AS cod_inep,
+        sc.name AS nome_escola,
+        sc.municipio AS cidade_escola,
+        sc.uf AS estado_escola,
+        dh.name AS nome_hipotese,
+        da.created_at,
+        ROW_NUMBER() OVER(PARTITION BY das.student_id ORDER BY da.created_at ASC) AS rn
+    FROM
+        diagnostic_assessment_students das
+    INNER JOIN
+        diagnostic_assessment da ON das.diagnostic_assessment_id = da.id
+    INNER JOIN
+        diagnostic_assessment_type_hypothesis dh ON das.hypothesis_id = dh.id
+    INNER JOIN
+        student s ON das.student_id = s.id
+    INNER JOIN
+        class c ON s.class_id = c.id
+    INNER JOIN
+        school sc ON c.cod_inep = sc.cod_inep
+)
+SELECT
+    rh.student_id,
+    rh.nome_aluno,
+    rh.nome_turma,
+    rh.ano_turma,
+    rh.cod_inep,
+    rh.nome_escola,
+    rh.cidade_escola,
+    rh.estado_escola,
+    rh.nome_hipotese,
+    rh.created_at,
+    rh.rn
+FROM
+    ranked_hypotheses rh
+ORDER BY
+    rh.student_id, rh.rn;
+'''
+
+alunos_com_evolucao_query = '''WITH alunos_totais AS (
+    SELECT 
+        c.id AS turma_id,
+        c.name AS nome_turma,
+        t.id AS professor_id,  -- Incluir o ID do professor
+        COUNT(DISTINCT s.id) AS total_alunos
+    FROM 
+        class c
+    INNER JOIN 
+        student s ON s.class_id = c.id
+    INNER JOIN
+        teacher t ON t.id = c.teacher_id  -- Associação entre professor e turma
+    GROUP BY 
+        c.id, c.name, t.id
+),
+alunos_melhoria AS (
+    SELECT 
+        s.id AS aluno_id,
+        c.id AS turma_id,
+        t.id AS professor_id,  -- Incluir o ID do professor
+        MIN(dh.ordering) AS min_ordering,
+        MAX(dh.ordering) AS max_ordering
+    FROM 
+        diagnostic_assessment_students das
+    INNER JOIN 
+        student s ON das.student_id = s.id
+    INNER JOIN 
+        class c ON s.class_id = c.id
+    INNER JOIN
+        teacher t ON t.id = c.teacher_id  -- Associação entre professor e turma
+    INNER JOIN 
+        diagnostic_assessment_type_hypothesis dh ON das.hypothesis_id = dh.id
+    GROUP BY 
+        s.id, c.id, t.id
+),
+alunos_com_melhoria AS (
+    SELECT 
+        turma_id,
+        professor_id,
+        COUNT(aluno_id) AS alunos_com_melhoria
+    FROM 
+        alunos_melhoria
+    WHERE 
+        min_ordering < max_ordering  -- Filtra alunos que melhoraram de nível
+    GROUP BY 
+        turma_id, professor_id
+)
+SELECT 
+    t.turma_id,
+    t.nome_turma,
+    t.professor_id,  -- Incluir o ID do professor
+    t.total_alunos,
+    COALESCE(m.alunos_com_melhoria, 0) AS alunos_com_melhoria,
+    ROUND((COALESCE(m.alunos_com_melhoria, 0) / t.total_alunos) * 100, 2) AS porcentagem_melhoria
+FROM 
+    alunos_totais t
+LEFT JOIN 
+    alunos_com_melhoria m ON t.turma_id = m.turma_id
+WHERE 
+    COALESCE(m.alunos_com_melhoria, 0) > 0;'''
+
+
+# ------------------------- (0) ONBOARDING ------------------------------
+
+respostas_onboarding_query = '''WITH respostas_por_professor AS (
+    SELECT 
+        t.id AS id_professor,
+        t.auth_id AS id_nova_escola,
+        COUNT(a.id) AS num_respostas
+    FROM 
+        questionnaire_answer a
+    JOIN 
+        questionnaire_response qr ON a.response_id = qr.id
+    JOIN 
+        teacher t ON qr.teacher_id = t.id
+    JOIN 
+        questionnaire_question q ON a.question_id = q.id  
+    JOIN 
+        questionnaire qn ON qr.questionnaire_id = qn.id
+    JOIN 
+        questionnaire_type qt ON qn.type_id = qt.id
+    GROUP BY 
+        t.id
+)
+SELECT 
+    t.id AS id_professor,
+    t.auth_id AS id_nova_escola,
+    q.label AS pergunta,
+    a.value AS resposta,
+    qr.created_at AS data_resposta,
+    CASE 
+        WHEN rp.num_respostas >= 3 THEN 'Respondeu todas'
+        ELSE 'Não respondeu todas'
+    END AS status_resposta
+FROM 
+    questionnaire_answer a
+JOIN 
+    questionnaire_response qr ON a.response_id = qr.id
+JOIN 
+    teacher t ON qr.teacher_id = t.id
+JOIN 
+    questionnaire_question q ON a.question_id = q.id  -- Usar question_id em vez de option_id
+JOIN 
+    questionnaire qn ON qr.questionnaire_id = qn.id
+JOIN 
+    questionnaire_type qt ON qn.type_id = qt.id
+JOIN 
+    respostas_por_professor rp ON t.id = rp.id_professor
+WHERE 
+    qt.name = 'Onboarding' AND
+    t.auth_id NOT IN ('3','6','18','64','1466346', '1581795','5844577','5273215', '6317922', '5844577','175689','1980922','2051263','2241909','2347872','2607842','2988478','3457137','3693288','3693431','3912304','4681737','4813648','5106338','5326020','5331581','5722986','5726715','5740041','6132779', '6183405', '6361801','6447188','6470829','6491287')
+ORDER BY 
+    t.id, qr.created_at;'''
+
+
+# Respostas do onboarding por professor, incrementais (diagnostico/onboarding.py): só os professores com
+# alguma resposta de questionário com id acima da marca (:marca) são lidos de novo.
+marca_respostas_onboarding_query = '''SELECT MAX(qr.id) AS marca FROM questionnaire_response qr'''
+
+respostas_onboarding_incremental_query = '''WITH professores_afetados AS (
+    SELECT DISTINCT
+        qr.teacher_id AS id_professor
+    FROM
+        questionnaire_response qr
+    WHERE
+        qr.id > :marca
+),
+respostas_por_professor AS (
+    SELECT 
+        t.id AS id_professor,
+        COUNT(a.id) AS num_respostas
+    FROM 
+        questionnaire_answer a
+    JOIN 
+        questionnaire_response qr ON a.response_id = qr.id
+    JOIN 
+        teacher t ON qr.teacher_id = t.id
+    JOIN 
+        professores_afetados pa ON pa.id_professor = t.id
+    JOIN 
+        questionnaire_question q ON a.question_id = q.id  
+    JOIN 
+        questionnaire qn ON qr.questionnaire_id = qn.id
+    JOIN 
+        questionnaire_type qt ON qn.type_id = qt.id
+    GROUP BY 
+        t.id
+)
+SELECT 
+    t.id AS id_professor,
+    t.auth_id AS id_nova_escola,
+    q.label AS pergunta,
+    a.value AS resposta,
+    qr.created_at AS data_resposta,
+    CASE 
+        WHEN rp.num_respostas >= 3 THEN 'Respondeu todas'
+        ELSE 'Não respondeu todas'
+    END AS status_resposta
+FROM 
+    questionnaire_answer a
+JOIN 
+    questionnaire_response qr ON a.response_id = qr.id
+JOIN 
+    teacher t ON qr.teacher_id = t.id
+JOIN 
+    questionnaire_question q ON a.question_id = q.id
+JOIN 
+    questionnaire qn ON qr.questionnaire_id = qn.id
+JOIN 
+    questionnaire_type qt ON qn.type_id = qt.id
+JOIN 
+    respostas_por_professor rp ON t.id = rp.id_professor
+WHERE 
+    qt.name = 'Onboarding' AND
+    t.auth_id NOT IN ('3','6','18','64','1466346', '1581795','5844577','5273215', '6317922', '5844577','175689','1980922','2051263','2241909','2347872','2607842','2988478','3457137','3693288','3693431','3912304','4681737','4813648','5106338','5326020','5331581','5722986','5726715','5740041','6132779', '6183405', '6361801','6447188','6470829','6491287')'''
+
+
+# ------------------------- (1) PROFESSORES -----------------------------
+
+professores_query = '''SELECT
+    t.id AS id_professor,
+    t.auth_id AS id_nova_escola,
+    t.created_at AS data_cadastro_professor,
+    CASE 
+        WHEN t.onboarding_completed = 1 THEN 'Onboarding Completo'
+        ELSE 'Onboarding Não Completo'
+    END AS flag_onboarding,
+    CASE 
+        WHEN c.id IS NOT NULL THEN 'Tem Turma'
+        ELSE 'Sem Turma'
+    END AS flag_turma,
+    c.id AS id_turma,
+    c.name AS nome_turma,
+    c.year AS ano_turma,
+    c.created_at AS data_cadastro_turma,
+    s.id AS id_aluno,
+    s.name AS nome_aluno,
+    sc.name AS nome_escola,
+    sc.municipio AS cidade_escola,
+    sc.uf AS estado_escola,
+    s.created_at AS data_cadastro_aluno
+FROM
+    teacher t
+LEFT JOIN
+    class c ON t.id = c.teacher_id  
+LEFT JOIN
+    student s ON s.class_id = c.id  
+LEFT JOIN 
+    school sc ON c.cod_inep = sc.cod_inep
+WHERE t.auth_id NOT IN ('3','6','18','64','1466346', '1581795','5844577','5273215','6317922', '5844577','175689','1980922','2051263','2241909','2347872','2607842','2988478','3457137','3693288','3693431','3912304','4681737','4813648','5106338','5326020','5331581','5722986','5726715','5740041','6132779', '6183405', '6361801','6447188','6470829','6491287')
+ORDER BY
+    t.id, c.id, s.id;'''
+
+
+# ------------------------- (2) TURMAS ----------------------------------
+
+turmas_query = '''SELECT
+    t.id AS id_professor,
+    t.auth_id AS id_nova_escola,
+    t.created_at AS data_cadastro_professor,
+    c.id AS id_turma,
+    c.name AS nome_turma,
+    c.year AS ano_turma,
+    c.created_at AS data_cadastro_turma,
+    s.id AS id_aluno,
+    s.name AS nome_aluno,
+    sc.name AS nome_escola,
+    sc.municipio AS cidade_escola,
+    sc.uf AS estado_escola,
+    s.created_at AS data_cadastro_aluno
+FROM
+    teacher t
+INNER JOIN
+    class c ON t.id = c.teacher_id  
+INNER JOIN
+    student s ON s.class_id = c.id  
+INNER JOIN 
+    school sc ON c.cod_inep = sc.cod_inep
+WHERE t.auth_id NOT IN ('3','6','18','64','1466346', '1581795','5844577','5273215', '6317922', '5844577','175689','1980922','2051263','2241909','2347872','2607842','2988478','3457137','3693288','3693431','3912304','4681737','4813648','5106338','5326020','5331581','5722986','5726715','5740041','6132779', '6183405', '6361801','6447188','6470829','6491287')
+ORDER BY
+    t.id, c.id, s.id;
+'''
+
+
+# ------------------------- COORTES DE PROFESSORES ----------------------
+# Eventos do funil de cada professor; a primeira ocorrência de cada etapa é calculada em
+# pandas por diagnostico/coortes.py. Turma e aluno já vêm com a primeira data; as sondagens
+# vêm todas porque o funil usa também a segunda.
+
+eventos_professores_query = '''SELECT
+    c.teacher_id AS id_professor,
+    'turma' AS evento,
+    MIN(c.created_at) AS data_evento
+FROM
+    class c
+GROUP BY
+    c.teacher_id
+UNION ALL
+SELECT
+    c.teacher_id AS id_professor,
+    'aluno' AS evento,
+    MIN(s.created_at) AS data_evento
+FROM
+    student s
+INNER JOIN
+    class c ON s.class_id = c.id
+GROUP BY
+    c.teacher_id
+UNION ALL
+SELECT
+    da.teacher_id AS id_professor,
+    'sondagem' AS evento,
+    da.created_at AS data_evento
+FROM
+    diagnostic_assessment da'''
+
+
+# ------------------------- (3) E (5) TURMAS COM MELHORIA ---------------
+# Uma única leitura das sondagens (aluno, turma, professor, mês, hipótese); as variantes das
+# páginas (3) e (5) são calculadas em pandas por diagnostico/melhoria.py.
+
+fatos_sondagem_query = '''SELECT
+    das.student_id AS id_aluno,
+    s.class_id AS id_turma,
+    c.teacher_id AS id_professor,
+    das.diagnostic_assessment_id AS id_avaliacao,
+    da.month AS mes_sondagem,
+    da.created_at AS data_sondagem,
+    dh.ordering AS ordem_hipotese
+FROM
+    diagnostic_assessment_students das
+INNER JOIN
+    student s ON das.student_id = s.id
+INNER JOIN
+    class c ON s.class_id = c.id
+INNER JOIN
+    teacher t ON t.id = c.teacher_id
+INNER JOIN
+    diagnostic_assessment_type_hypothesis dh ON das.hypothesis_id = dh.id
+INNER JOIN
+    diagnostic_assessment da ON das.diagnostic_assessment_id = da.id
+WHERE t.auth_id NOT IN ('3','6','18','64','1466346', '1581795','5844577','5273215', '6317922', '5844577','175689','1980922','2051263','2241909','2347872','2607842','2988478','3457137','3693288','3693431','3912304','4681737','4813648','5106338','5326020','5331581','5722986','5726715','5740041','6132779', '6183405', '6361801','6447188','6470829','6491287')'''
+
+turmas_dimensao_query = '''SELECT
+    c.id AS id_turma,
+    c.name AS nome_turma,
+    c.year AS ano_turma,
+    c.teacher_id AS id_professor,
+    c.cod_inep AS cod_inep_turma,
+    sc.cod_inep AS cod_inep,
+    sc.name AS nome_escola,
+    sc.municipio AS cidade_escola,
+    sc.uf AS estado_escola,
+    COUNT(DISTINCT s.id) AS total_alunos
+FROM
+    class c
+INNER JOIN
+    teacher t ON t.id = c.teacher_id
+INNER JOIN
+    student s ON s.class_id = c.id
+LEFT JOIN
+    school sc ON c.cod_inep = sc.cod_inep
+WHERE t.auth_id NOT IN ('3','6','18','64','1466346', '1581795','5844577','5273215', '6317922', '5844577','175689','1980922','2051263','2241909','2347872','2607842','2988478','3457137','3693288','3693431','3912304','4681737','4813648','5106338','5326020','5331581','5722986','5726715','5740041','6132779', '6183405', '6361801','6447188','6470829','6491287')
+GROUP BY
+    c.id, c.name, c.year, c.teacher_id, c.cod_inep, sc.cod_inep, sc.name, sc.municipio, sc.uf'''
+
+
+# ------------------------- (4) HIPÓTESES -------------------------------
+
+hipoteses_query = """
+WITH alunos_totais AS (
+    SELECT 
+        c.id AS turma_id,
+        c.name AS nome_turma,
+        t.id AS professor_id,
+        COUNT(DISTINCT s.id) AS total_alunos
+    FROM 
+        class c
+    INNER JOIN 
+        student s ON s.class_id = c.id
+    INNER JOIN
+        teacher t ON t.id = c.teacher_id
+    GROUP BY 
+        c.id, c.name, t.id
+),
+contagem_sondagens AS (
+    SELECT 
+        c.id AS turma_id,
+        COUNT(DISTINCT da.id) AS sondagens_realizadas
+    FROM 
+        diagnostic_assessment da
+    INNER JOIN 
+        class c ON da.class_id = c.id
+    INNER JOIN 
+        teacher t ON da.teacher_id = t.id
+    GROUP BY 
+        c.id
+),
+alunos_detalhes AS (
+    SELECT 
+        s.id AS aluno_id,
+        s.name AS nome_aluno,
+        c.id AS turma_id,
+        c.name AS nome_turma,
+        c.year AS ano_turma,
+        t.id AS professor_id,
+        sc.name AS nome_escola,
+        sc.municipio AS cidade_escola,
+        sc.uf AS estado_escola,
+        s.created_at AS data_cadastro_aluno,
+        t.onboarding_completed
+    FROM 
+        student s
+    INNER JOIN 
+        class c ON s.class_id = c.id
+    INNER JOIN 
+        teacher t ON t.id = c.teacher_id
+    LEFT JOIN 
+        school sc ON c.cod_inep = sc.cod_inep
+),
+ranked_hypotheses AS (
+    SELECT
+        das.student_id,
+        s.name AS nome_aluno,
+        s.class_id AS id_turma,
+        t.id AS id_professor,
+        t.auth_id AS id_nova_escola,
+        c.name AS nome_turma,
+        c.year AS ano_turma,
+        sc.cod_inep AS cod_inep,
+        sc.name AS nome_escola,
+        sc.municipio AS cidade_escola,
+        sc.uf AS estado_escola,
+        dh.name AS nome_hipotese,
+        dh.ordering AS ordem_hipotese,
+        da.month AS mes_de_aplicacao,
+        da.created_at,
+        da.updated_at,
+        ROW_NUMBER() OVER(PARTITION BY das.student_id ORDER BY da.created_at ASC) AS num_sondagem
+    FROM
+        diagnostic_assessment_students das
+    INNER JOIN
+        diagnostic_assessment da ON das.diagnostic_assessment_id = da.id
+    INNER JOIN
+        diagnostic_assessment_type_hypothesis dh ON das.hypothesis_id = dh.id
+    INNER JOIN
+        student s ON das.student_id = s.id
+    INNER JOIN
+        class c ON s.class_id = c.id
+    INNER JOIN
+        teacher t ON t.id = c.teacher_id  
+    INNER JOIN
+        school sc ON c.cod_inep = sc.cod_inep
+    WHERE t.auth_id NOT IN ('3','6','18','64','1466346', '1581795','175689','1980922','2051263','2241909','2347872','2607842','2988478','3457137','3693288','3693431','3912304','4681737','4813648','5106338','5326020','5331581','5722986','5726715','5740041','5844577','6132779', '6183405', '6361801','6447188','6470829','6491287')
+)
+SELECT 
+    ad.turma_id AS id_turma,
+    ad.nome_turma AS nome_turma,
+    ad.ano_turma,
+    ad.professor_id AS id_professor,
+    ad.nome_escola,
+    ad.cidade_escola,
+    ad.estado_escola,
+    ad.aluno_id AS id_aluno,
+    ad.nome_aluno,
+    ad.data_cadastro_aluno,
+    CASE 
+        WHEN ad.onboarding_completed = 1 THEN 'Onboarding Completo'
+        ELSE 'Onboarding Não Completo'
+    END AS flag_onboarding,
+    CASE 
+        WHEN ad.turma_id IS NOT NULL THEN 'Tem Turma'
+        ELSE 'Sem Turma'
+    END AS flag_turma,
+    COALESCE(cs.sondagens_realizadas, 0) AS flag_sondagens,  -- Número de sondagens realizadas (0 se nenhuma)
+    rh.nome_hipotese,
+    rh.ordem_hipotese,
+    rh.mes_de_aplicacao,
+    rh.created_at AS data_criacao_sondagem,
+    rh.updated_at AS data_atualizacao_sondagem,
+    rh.num_sondagem,
+    rh.cod_inep
+FROM 
+    alunos_detalhes ad
+LEFT JOIN 
+    contagem_sondagens cs ON ad.turma_id = cs.turma_id  -- Contagem de sondagens por turma
+LEFT JOIN 
+    ranked_hypotheses rh ON ad.aluno_id = rh.student_id  -- Dados de sondagens para cada aluno
+ORDER BY 
+    ad.turma_id, ad.aluno_id, rh.num_sondagem;
+"""
+
+
+# Hipóteses de escrita (níveis das métricas de evolução); a mesma ordem pode aparecer em mais
+# de um tipo de sondagem, e fica um nome por ordem
+niveis_hipoteses_query = '''SELECT
+    dh.ordering AS ordem_hipotese,
+    MIN(dh.name) AS nome_hipotese
+FROM
+    diagnostic_assessment_type_hypothesis dh
+GROUP BY
+    dh.ordering
+ORDER BY
+    dh.ordering'''
+
+
+# ------------------------- DATASETS ------------------------------------
+
+DATASETS = {
+    'logins': logins_query,
+    'total_onboardings': total_onboardings_query,
+    'total_alunos': total_alunos_query,
+    'total_sondagens': total_sondagens_query,
+    'total_turmas': total_turmas_query,
+    'alunos_por_turma': alunos_por_turma_query,
+    'evolucao_alunos': evolucao_alunos_query,
+    'contagem_evolucao': contagem_evolucao_query,
+    'contagem_distinta_evolucao': contagem_distinta_evolucao_query,
+    'professores_mais_de_uma_turma': professores_mais_de_uma_turma_query,
+    'turmas_mais_de_uma_sondagem': turmas_mais_de_uma_sondagem_query,
+    'rank_hipoteses': rank_hipoteses_query,
+    'alunos_com_evolucao': alunos_com_evolucao_query,
+    'respostas_onboarding': respostas_onboarding_query,
+    'professores': professores_query,
+    'turmas': turmas_query,
+    'eventos_professores': eventos_professores_query,
+    'fatos_sondagem': fatos_sondagem_query,
+    'turmas_dimensao': turmas_dimensao_query,
+    'hipoteses': hipoteses_query,
+    'niveis_hipoteses': niveis_hipoteses_query,
+}
+
+# Tempo máximo (ms) das consultas mais pesadas; as demais usam DB_ANALITICO_TEMPO_MAXIMO_MS
+TEMPO_MAXIMO_MS = {
+    'rank_hipoteses': 180000,
+    'alunos_com_evolucao': 180000,
+    'fatos_sondagem': 180000,
+    'hipoteses': 180000,
+}
+
+# Datasets calculados a partir de outros, sem consulta própria ao banco
+DEPENDENCIAS = {
+    'turmas_melhoria': ['fatos_sondagem', 'turmas_dimensao', 'niveis_hipoteses'],
+    'turmas_melhoria_aplicavel': ['fatos_sondagem', 'turmas_dimensao', 'niveis_hipoteses'],
+    'coortes_professores': ['logins', 'eventos_professores'],
+    'rollup_geografico': ['fatos_sondagem', 'turmas_dimensao', 'niveis_hipoteses'],
+    'respostas_onboarding_resumo': ['respostas_onboarding_por_professor'],
+    'professores_onboarding_status': ['respostas_onboarding_por_professor'],
+}
+
+# Datasets lidos por cada página do relatório
+PAGINAS = {
+    'main': [
+        'logins', 'total_onboardings', 'total_alunos', 'total_sondagens', 'total_turmas',
+        'alunos_por_turma', 'evolucao_alunos', 'contagem_evolucao', 'contagem_distinta_evolucao',
+        'professores_mais_de_uma_turma', 'turmas_mais_de_uma_sondagem', 'rank_hipoteses',
+        'alunos_com_evolucao',
+    ],
+    'onboarding': ['respostas_onboarding_resumo', 'professores_onboarding_status', 'coortes_professores'],
+    'professores': ['professores', 'coortes_professores', 'rollup_geografico'],
+    'turmas': ['turmas'],
+    'turmas_com_melhoria': ['turmas_melhoria', 'turmas_melhoria_aplicavel', 'rollup_geografico'],
+    'hipoteses': ['hipoteses', 'niveis_hipoteses'],
+}
+
+
+# ------------------------- TABELAS DE ORIGEM ---------------------------
+
+_SONDAGENS = ['diagnostic_assessment', 'diagnostic_assessment_students', 'diagnostic_assessment_type_hypothesis']
+_QUESTIONARIOS = [
+    'questionnaire', 'questionnaire_answer', 'questionnaire_question', 'questionnaire_response', 'questionnaire_type',
+]
+
+# Tabelas lidas por cada dataset consultado no banco; os derivados herdam as das DEPENDENCIAS.
+# O aquecimento só refaz um dataset quando alguma das suas tabelas muda.
+TABELAS = {
+    'logins': ['teacher'],
+    'total_onboardings': ['teacher'],
+    'total_alunos': ['student'],
+    'total_sondagens': ['diagnostic_assessment'],
+    'total_turmas': ['class'],
+    'alunos_por_turma': ['teacher', 'class', 'student', 'school', *_SONDAGENS],
+    'evolucao_alunos': ['student', 'diagnostic_assessment_students', 'diagnostic_assessment_type_hypothesis'],
+    'contagem_evolucao': ['diagnostic_assessment_students', 'diagnostic_assessment_type_hypothesis'],
+    'contagem_distinta_evolucao': ['student', 'diagnostic_assessment_students', 'diagnostic_assessment_type_hypothesis'],
+    'professores_mais_de_uma_turma': ['teacher', 'class'],
+    'turmas_mais_de_uma_sondagem': ['diagnostic_assessment'],
+    'rank_hipoteses': ['class', 'student', 'school', *_SONDAGENS],
+    'alunos_com_evolucao': [
+        'teacher', 'class', 'student', 'diagnostic_assessment_students', 'diagnostic_assessment_type_hypothesis',
+    ],
+    'respostas_onboarding': ['teacher', *_QUESTIONARIOS],
+    'respostas_onboarding_por_professor': ['teacher', *_QUESTIONARIOS],
+    'professores': ['teacher', 'class', 'student', 'school'],
+    'turmas': ['teacher', 'class', 'student', 'school'],
+    'eventos_professores': ['class', 'student', 'diagnostic_assessment'],
+    'fatos_sondagem': ['teacher', 'class', 'student', *_SONDAGENS],
+    'turmas_dimensao': ['class', 'teacher', 'student', 'school'],
+    'hipoteses': ['teacher', 'class', 'student', 'school', *_SONDAGENS],
+    'niveis_hipoteses': ['diagnostic_assessment_type_hypothesis'],
+}
+
+# Assinatura barata de cada tabela de origem, lida das estatísticas do servidor sem varrer as tabelas:
+# a data da última alteração (inserção, atualização ou remoção) e o próximo id
+assinaturas_tabelas_query = '''SELECT
+    TABLE_NAME AS tabela,
+    UPDATE_TIME AS atualizada_em,
+    AUTO_INCREMENT AS proximo_id
+FROM
+    information_schema.TABLES
+WHERE
+    TABLE_SCHEMA = DATABASE()
+    AND TABLE_NAME IN ({})'''.format(', '.join(
+    f"'{tabela}'" for tabela in sorted({tabela for tabelas in TABELAS.values() for tabela in tabelas})
+))
@@ -0,0 +1,65 @@
+# Coortes de professores por semana de cadastro e o funil de cada coorte: onboarding completo,
+# primeira turma, primeiro aluno, primeira e segunda sondagem.
+import pandas as pd
+
+# Etapas do funil na ordem em que aparecem na grade: (coluna, rótulo)
+ETAPAS = [
+    ('onboarding', 'Onboarding completo'),
+    ('primeira_turma', 'Primeira turma'),
+    ('primeiro_aluno', 'Primeiro aluno'),
+    ('primeira_sondagem', 'Primeira sondagem'),
+    ('segunda_sondagem', 'Segunda sondagem'),
+]
+
+# (evento, ocorrência) que marca cada etapa com data
+_EVENTOS_ETAPAS = {
+    'primeira_turma': ('turma', 0),
+    'primeiro_aluno': ('aluno', 0),
+    'primeira_sondagem': ('sondagem', 0),
+    'segunda_sondagem': ('sondagem', 1),
+}
+
+
+def primeiros_eventos(eventos):
+    # Data da n-ésima ocorrência de cada evento por professor, com uma ordenação e um cumcount
+    eventos = eventos.dropna(subset=['id_professor', 'data_evento'])
+    eventos = eventos.assign(data_evento=pd.to_datetime(eventos['data_evento']))
+    eventos = eventos.sort_values(['id_professor', 'evento', 'data_evento'], kind='stable')
+    ocorrencia = eventos.groupby(['id_professor', 'evento'], sort=False).cumcount().to_numpy()
+
+    datas = {}
+    for etapa, (evento, n) in _EVENTOS_ETAPAS.items():
+        selecao = eventos[(eventos['evento'] == evento).to_numpy() & (ocorrencia == n)]
+        datas[etapa] = selecao.set_index('id_professor')['data_evento']
+    return pd.DataFrame(datas)
+
+
+def funil_professores(professores, eventos):
+    # Uma linha por professor com a semana de cadastro e se (e quando) chegou a cada etapa
+    professores = professores.drop_duplicates('id_professor').set_index('id_professor')
+    funil = primeiros_eventos(eventos).reindex(professores.index)
+    funil.insert(0, 'onboarding', professores['onboarding_completo'].fillna(0).astype(bool))
+    data_cadastro = pd.to_datetime(professores['data_criacao'])
+    funil.insert(0, 'coorte', data_cadastro.dt.to_period('W-SUN').dt.start_time)
+    for etapa in _EVENTOS_ETAPAS:
+        funil[f'dias_ate_{etapa}'] = (funil[etapa] - data_cadastro).dt.days
+    return funil
+
+
+def tabela_coortes(professores, eventos):
+    """Tabela pré-calculada da grade de coortes: uma linha por semana de cadastro.
+
+    Traz o número de professores da coorte, quantos chegaram a cada etapa e a
+    porcentagem correspondente (colunas `pct_<etapa>`).
+    """
+    funil = funil_professores(professores, eventos)
+    atingiu = funil[list(_EVENTOS_ETAPAS)].notna()
+    atingiu['onboarding'] = funil['onboarding']
+    atingiu['coorte'] = funil['coorte']
+
+    tabela = atingiu.groupby('coorte').agg(
+        professores=('coorte', 'size'), **{etapa: (etapa, 'sum') for etapa, _ in ETAPAS},
+    )
+    for etapa, _ in ETAPAS:
+        tabela[f'pct_{etapa}'] = (tabela[etapa] / tabela['professores'] * 100).round(2)
+    return tabela.reset_index()
@@ -0,0 +1,311 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from contextvars import ContextVar, copy_context
+from functools import partial
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+from diagnostico.busca import preparar_indices_texto
+from diagnostico.cache import MemoriaPorVersao, cache_compartilhado
+from diagnostico.conexao import TEMPO_MAXIMO_PADRAO_MS, cancelar_consulta, com_tempo_maximo, conectar_leitura
+from diagnostico.calendario import numero_mes
+from diagnostico.coortes import tabela_coortes
+from diagnostico.consultas import DATASETS, DEPENDENCIAS, TEMPO_MAXIMO_MS, assinaturas_tabelas_query
+from diagnostico.estatisticas import estatisticas
+from diagnostico.evolucao import Niveis, filtrar_transicoes, pares_transicao
+from diagnostico.geografia import rollup_geografico
+from diagnostico.hierarquia import IndiceHierarquia
+from diagnostico.melhoria import VARIANTES, melhoria_por_turma, preparar_fatos
+from diagnostico.onboarding import RespostasOnboarding, resumo_respostas, status_professores
+from diagnostico.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Erros do MySQL para consulta interrompida (KILL QUERY ou MAX_EXECUTION_TIME)
+_ERROS_INTERRUPCAO = (1317, 3024)
+# Conexão perdida durante a consulta (ex.: read_timeout do socket); só conta como tempo esgotado depois do prazo
+_ERRO_CONEXAO_PERDIDA = 2013
+
+# Sessões que disparam a mesma consulta ao mesmo tempo compartilham uma única execução no banco
+consultas_em_andamento = SingleFlight()
+
+CONSULTAS_PARALELAS = int(os.getenv('CONSULTAS_PARALELAS', '8'))
+_executor_consultas = ThreadPoolExecutor(max_workers=CONSULTAS_PARALELAS, thread_name_prefix='consulta')
+# Vagas para consultas em execução, tomadas antes de pegar a conexão do pool
+_vagas_consultas = threading.BoundedSemaphore(CONSULTAS_PARALELAS)
+
+
+class TempoEsgotado(TimeoutError):
+    pass
+
+
+def _executar_leitura(query, tempo_maximo_ms, params=None):
+    query = com_tempo_maximo(query, tempo_maximo_ms)
+    iniciada = threading.Event()
+
+    def ler(conexao):
+        iniciada.set()
+        if params:
+            return pd.read_sql(text(query), conexao, params=params)
+        return pd.read_sql(query, conexao)
+
+    # A espera por uma vaga fica fora da conexão e do tempo máximo, que só conta com a consulta em execução
+    with _vagas_consultas, conectar_leitura() as conexao:
+        id_conexao = conexao.exec_driver_sql('SELECT CONNECTION_ID()').scalar()
+        futuro = _executor_consultas.submit(ler, conexao)
+        iniciada.wait()
+        inicio = time.monotonic()
+        try:
+            return futuro.result(timeout=tempo_maximo_ms / 1000)
+        except FuturesTimeoutError:
+            # Encerra a consulta no servidor para liberar a conexão do pool
+            try:
+                cancelar_consulta(conexao.engine, id_conexao)
+                futuro.result(timeout=30)
+            except Exception:
+                pass
+            if not futuro.done():
+                conexao.invalidate()
+            raise TempoEsgotado(f"A consulta excedeu {tempo_maximo_ms} ms e foi cancelada.")
+        except OperationalError as e:
+            codigo = e.orig.args[0] if e.orig is not None and e.orig.args else None
+            esgotado = time.monotonic() - inicio >= tempo_maximo_ms / 1000
+            if codigo in _ERROS_INTERRUPCAO or (codigo == _ERRO_CONEXAO_PERDIDA and esgotado):
+                raise TempoEsgotado(f"A consulta excedeu {tempo_maximo_ms} ms e foi cancelada.") from e
+            raise
+
+
+def ler_sql(query, tempo_maximo_ms=TEMPO_MAXIMO_PADRAO_MS, params=None):
+    chave = (query, tuple(sorted(params.items()))) if params else query
+    return consultas_em_andamento.executar(chave, lambda: _executar_leitura(query, tempo_maximo_ms, params))
+
+
+def assinaturas_tabelas():
+    """{tabela: assinatura} das tabelas de origem (ver consultas.TABELAS), ou None se não der para ler.
+
+    Uma única consulta ao information_schema, sem varrer as tabelas.
+    """
+    try:
+        with conectar_leitura() as conexao:
+            try:
+                # O MySQL 8 guarda as estatísticas do information_schema em cache por até 24 h
+                conexao.exec_driver_sql('SET SESSION information_schema_stats_expiry = 0')
+            except DBAPIError:
+                conexao.rollback()
+            linhas = conexao.exec_driver_sql(assinaturas_tabelas_query).fetchall()
+    except Exception as e:
+        logger.warning("Erro ao ler as assinaturas das tabelas: %s", e)
+        return None
+    return {tabela: f'{atualizada_em}|{proximo_id}' for tabela, atualizada_em, proximo_id in linhas}
+
+
+def _ler_fatos_sondagem(tempo_maximo_ms):
+    return preparar_fatos(ler_sql(DATASETS['fatos_sondagem'], tempo_maximo_ms))
+
+
+# Cálculo de cada dataset derivado, que recebe os datasets de DEPENDENCIAS[nome] na mesma ordem
+CALCULOS_DERIVADOS = {
+    **{nome: partial(melhoria_por_turma, **parametros) for nome, parametros in VARIANTES.items()},
+    'coortes_professores': tabela_coortes,
+    'rollup_geografico': rollup_geografico,
+    'respostas_onboarding_resumo': resumo_respostas,
+    'professores_onboarding_status': status_professores,
+}
+
+
+def _calcular_derivado(nome, entradas=None):
+    # Usa as entradas do cache sem copiar: os cálculos derivados não alteram os DataFrames de origem.
+    # `entradas` lê as bases de um snapshot; sem ele, das entradas por dataset.
+    entradas = entradas or (lambda dep: cache_compartilhado.obter_entrada(dep, CARREGADORES[dep]))
+    return CALCULOS_DERIVADOS[nome](*[entradas(dep).dados for dep in DEPENDENCIAS[nome]])
+
+
+CARREGADORES = {
+    nome: partial(ler_sql, query, TEMPO_MAXIMO_MS.get(nome, TEMPO_MAXIMO_PADRAO_MS))
+    for nome, query in DATASETS.items()
+}
+CARREGADORES['fatos_sondagem'] = partial(
+    _ler_fatos_sondagem, TEMPO_MAXIMO_MS.get('fatos_sondagem', TEMPO_MAXIMO_PADRAO_MS),
+)
+CARREGADORES.update({nome: partial(_calcular_derivado, nome) for nome in DEPENDENCIAS})
+
+# Respostas do onboarding por professor, mantidas de forma incremental; o resumo e os status são
+# derivados delas (DEPENDENCIAS), então os dois saem da mesma atualização em cada snapshot
+respostas_onboarding = RespostasOnboarding(
+    lambda query, params=None: ler_sql(query, TEMPO_MAXIMO_MS.get('respostas_onboarding', TEMPO_MAXIMO_PADRAO_MS), params)
+)
+CARREGADORES['respostas_onboarding_por_professor'] = respostas_onboarding.atualizar
+
+
+# ------------------------- SNAPSHOTS -----------------------------------
+# Snapshot lido pela execução atual (da página ou do relatório); None: o atual a cada leitura
+_snapshot_fixado = ContextVar('snapshot_fixado', default=None)
+
+
+def fixar_snapshot():
+    """Fixa o snapshot atual para todas as leituras seguintes desta execução.
+
+    As páginas chamam no início de cada execução: uma troca de snapshot no meio da
+    execução não mistura datasets de rodadas diferentes na mesma tela.
+    """
+    snapshot = cache_compartilhado.snapshot_atual()
+    _snapshot_fixado.set(snapshot)
+    return snapshot
+
+
+def _snapshots():
+    # O fixado e, só se ele não tiver o dataset, o atual
+    yield _snapshot_fixado.get()
+    yield cache_compartilhado.snapshot_atual()
+
+
+def entrada_dataset(nome, consultar=True):
+    """Entrada do dataset no snapshot fixado (ou no atual, que passa a ser o fixado, se o
+    fixado já foi descartado).
+
+    Antes do primeiro snapshot, ou para datasets fora dele, usa a entrada por dataset do
+    cache, consultando o banco se preciso; com `consultar=False`, devolve None nesse caso.
+    """
+    fixado = _snapshot_fixado.get()
+    for snapshot in _snapshots():
+        if snapshot is not None and nome in snapshot.chaves:
+            entrada = cache_compartilhado.entrada(snapshot.chaves[nome])
+            if entrada is not None:
+                if fixado is not None and snapshot is not fixado:
+                    _snapshot_fixado.set(snapshot)
+                return entrada
+    if not consultar:
+        return cache_compartilhado.entrada(nome)
+    return cache_compartilhado.obter_entrada(nome, CARREGADORES[nome])
+
+
+def materializar(nome, versao, chaves):
+    """Grava o dataset `nome` no snapshot `versao`, ainda não publicado.
+
+    Datasets derivados são calculados a partir das bases em `chaves` ({dataset: chave}), as do
+    mesmo snapshot. As estatísticas e os índices de busca das colunas da versão nova já ficam
+    calculados para as barras laterais. Devolve a chave da entrada gravada.
+    """
+    if nome in DEPENDENCIAS:
+        dados = _calcular_derivado(nome, lambda dep: cache_compartilhado.entrada(chaves[dep]))
+    else:
+        dados = CARREGADORES[nome]()
+    chave, entrada = cache_compartilhado.materializar(nome, versao, dados)
+    preparar_indices_texto(nome, entrada.versao, entrada.dados, estatisticas(nome, entrada.versao, entrada.dados))
+    return chave
+
+
+def carregar(nome):
+    # Cópia para que as páginas possam alterar o DataFrame sem afetar o cache
+    return entrada_dataset(nome).dados.copy()
+
+
+def carregar_varios(nomes):
+    # Carrega os datasets em paralelo, todos do snapshot fixado; os que estouraram o tempo máximo voltam
+    # como None (a página mostra a seção como indisponível) e os demais erros são propagados
+    resultados = {}
+    with ThreadPoolExecutor(max_workers=len(nomes) or 1) as executor:
+        futuros = {nome: executor.submit(copy_context().run, carregar, nome) for nome in nomes}
+        for nome, futuro in futuros.items():
+            try:
+                resultados[nome] = futuro.result()
+            except TempoEsgotado as e:
+                logger.warning("Tempo esgotado ao carregar o dataset %s: %s", nome, e)
+                resultados[nome] = None
+    return resultados
+
+
+def estatisticas_dataset(nome):
+    # {coluna: EstatisticaColuna} da versão atual do dataset
+    entrada = entrada_dataset(nome)
+    return estatisticas(nome, entrada.versao, entrada.dados)
+
+
+_hierarquias = MemoriaPorVersao()
+_niveis = MemoriaPorVersao()
+
+
+def hierarquia_dataset(nome, df=None):
+    # Mapas pai -> filhos (estado, cidade, escola, turma, professor) da versão atual do dataset ou, com
+    # `df` (um recorte do dataset), só das linhas dele; o recorte com todas as linhas usa o índice guardado
+    entrada = entrada_dataset(nome)
+    if df is not None and len(df) < len(entrada.dados):
+        return IndiceHierarquia(df)
+    return _hierarquias.obter(nome, entrada.versao, lambda: IndiceHierarquia(entrada.dados))
+
+
+def niveis_hipoteses():
+    # Níveis das métricas de evolução (ver evolucao.Niveis) da versão atual do dataset
+    entrada = entrada_dataset('niveis_hipoteses')
+    return _niveis.obter('niveis_hipoteses', entrada.versao, lambda: Niveis.de_tabela(entrada.dados))
+
+
+# ------------------------- TRANSIÇÕES DE HIPÓTESES ---------------------
+FILTROS_TRANSICOES = ('nome_turma', 'nome_escola', 'estado_escola', 'mes_de_aplicacao')
+MAX_TRANSICOES_EM_CACHE = int(os.getenv('TRANSICOES_CACHE_MAX', '256'))
+
+_transicoes = OrderedDict()
+_lock_transicoes = threading.Lock()
+
+
+def _memorizar_transicao(chave, calcular):
+    with _lock_transicoes:
+        if chave in _transicoes:
+            _transicoes.move_to_end(chave)
+            return _transicoes[chave]
+    valor = calcular()
+    with _lock_transicoes:
+        _transicoes[chave] = valor
+        while len(_transicoes) > MAX_TRANSICOES_EM_CACHE:
+            _transicoes.popitem(last=False)
+    return valor
+
+
+def _pares_transicao(df):
+    pares = pares_transicao(df, FILTROS_TRANSICOES)
+    # Mês como inteiro, igual às opções do filtro da página
+    pares['mes_de_aplicacao'] = pd.Categorical(numero_mes(pares['mes_de_aplicacao'].to_numpy()))
+    return pares
+
+
+def transicoes_hipoteses(filtros=None):
+    """Matriz de transições entre hipóteses do dataset 'hipoteses', com filtros opcionais.
+
+    Os pares de sondagens são montados uma vez por versão do dataset e cada combinação de
+    filtros fica em cache; quando o dataset é atualizado a versão muda e as chaves antigas
+    saem do cache por LRU.
+    """
+    entrada = entrada_dataset('hipoteses')
+    niveis = niveis_hipoteses()
+    pares = _memorizar_transicao((entrada.versao, None), lambda: _pares_transicao(entrada.dados))
+    filtros = {col: valores for col, valores in (filtros or {}).items() if valores}
+    chave = (
+        entrada.versao, entrada_dataset('niveis_hipoteses').versao,
+        tuple(sorted((col, tuple(sorted(valores, key=str))) for col, valores in filtros.items())),
+    )
+    return _memorizar_transicao(chave, lambda: filtrar_transicoes(pares, niveis, filtros)).copy()
+
+
+def atualizado_em(*nomes):
+    # Data da atualização mais antiga entre os datasets informados
+    entradas = [entrada_dataset(nome, consultar=False) for nome in nomes]
+    datas = [entrada.atualizado_em for entrada in entradas if entrada is not None]
+    return min(datas) if datas else None
+
+
+def versao_snapshot():
+    snapshot = _snapshot_fixado.get() or cache_compartilhado.snapshot_atual()
+    return snapshot.versao if snapshot is not None else None
+
+
+def metricas():
+    return {
+        'consultas': consultas_em_andamento.metricas(),
+        'datasets': cache_compartilhado.metricas(),
+    }
@@ -0,0 +1,51 @@
+# Estatísticas por coluna de cada dataset (valores distintos, mínimo e máximo, cardinalidade), calculadas
+# uma vez por versão do dataset. Os widgets das barras laterais usam essas estatísticas em vez de varrer
+# o DataFrame a cada rerun.
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype, is_numeric_dtype
+
+from diagnostico.cache import MemoriaPorVersao
+
+# Colunas com mais valores distintos que isso guardam só a cardinalidade, sem a lista de valores
+MAX_VALORES_DISTINTOS = int(os.getenv('ESTATISTICAS_MAX_VALORES', '50000'))
+
+
+@dataclass(frozen=True)
+class EstatisticaColuna:
+    # Valores distintos fora os nulos
+    cardinalidade: int
+    # Valores distintos, na ordem em que aparecem (com o nulo, se houver); None acima de MAX_VALORES_DISTINTOS
+    valores: np.ndarray = None
+    minimo: object = None
+    maximo: object = None
+
+
+def calcular_estatistica(serie):
+    distintos = serie.unique()
+    nulos = pd.isna(distintos)
+    cardinalidade = len(distintos) - int(np.count_nonzero(nulos))
+    minimo = maximo = None
+    if (is_numeric_dtype(serie) or is_datetime64_any_dtype(serie)) and cardinalidade:
+        minimo, maximo = serie.min(), serie.max()
+    valores = distintos if len(distintos) <= MAX_VALORES_DISTINTOS else None
+    return EstatisticaColuna(cardinalidade, valores, minimo, maximo)
+
+
+def calcular_estatisticas(df):
+    return {coluna: calcular_estatistica(df[coluna]) for coluna in df.columns}
+
+
+_estatisticas = MemoriaPorVersao()
+
+
+def estatisticas(nome, versao, df, variante=None):
+    """Estatísticas das colunas de `df`, a versão `versao` do dataset `nome`.
+
+    Ficam guardadas as versões ainda vivas do dataset (ver MemoriaPorVersao). `variante` separa DataFrames
+    derivados do mesmo dataset (ex.: com as colunas já tratadas para os filtros).
+    """
+    return _estatisticas.obter((nome, variante), versao, lambda: calcular_estatisticas(df))
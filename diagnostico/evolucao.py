@@ -0,0 +1,180 @@
+# Métricas de evolução dos alunos entre sondagens, calculadas numa única passada ordenada por
+# (aluno, data da sondagem) sobre arrays NumPy. Usadas pelas páginas de melhoria e de hipóteses.
+#
+# Os níveis (hipóteses de escrita) vêm de diagnostic_assessment_type_hypothesis, pelo dataset
+# 'niveis_hipoteses'; sondagens com uma ordem fora desses níveis ficam de fora das métricas.
+import logging
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Nome da hipótese alfabética em diagnostic_assessment_type_hypothesis
+NOME_ALFABETICA = 'Alfabética'
+
+
+@dataclass(frozen=True)
+class Niveis:
+    # Ordens (dh.ordering) das hipóteses, em ordem crescente, e o nome de cada uma
+    ordens: np.ndarray
+    nomes: list
+    # Ordem da hipótese alfabética (a maior, se nenhuma tiver esse nome)
+    alfabetica: int
+
+    @classmethod
+    def de_tabela(cls, df):
+        # `df`: dataset 'niveis_hipoteses', com as colunas ordem_hipotese e nome_hipotese
+        df = df.dropna(subset=['ordem_hipotese']).drop_duplicates('ordem_hipotese').sort_values('ordem_hipotese')
+        ordens = df['ordem_hipotese'].to_numpy(dtype=np.int64)
+        nomes = [str(nome).strip() for nome in df['nome_hipotese']]
+        alfabeticas = [ordem for ordem, nome in zip(ordens.tolist(), nomes) if nome == NOME_ALFABETICA]
+        if alfabeticas:
+            alfabetica = alfabeticas[0]
+        else:
+            alfabetica = int(ordens[-1]) if len(ordens) else 0
+        return cls(ordens, nomes, alfabetica)
+
+    def posicoes(self, ordens):
+        # Posição (0..n-1) de cada ordem entre os níveis; -1 para ordens que não são um nível
+        ordens = np.asarray(ordens, dtype=np.int64)
+        if not len(self.ordens):
+            return np.full(len(ordens), -1)
+        posicoes = np.minimum(np.searchsorted(self.ordens, ordens), len(self.ordens) - 1)
+        return np.where(self.ordens[posicoes] == ordens, posicoes, -1)
+
+
+def _validas(ordens, niveis):
+    # Máscara das sondagens com ordem conhecida; as demais são descartadas com um aviso
+    validas = niveis.posicoes(ordens) >= 0
+    descartadas = int((~validas).sum())
+    if descartadas:
+        desconhecidas = sorted(set(np.asarray(ordens)[~validas].tolist()))
+        logger.warning("%d sondagens com hipótese fora dos níveis conhecidos ignoradas: %s", descartadas, desconhecidas)
+    return validas
+
+
+@dataclass
+class Evolucao:
+    # Uma linha por aluno (índice id_aluno) com primeira, última, menor e maior hipótese,
+    # ganho líquido (em níveis), número de sondagens e dias até chegar à hipótese alfabética
+    alunos: pd.DataFrame
+    # Quantas vezes um aluno passou da hipótese da linha para a da coluna entre duas sondagens seguidas
+    transicoes: pd.DataFrame
+    # Posição, nos dados de entrada, da primeira sondagem de cada aluno (mesma ordem de `alunos`)
+    linhas_iniciais: np.ndarray
+
+
+def calcular_evolucao(alunos, datas, ordens, niveis):
+    alunos = np.asarray(alunos)
+    datas = pd.to_datetime(pd.Series(datas)).to_numpy(dtype='datetime64[ns]')
+    ordens = np.asarray(ordens, dtype=np.int64)
+
+    linhas = np.flatnonzero(_validas(ordens, niveis))
+    posicoes = linhas[np.lexsort((datas[linhas], alunos[linhas]))]
+    a, d, o = alunos[posicoes], datas[posicoes], ordens[posicoes]
+    nivel = niveis.posicoes(o)
+
+    # Início e fim de cada aluno no array ordenado
+    novo_aluno = np.ones(len(a), dtype=bool)
+    novo_aluno[1:] = a[1:] != a[:-1]
+    inicio = np.flatnonzero(novo_aluno)
+    fim = np.append(inicio[1:], len(a))[:len(inicio)] - 1
+    grupo = np.cumsum(novo_aluno) - 1
+
+    metricas = pd.DataFrame({
+        'primeira': o[inicio],
+        'ultima': o[fim],
+        'minima': np.minimum.reduceat(o, inicio) if len(o) else o,
+        'maxima': np.maximum.reduceat(o, inicio) if len(o) else o,
+        'num_sondagens': fim - inicio + 1,
+        'ganho_liquido': nivel[fim] - nivel[inicio],
+    }, index=pd.Index(a[inicio], name='id_aluno'))
+
+    # Primeira sondagem alfabética de cada aluno (a ordenação garante que a primeira ocorrência é a mais antiga)
+    alfabeticas = np.flatnonzero(o >= niveis.alfabetica)
+    grupos_alfabeticos, primeira_ocorrencia = np.unique(grupo[alfabeticas], return_index=True)
+    dias = np.full(len(inicio), np.nan)
+    chegada = d[alfabeticas[primeira_ocorrencia]]
+    dias[grupos_alfabeticos] = (chegada - d[inicio[grupos_alfabeticos]]) / np.timedelta64(1, 'D')
+    metricas['dias_ate_alfabetica'] = dias
+    # Chegou à hipótese alfabética depois de começar abaixo dela
+    metricas['alfabetizado'] = metricas['dias_ate_alfabetica'].notna() & (metricas['primeira'] < niveis.alfabetica)
+
+    # Pares de sondagens consecutivas do mesmo aluno, já com a posição de cada nível
+    mesmo_aluno = ~novo_aluno[1:]
+    transicoes = _matriz_transicoes(nivel[:-1][mesmo_aluno], nivel[1:][mesmo_aluno], niveis)
+
+    return Evolucao(metricas, transicoes, posicoes[inicio])
+
+
+def _matriz_transicoes(de, para, niveis):
+    # Cada par de posições (de, para) vira uma célula da matriz n x n e a contagem é um único bincount
+    n = len(niveis.ordens)
+    contagem = np.bincount(de * n + para, minlength=n * n)
+    return pd.DataFrame(contagem.reshape(n, n), index=niveis.nomes, columns=niveis.nomes)
+
+
+def contar_transicoes(de, para, niveis):
+    # `de` e `para` são ordens (dh.ordering); pares com alguma ordem fora dos níveis são ignorados
+    de, para = niveis.posicoes(de), niveis.posicoes(para)
+    conhecidos = (de >= 0) & (para >= 0)
+    return _matriz_transicoes(de[conhecidos], para[conhecidos], niveis)
+
+
+def pares_transicao(df, atributos, coluna_aluno='id_aluno', coluna_data='data_criacao_sondagem',
+                    coluna_ordem='ordem_hipotese'):
+    """Uma linha por par de sondagens consecutivas do mesmo aluno.
+
+    Traz a hipótese de origem (`de`), a de destino (`para`) e os `atributos` da sondagem de
+    destino, para que os filtros (turma, escola, estado, mês) sejam só uma máscara sobre os pares.
+    """
+    sondagens = df.dropna(subset=[coluna_ordem, coluna_data])
+    alunos = sondagens[coluna_aluno].to_numpy()
+    datas = pd.to_datetime(sondagens[coluna_data]).to_numpy(dtype='datetime64[ns]')
+    posicoes = np.lexsort((datas, alunos))
+    a = alunos[posicoes]
+    o = sondagens[coluna_ordem].to_numpy(dtype=np.int64)[posicoes]
+
+    mesmo_aluno = a[1:] == a[:-1]
+    destino = posicoes[1:][mesmo_aluno]
+    pares = pd.DataFrame({'de': o[:-1][mesmo_aluno], 'para': o[1:][mesmo_aluno]})
+    for col in atributos:
+        # Categorias deixam o isin dos filtros trabalhando sobre códigos inteiros
+        pares[col] = pd.Categorical(sondagens[col].to_numpy()[destino])
+    return pares
+
+
+def filtrar_transicoes(pares, niveis, filtros=None):
+    # filtros: {coluna: valores aceitos}; colunas sem valores não filtram
+    mascara = np.ones(len(pares), dtype=bool)
+    for col, valores in (filtros or {}).items():
+        if valores:
+            mascara &= pares[col].isin(valores).to_numpy()
+    return contar_transicoes(pares['de'].to_numpy()[mascara], pares['para'].to_numpy()[mascara], niveis)
+
+
+def funil_etapas(evolucao, niveis):
+    # Quantos alunos passaram por cada etapa: começaram abaixo dela e chegaram a ela ou acima
+    alunos = evolucao.alunos
+    return {
+        nome: int(((alunos['minima'] < ordem) & (alunos['maxima'] >= ordem)).sum())
+        for ordem, nome in zip(niveis.ordens.tolist(), niveis.nomes)
+    }
+
+
+# Definições de "melhoria" por aluno a partir das métricas de evolução. Para uma nova definição
+# basta incluir aqui uma função que recebe Evolucao.alunos e devolve uma máscara booleana.
+DEFINICOES_MELHORIA = {
+    # Qualquer diferença entre a menor e a maior hipótese (definição original das páginas)
+    'amplitude': lambda alunos: alunos['minima'] < alunos['maxima'],
+    # Última sondagem acima da primeira, respeitando a ordem no tempo
+    'primeira_ultima': lambda alunos: alunos['ganho_liquido'] > 0,
+    # Chegou à hipótese alfabética depois de começar abaixo dela
+    'alfabetizacao': lambda alunos: alunos['alfabetizado'],
+}
+
+
+def alunos_com_melhoria(evolucao, definicao='amplitude'):
+    return evolucao.alunos[DEFINICOES_MELHORIA[definicao](evolucao.alunos)]
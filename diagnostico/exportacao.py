@@ -0,0 +1,130 @@
+# Exportação dos microdados por aluno a partir do snapshot fixado pela página (os mesmos dados da
+# tela), gravada em lotes num arquivo compactado. Os arquivos têm dados pessoais dos alunos: ficam numa
+# pasta temporária privada, fora de qualquer pasta servida pelo Streamlit, numa subpasta por sessão,
+# e só chegam ao navegador pelo botão de download da própria sessão.
+import gzip
+import os
+import secrets
+import shutil
+import tempfile
+import time
+
+from diagnostico.dados import entrada_dataset
+
+TAMANHO_LOTE = int(os.getenv('EXPORTACAO_TAMANHO_LOTE', '50000'))
+VALIDADE_EXPORTACAO_S = int(os.getenv('EXPORTACAO_VALIDADE_S', '3600'))
+# Arquivos guardados por sessão (um por dataset exportável)
+MAX_EXPORTACOES = int(os.getenv('EXPORTACAO_MAX_ARQUIVOS', '3'))
+PASTA_EXPORTACOES = os.getenv(
+    'EXPORTACAO_PASTA', os.path.join(tempfile.gettempdir(), f'diagnostico_exportacoes_{os.getuid()}'),
+)
+
+FORMATOS = {
+    'csv': '.csv.gz',
+    'parquet': '.parquet',
+}
+
+# Datasets com uma linha por aluno, das páginas (1) Professores, (2) Turmas e (4) Hipóteses
+EXPORTAVEIS = ('professores', 'turmas', 'hipoteses')
+
+
+# ------------------------- ARQUIVOS ------------------------------------
+def nova_sessao():
+    # Identificador da subpasta de uma sessão; fica no session_state da sessão
+    return secrets.token_urlsafe(16)
+
+
+def _pasta_sessao(sessao):
+    return os.path.join(PASTA_EXPORTACOES, sessao)
+
+
+def _por_idade(pasta):
+    # Entradas da pasta, da mais antiga para a mais nova
+    try:
+        return sorted(os.scandir(pasta), key=lambda entrada: entrada.stat().st_mtime)
+    except FileNotFoundError:
+        return []
+
+
+def limpar_exportacoes(sessao):
+    """Remove as pastas de sessões abandonadas e, na pasta da `sessao`, os arquivos vencidos e,
+    acima do limite, os mais antigos (abrindo vaga para um novo)."""
+    limite = time.time() - VALIDADE_EXPORTACAO_S
+    for pasta in _por_idade(PASTA_EXPORTACOES):
+        if pasta.is_dir() and pasta.name != sessao and pasta.stat().st_mtime < limite:
+            shutil.rmtree(pasta.path, ignore_errors=True)
+    arquivos = _por_idade(_pasta_sessao(sessao))
+    for posicao, arquivo in enumerate(arquivos):
+        if arquivo.stat().st_mtime < limite or len(arquivos) - posicao >= MAX_EXPORTACOES:
+            os.remove(arquivo.path)
+
+
+def novo_destino(sessao, nome, formato, versao=None):
+    # Caminho do arquivo de uma nova exportação, na pasta da sessão
+    os.makedirs(PASTA_EXPORTACOES, mode=0o700, exist_ok=True)
+    os.makedirs(_pasta_sessao(sessao), mode=0o700, exist_ok=True)
+    limpar_exportacoes(sessao)
+    sufixo = f"_snapshot{versao}" if versao is not None else ""
+    return os.path.join(_pasta_sessao(sessao), f"{nome}{sufixo}{FORMATOS[formato]}")
+
+
+def remover_exportacao(destino):
+    if destino and os.path.dirname(os.path.dirname(destino)) == PASTA_EXPORTACOES:
+        try:
+            os.remove(destino)
+        except FileNotFoundError:
+            pass
+
+
+# ------------------------- ESCRITA -------------------------------------
+def _lotes(df, tamanho_lote):
+    for inicio in range(0, len(df), tamanho_lote):
+        yield df.iloc[inicio:inicio + tamanho_lote]
+
+
+def _escrever_csv(lotes, destino, progresso):
+    linhas = 0
+    with gzip.open(destino, 'wt', encoding='utf-8', newline='') as arquivo:
+        for lote in lotes:
+            lote.to_csv(arquivo, header=linhas == 0, index=False)
+            linhas += len(lote)
+            progresso(linhas)
+    return linhas
+
+
+def _escrever_parquet(lotes, destino, progresso):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    linhas = 0
+    escritor = None
+    try:
+        for lote in lotes:
+            tabela = pa.Table.from_pandas(lote, preserve_index=False)
+            if escritor is None:
+                # Colunas só com nulos no primeiro lote viram texto, para aceitar valores nos lotes seguintes
+                schema = pa.schema([
+                    campo.with_type(pa.string()) if pa.types.is_null(campo.type) else campo
+                    for campo in tabela.schema
+                ])
+                escritor = pq.ParquetWriter(destino, schema, compression='zstd')
+            escritor.write_table(tabela.cast(schema))
+            linhas += len(lote)
+            progresso(linhas)
+    finally:
+        if escritor is not None:
+            escritor.close()
+    return linhas
+
+
+def exportar(nome, destino, formato='csv', tamanho_lote=TAMANHO_LOTE, progresso=None):
+    # Grava o dataset do snapshot fixado em `destino` (caminho ou arquivo aberto) e devolve o número de linhas
+    if nome not in EXPORTAVEIS:
+        raise ValueError(f"Dataset não exportável: {nome}")
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de exportação inválido: {formato}")
+    progresso = progresso or (lambda linhas: None)
+    lotes = _lotes(entrada_dataset(nome).dados, tamanho_lote)
+    if formato == 'csv':
+        return _escrever_csv(lotes, destino, progresso)
+    return _escrever_parquet(lotes, destino, progresso)
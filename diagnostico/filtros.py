@@ -0,0 +1,355 @@
+# Filtros da barra lateral, compartilhados pelas páginas. Os widgets produzem uma lista de filtros
+# declarativos (Filtro) e um motor aplica todos de uma vez: pandas, com uma única máscara, ou,
+# opcionalmente, DuckDB sobre uma cópia local do dataset, com os filtros como SQL.
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from pandas.api.types import is_datetime64_any_dtype, is_numeric_dtype, is_object_dtype
+
+from diagnostico.busca import (
+    COLUNAS_CHAVE, MIN_DISTINTOS_TEXTO, IndiceChaves, contem, indice_chaves, indice_texto, normalizar,
+)
+from diagnostico.cache import cache_compartilhado
+from diagnostico.dados import entrada_dataset
+from diagnostico.estatisticas import calcular_estatistica, estatisticas
+
+# Com 1 e o pacote duckdb instalado, os filtros rodam no DuckDB (padrão: 0)
+USAR_DUCKDB = os.getenv('FILTROS_DUCKDB', '0') == '1'
+# Arquivo do banco DuckDB com as cópias dos datasets (padrão: em memória)
+CAMINHO_DUCKDB = os.getenv('FILTROS_DUCKDB_CAMINHO', ':memory:')
+# Número de resultados de filtros (linhas selecionadas) guardados por sessão
+MAX_VISOES_NA_SESSAO = int(os.getenv('FILTROS_SESSAO_MAX', '4'))
+
+
+@dataclass(frozen=True)
+class Filtro:
+    coluna: str
+    # 'valores' (lista de valores aceitos), 'intervalo' (mínimo, máximo), 'texto' (trecho procurado,
+    # sem diferenciar acentos nem maiúsculas) ou 'chaves' (lista de chaves normalizadas aceitas).
+    # Listas vão como tuplas, para que o filtro sirva de chave de dicionário
+    tipo: str
+    valor: object
+
+    def estreita(self, anterior):
+        # Se todas as linhas aceitas por este filtro também são aceitas por `anterior`, da mesma coluna
+        if self.tipo != anterior.tipo:
+            return False
+        if self.tipo in ('valores', 'chaves'):
+            return set(self.valor) <= set(anterior.valor)
+        if self.tipo == 'intervalo':
+            return anterior.valor[0] <= self.valor[0] and self.valor[1] <= anterior.valor[1]
+        return normalizar(anterior.valor) in normalizar(self.valor)
+
+
+# ------------------------- MOTORES -------------------------------------
+class MotorPandas:
+    # Os motores devolvem as posições das linhas aceitas; `base` restringe a avaliação a um subconjunto
+
+    def __init__(self, df, chave=None):
+        self.df = df
+        # (dataset, versão) de onde o DataFrame veio; com ela os índices de texto são reaproveitados
+        self.chave = chave
+        self._indices_chaves = {}
+
+    def chaves(self, coluna):
+        # {chave normalizada: rótulo}, em ordem de chave
+        return self._indice_chaves(coluna).rotulos
+
+    def posicoes(self, filtros, base=None):
+        # Os filtros por chave são fatias do índice: viram posições, intersectadas entre si e com `base`.
+        # Os demais formam uma máscara só, avaliada apenas nas linhas que sobraram
+        for filtro in filtros:
+            if filtro.tipo == 'chaves':
+                linhas = self._indice_chaves(filtro.coluna).posicoes(filtro.valor)
+                base = linhas if base is None else np.intersect1d(base, linhas, assume_unique=True)
+        filtros = [filtro for filtro in filtros if filtro.tipo != 'chaves']
+        mascara = np.ones(len(self.df) if base is None else len(base), dtype=bool)
+        for filtro in filtros:
+            coluna = self.df[filtro.coluna] if base is None else self.df[filtro.coluna].iloc[base]
+            if filtro.tipo == 'valores':
+                mascara &= coluna.isin(filtro.valor).to_numpy()
+            elif filtro.tipo == 'intervalo':
+                mascara &= coluna.between(*filtro.valor).to_numpy()
+            else:
+                # O índice de texto responde para todas as linhas; a busca em si custa o número de resultados
+                aceitas = self._contem(filtro.coluna, filtro.valor)
+                mascara &= aceitas if base is None else aceitas[base]
+        return np.flatnonzero(mascara) if base is None else base[mascara]
+
+    def _contem(self, coluna, texto):
+        if self.chave is None:
+            return contem(self.df[coluna], texto)
+        return indice_texto((*self.chave, coluna), self.df[coluna]).buscar(texto)
+
+    def _indice_chaves(self, coluna):
+        if self.chave is not None:
+            return indice_chaves((*self.chave, coluna), self.df[coluna])
+        if coluna not in self._indices_chaves:
+            self._indices_chaves[coluna] = IndiceChaves(self.df[coluna])
+        return self._indices_chaves[coluna]
+
+
+# Mesma normalização de busca.normalizar, em SQL
+_CHAVE_SQL = 'strip_accents(lower(CAST("{coluna}" AS VARCHAR)))'
+
+
+class MotorDuckDB:
+    """Filtros como SQL no DuckDB sobre uma cópia colunar do dataset.
+
+    A cópia é criada uma vez por (dataset, versão do cache) e reaproveitada por todas as
+    sessões. As cópias de versões que saíram do cache (nem no snapshot atual nem no anterior,
+    que ainda pode estar fixado em alguma sessão) são removidas quando outra é criada.
+    """
+
+    _lock = threading.Lock()
+    _conexao = None
+    # dataset -> versões com cópia no DuckDB
+    _tabelas = {}
+
+    def __init__(self, df, nome, versao):
+        self.df = df
+        self.chave = (nome, versao)
+        self.tabela = self._snapshot(df, nome, versao)
+
+    @classmethod
+    def _cursor(cls):
+        import duckdb
+
+        with cls._lock:
+            if cls._conexao is None:
+                cls._conexao = duckdb.connect(CAMINHO_DUCKDB)
+        # Cada thread (sessão) usa o próprio cursor sobre a mesma conexão
+        return cls._conexao.cursor()
+
+    @staticmethod
+    def _tabela(nome, versao):
+        return f'{nome}_v{versao}'
+
+    @classmethod
+    def _snapshot(cls, df, nome, versao):
+        tabela = cls._tabela(nome, versao)
+        with cls._lock:
+            if versao in cls._tabelas.get(nome, ()):
+                return tabela
+        cursor = cls._cursor()
+        # _posicao liga as linhas da cópia às do DataFrame
+        cursor.register('origem', df.assign(_posicao=np.arange(len(df))))
+        cursor.execute(f'CREATE OR REPLACE TABLE "{tabela}" AS SELECT * FROM origem')
+        cursor.unregister('origem')
+        vivas = cache_compartilhado.versoes_vivas(nome) | {versao}
+        with cls._lock:
+            versoes = cls._tabelas.setdefault(nome, set())
+            versoes.add(versao)
+            descartadas = versoes - vivas
+            versoes -= descartadas
+        for antiga in descartadas:
+            cursor.execute(f'DROP TABLE IF EXISTS "{cls._tabela(nome, antiga)}"')
+        return tabela
+
+    def chaves(self, coluna):
+        consulta = (
+            f'SELECT {_CHAVE_SQL.format(coluna=coluna)} AS chave, MIN("{coluna}") AS rotulo FROM "{self.tabela}" '
+            f'WHERE "{coluna}" IS NOT NULL GROUP BY chave ORDER BY chave'
+        )
+        return dict(self._cursor().execute(consulta).fetchall())
+
+    def posicoes(self, filtros, base=None):
+        # O DuckDB varre a cópia inteira de forma vetorizada; `base` não reduz o trabalho aqui
+        condicoes, parametros = [], []
+        for filtro in filtros:
+            coluna = f'"{filtro.coluna}"'
+            if filtro.tipo == 'valores':
+                valores = [valor for valor in filtro.valor if not pd.isna(valor)]
+                partes = [f'{coluna} IN ({", ".join("?" * len(valores))})'] if valores else []
+                if len(valores) < len(filtro.valor):
+                    partes.append(f'{coluna} IS NULL')
+                condicoes.append(f'({" OR ".join(partes) or "FALSE"})')
+                parametros += valores
+            elif filtro.tipo == 'intervalo':
+                condicoes.append(f'{coluna} BETWEEN ? AND ?')
+                parametros += list(filtro.valor)
+            elif filtro.tipo == 'texto':
+                condicoes.append(f'contains({_CHAVE_SQL.format(coluna=filtro.coluna)}, ?)')
+                parametros.append(normalizar(filtro.valor))
+            elif filtro.tipo == 'chaves':
+                marcadores = ', '.join('?' * len(filtro.valor))
+                condicoes.append(f'{_CHAVE_SQL.format(coluna=filtro.coluna)} IN ({marcadores})' if filtro.valor else 'FALSE')
+                parametros += list(filtro.valor)
+        onde = ' AND '.join(condicoes) or 'TRUE'
+        consulta = f'SELECT _posicao FROM "{self.tabela}" WHERE {onde} ORDER BY _posicao'
+        posicoes = self._cursor().execute(consulta, parametros).fetchnumpy()['_posicao']
+        return np.asarray(posicoes) if base is None else np.intersect1d(posicoes, base, assume_unique=True)
+
+
+def duckdb_disponivel():
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def criar_motor(df, nome=None):
+    # A cópia no DuckDB e os índices de texto só valem para datasets do cache (nome conhecido), cuja
+    # versão os identifica
+    entrada = entrada_dataset(nome, consultar=False) if nome else None
+    if USAR_DUCKDB and entrada is not None and duckdb_disponivel():
+        return MotorDuckDB(df, nome, entrada.versao)
+    return MotorPandas(df, (nome, entrada.versao) if entrada is not None else None)
+
+
+# ------------------------- VISÕES DA SESSÃO ----------------------------
+def _visoes_da_sessao():
+    # {(dataset, versão, filtros): posições das linhas aceitas}, da mais antiga para a mais recente
+    if 'filtros_visoes' not in st.session_state:
+        st.session_state['filtros_visoes'] = OrderedDict()
+    return st.session_state['filtros_visoes']
+
+
+def posicoes_filtradas(motor, filtros, visoes):
+    """Posições das linhas aceitas pelos `filtros`, reaproveitando as visões da sessão.
+
+    Um rerun com os mesmos filtros (ex.: abrir um expander) usa a visão guardada. Quando os
+    filtros novos só estreitam os de uma visão guardada (um valor a menos, um intervalo menor,
+    um filtro a mais), só as linhas dessa visão são avaliadas, e só pelos filtros que mudaram.
+    """
+    filtros = frozenset(filtros)
+    if motor.chave is None:
+        return motor.posicoes(filtros)
+    chave = (*motor.chave, filtros)
+    if chave in visoes:
+        visoes.move_to_end(chave)
+        return visoes[chave]
+
+    por_coluna = {filtro.coluna: filtro for filtro in filtros}
+    base, pendentes = None, filtros
+    for (nome, versao, anteriores), posicoes in visoes.items():
+        if (nome, versao) != motor.chave or (base is not None and len(posicoes) >= len(base)):
+            continue
+        if all(f.coluna in por_coluna and por_coluna[f.coluna].estreita(f) for f in anteriores):
+            base, pendentes = posicoes, filtros - anteriores
+    posicoes = motor.posicoes(pendentes, base)
+
+    # Visões de versões anteriores do mesmo dataset não servem mais
+    for antiga in [c for c in visoes if c[0] == motor.chave[0] and c[1] != motor.chave[1]]:
+        del visoes[antiga]
+    visoes[chave] = posicoes
+    while len(visoes) > MAX_VISOES_NA_SESSAO:
+        visoes.popitem(last=False)
+    return posicoes
+
+
+# ------------------------- PREPARAÇÃO E WIDGETS -------------------------
+def preparar_colunas(df, preencher_nulos=False, converter_datas_texto=False):
+    df = df.copy()
+    for col in df.columns:
+        if converter_datas_texto and is_object_dtype(df[col]) and df[col].str.contains(r'\d{4}/\d{2}').all():
+            try:
+                df[col] = pd.to_datetime(df[col])
+            except Exception:
+                pass
+
+        if is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].dt.tz_localize(None)
+
+        if is_numeric_dtype(df[col]):
+            if preencher_nulos and df[col].isnull().any():
+                df[col] = df[col].fillna(0)
+            # Inteiros guardados como float (por causa de nulos) voltam a ser exibidos sem casas decimais
+            if df[col].notnull().all() and (df[col] == df[col].astype(int)).all():
+                df[col] = df[col].astype(int)
+    return df
+
+
+def ativar_filtros():
+    return st.sidebar.checkbox("Adicionar Filtros", key="filter_checkbox")
+
+
+def widgets_filtros(df, motor, colunas=None):
+    # Desenha os widgets da barra lateral e devolve os filtros escolhidos, sem aplicá-los. As opções
+    # vêm das estatísticas por coluna (`colunas`), calculadas uma vez por versão do dataset
+    filtros = []
+    with st.sidebar.container():
+        to_filter_columns = st.multiselect(
+            "Filtrar pela Coluna: ",
+            df.columns,
+            key="multiselect_columns"
+        )
+        for i, column in enumerate(to_filter_columns):
+            left, right = st.columns((1, 20))
+            estatistica = colunas[column] if colunas else calcular_estatistica(df[column])
+
+            if column in COLUNAS_CHAVE:
+                rotulos = motor.chaves(column)
+                user_key_input = right.multiselect(
+                    f"Values for {column}",
+                    list(rotulos),
+                    format_func=rotulos.get,
+                    key=f"multiselect_{column}_{i}"
+                )
+                if user_key_input:
+                    filtros.append(Filtro(column, 'chaves', tuple(user_key_input)))
+            elif isinstance(df[column].dtype, pd.CategoricalDtype) or estatistica.cardinalidade < MIN_DISTINTOS_TEXTO:
+                opcoes = list(df[column].unique() if estatistica.valores is None else estatistica.valores)
+                user_cat_input = right.multiselect(
+                    f"Values for {column}",
+                    opcoes,
+                    default=opcoes,
+                    key=f"multiselect_{column}_{i}"
+                )
+                filtros.append(Filtro(column, 'valores', tuple(user_cat_input)))
+            elif is_numeric_dtype(df[column]):
+                _min, _max = float(estatistica.minimo), float(estatistica.maximo)
+                step = (_max - _min) / 100
+                user_num_input = right.slider(
+                    f"Values for {column}",
+                    min_value=_min,
+                    max_value=_max,
+                    value=(_min, _max),
+                    step=step,
+                    key=f"slider_{column}_{i}"
+                )
+                filtros.append(Filtro(column, 'intervalo', tuple(user_num_input)))
+            elif is_datetime64_any_dtype(df[column]):
+                user_date_input = right.date_input(
+                    f"Values for {column}",
+                    value=(estatistica.minimo, estatistica.maximo),
+                    key=f"date_input_{column}_{i}"
+                )
+                if len(user_date_input) == 2:
+                    filtros.append(Filtro(column, 'intervalo', tuple(map(pd.to_datetime, user_date_input))))
+            else:
+                user_text_input = right.text_input(
+                    f"Digite uma substring pelo que quer filtrar de {column}",
+                    key=f"text_input_{column}_{i}"
+                )
+                if user_text_input:
+                    filtros.append(Filtro(column, 'texto', user_text_input))
+    return filtros
+
+
+def filter_dataframe(df, nome=None, ativo=None, preencher_nulos=False, converter_datas_texto=False):
+    """Filtros da barra lateral ("Adicionar Filtros") aplicados a `df`.
+
+    `nome` é o dataset do cache de onde `df` veio; com ele (e FILTROS_DUCKDB=1) os filtros
+    rodam no DuckDB. `ativo` dispensa o checkbox quando a página já o desenhou.
+    """
+    if ativo is None:
+        ativo = ativar_filtros()
+    if not ativo:
+        return df
+
+    df = preparar_colunas(df, preencher_nulos, converter_datas_texto)
+    motor = criar_motor(df, nome)
+    colunas = None
+    if motor.chave is not None:
+        colunas = estatisticas(*motor.chave, df, ('filtros', preencher_nulos, converter_datas_texto))
+    filtros = widgets_filtros(df, motor, colunas)
+    if not filtros:
+        return df
+    return df.iloc[posicoes_filtradas(motor, filtros, _visoes_da_sessao())]
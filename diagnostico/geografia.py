@@ -0,0 +1,192 @@
+# Indicadores por UF e município (professores, turmas, alunos, sondagens, taxa de melhoria), calculados
+# junto com os datasets de origem, e as geometrias locais para o mapa coroplético. As UFs são identificadas
+# pelo código do IBGE; os municípios, pela UF e pelo nome normalizado (o banco não guarda o código do
+# município), que é cruzado com o nome no GeoJSON.
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from diagnostico.busca import normalizar
+from diagnostico.evolucao import DEFINICOES_MELHORIA
+from diagnostico.melhoria import progresso_por_aluno
+
+# GeoJSON locais (sem chamada de rede); sem o arquivo, o mapa vira um gráfico de barras
+_PASTA_GEO = os.path.join(os.path.dirname(__file__), 'geo')
+CAMINHOS_GEOJSON = {
+    'uf': os.getenv('GEOJSON_UF', os.path.join(_PASTA_GEO, 'ufs.geojson')),
+    'municipio': os.getenv('GEOJSON_MUNICIPIOS', os.path.join(_PASTA_GEO, 'municipios.geojson')),
+}
+
+# Tamanho da grade (em graus) em que os vértices são arredondados em cada zoom
+TOLERANCIAS = {
+    'brasil': 0.05,
+    'estado': 0.01,
+}
+
+# Propriedades onde o GeoJSON costuma trazer o código do IBGE e o nome da área
+PROPRIEDADES_CODIGO = ('codarea', 'CD_MUN', 'CD_UF', 'codigo_ibge', 'id')
+PROPRIEDADES_NOME = ('NM_MUN', 'NM_UF', 'nome', 'name')
+
+UFS = {
+    'RO': (11, 'Rondônia'), 'AC': (12, 'Acre'), 'AM': (13, 'Amazonas'), 'RR': (14, 'Roraima'),
+    'PA': (15, 'Pará'), 'AP': (16, 'Amapá'), 'TO': (17, 'Tocantins'), 'MA': (21, 'Maranhão'),
+    'PI': (22, 'Piauí'), 'CE': (23, 'Ceará'), 'RN': (24, 'Rio Grande do Norte'), 'PB': (25, 'Paraíba'),
+    'PE': (26, 'Pernambuco'), 'AL': (27, 'Alagoas'), 'SE': (28, 'Sergipe'), 'BA': (29, 'Bahia'),
+    'MG': (31, 'Minas Gerais'), 'ES': (32, 'Espírito Santo'), 'RJ': (33, 'Rio de Janeiro'),
+    'SP': (35, 'São Paulo'), 'PR': (41, 'Paraná'), 'SC': (42, 'Santa Catarina'),
+    'RS': (43, 'Rio Grande do Sul'), 'MS': (50, 'Mato Grosso do Sul'), 'MT': (51, 'Mato Grosso'),
+    'GO': (52, 'Goiás'), 'DF': (53, 'Distrito Federal'),
+}
+
+# Sigla ou nome (normalizados) -> código do IBGE
+_CODIGOS_UF = {
+    **{normalizar(sigla): codigo for sigla, (codigo, _) in UFS.items()},
+    **{normalizar(nome): codigo for codigo, nome in UFS.values()},
+}
+SIGLAS = {codigo: sigla for sigla, (codigo, _) in UFS.items()}
+
+METRICAS = {
+    'professores': 'Professores',
+    'turmas': 'Turmas',
+    'alunos': 'Alunos',
+    'sondagens': 'Sondagens',
+    'taxa_melhoria': 'Taxa de melhoria (%)',
+}
+
+
+# ------------------------- INDICADORES ---------------------------------
+def codigos_uf(estados):
+    codigos = estados.map(lambda estado: _CODIGOS_UF.get(normalizar(estado)) if pd.notna(estado) else None)
+    return codigos.astype('Int64')
+
+
+def rollup_geografico(fatos, turmas, niveis_hipoteses, definicao='amplitude'):
+    """Indicadores por UF e por município, numa tabela só (coluna `nivel`).
+
+    `turmas` é a dimensão de turmas (UF, município, professor e total de alunos de cada turma);
+    as sondagens e a melhoria dos alunos vêm de `fatos`, como nas páginas (3) e (5).
+    """
+    turmas = turmas[['id_turma', 'id_professor', 'total_alunos', 'estado_escola', 'cidade_escola']].copy()
+    turmas['codigo_uf'] = codigos_uf(turmas['estado_escola'])
+    turmas = turmas[turmas['codigo_uf'].notna()]
+    turmas['chave_municipio'] = turmas['cidade_escola'].fillna('').map(normalizar)
+
+    alunos = progresso_por_aluno(fatos, niveis_hipoteses)
+    alunos['melhoria'] = DEFINICOES_MELHORIA[definicao](alunos)
+    por_turma = alunos.groupby('id_turma')['melhoria'].agg(['size', 'sum'])
+    turmas['alunos_avaliados'] = turmas['id_turma'].map(por_turma['size']).fillna(0).astype(int)
+    turmas['alunos_com_melhoria'] = turmas['id_turma'].map(por_turma['sum']).fillna(0).astype(int)
+    turmas['sondagens'] = turmas['id_turma'].map(fatos.groupby('id_turma')['id_avaliacao'].nunique()).fillna(0).astype(int)
+
+    def agregar(chaves):
+        return turmas.groupby(chaves).agg(
+            nome=('cidade_escola', 'first'),
+            professores=('id_professor', 'nunique'),
+            turmas=('id_turma', 'nunique'),
+            alunos=('total_alunos', 'sum'),
+            sondagens=('sondagens', 'sum'),
+            alunos_avaliados=('alunos_avaliados', 'sum'),
+            alunos_com_melhoria=('alunos_com_melhoria', 'sum'),
+        ).reset_index()
+
+    ufs = agregar(['codigo_uf']).assign(nivel='uf', chave_municipio='')
+    ufs['nome'] = ufs['codigo_uf'].map(lambda codigo: UFS[SIGLAS[codigo]][1])
+    municipios = agregar(['codigo_uf', 'chave_municipio']).assign(nivel='municipio')
+    municipios['nome'] = municipios['nome'].fillna('Não informado')
+
+    rollup = pd.concat([ufs, municipios], ignore_index=True)
+    rollup['sigla_uf'] = rollup['codigo_uf'].map(SIGLAS)
+    avaliados = rollup['alunos_avaliados'].replace(0, np.nan)
+    rollup['taxa_melhoria'] = (rollup['alunos_com_melhoria'] / avaliados * 100).round(2).fillna(0)
+    return rollup[[
+        'nivel', 'codigo_uf', 'sigla_uf', 'chave_municipio', 'nome', 'professores', 'turmas', 'alunos',
+        'sondagens', 'alunos_avaliados', 'alunos_com_melhoria', 'taxa_melhoria',
+    ]]
+
+
+# ------------------------- GEOMETRIAS ----------------------------------
+def _propriedade(feature, nomes):
+    propriedades = feature.get('properties') or {}
+    for nome in nomes:
+        if propriedades.get(nome) not in (None, ''):
+            return propriedades[nome]
+    return feature.get('id') if 'id' in nomes else None
+
+
+def _simplificar_anel(anel, tolerancia):
+    # Arredonda os vértices para a grade e remove os repetidos em sequência; None se o anel sumir
+    pontos = np.round(np.asarray(anel, dtype=float)[:, :2] / tolerancia) * tolerancia
+    novos = np.ones(len(pontos), dtype=bool)
+    novos[1:] = np.any(pontos[1:] != pontos[:-1], axis=1)
+    pontos = pontos[novos]
+    if len(pontos) and np.any(pontos[0] != pontos[-1]):
+        pontos = np.vstack([pontos, pontos[:1]])
+    return pontos.round(6).tolist() if len(pontos) >= 4 else None
+
+
+def _simplificar_poligono(aneis, tolerancia):
+    externo = _simplificar_anel(aneis[0], tolerancia)
+    if externo is None:
+        return None
+    furos = [furo for furo in (_simplificar_anel(anel, tolerancia) for anel in aneis[1:]) if furo is not None]
+    return [externo, *furos]
+
+
+def _simplificar(geometria, tolerancia):
+    if geometria['type'] == 'Polygon':
+        poligonos = [geometria['coordinates']]
+    elif geometria['type'] == 'MultiPolygon':
+        poligonos = geometria['coordinates']
+    else:
+        return geometria
+    simplificados = [p for p in (_simplificar_poligono(aneis, tolerancia) for aneis in poligonos) if p is not None]
+    # Áreas menores que a grade ficam com a geometria original, para não sumirem do mapa
+    if not simplificados:
+        return geometria
+    return {'type': 'MultiPolygon', 'coordinates': simplificados}
+
+
+@lru_cache(maxsize=2)
+def _ler_geojson(caminho, modificado_em):
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+@lru_cache(maxsize=32)
+def _geometrias(caminho, modificado_em, zoom, codigo_uf):
+    tolerancia = TOLERANCIAS[zoom]
+    features = []
+    for feature in _ler_geojson(caminho, modificado_em)['features']:
+        codigo = _propriedade(feature, PROPRIEDADES_CODIGO)
+        if codigo is None or (codigo_uf is not None and not str(codigo).startswith(str(codigo_uf))):
+            continue
+        features.append({
+            'type': 'Feature',
+            'id': str(codigo),
+            'properties': {'nome': _propriedade(feature, PROPRIEDADES_NOME)},
+            'geometry': _simplificar(feature['geometry'], tolerancia),
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def geometrias(camada, zoom, codigo_uf=None):
+    """GeoJSON da `camada` ('uf' ou 'municipio') simplificado para o `zoom`, ou None sem o arquivo.
+
+    Cada área tem o código do IBGE como `id`. Com `codigo_uf`, só as áreas dessa UF.
+    O resultado fica em cache por arquivo, zoom e UF.
+    """
+    caminho = CAMINHOS_GEOJSON[camada]
+    if not os.path.exists(caminho):
+        return None
+    return _geometrias(caminho, os.path.getmtime(caminho), zoom, codigo_uf)
+
+
+def ids_municipios(geojson):
+    # Nome normalizado -> id da área, para cruzar com a chave_municipio dos indicadores
+    return {
+        normalizar(feature['properties']['nome']): feature['id']
+        for feature in geojson['features'] if feature['properties']['nome']
+    }
@@ -0,0 +1,89 @@
+# Gráficos declarativos: cada gráfico é uma EspecGrafico (agrupamento, filtro, métrica e layout) e um
+# único motor agrega e monta as figuras. As especificações com a mesma fonte são agregadas juntas,
+# com um só groupby sobre o DataFrame de origem.
+from dataclasses import dataclass, field
+
+import plotly.express as px
+
+# Layout comum dos gráficos de barras do relatório; cada especificação pode sobrescrever
+LAYOUT_BARRAS = {
+    'height': 600,
+    'xaxis': dict(tickmode='auto', nticks=20),
+    'yaxis': dict(gridcolor='LightGrey'),
+}
+
+
+@dataclass(frozen=True)
+class EspecGrafico:
+    titulo: str
+    x: str
+    # Nome da coluna com o valor agregado; a métrica é a contagem de linhas ou, com `contar_distintos`,
+    # o número de valores distintos dessa coluna
+    y: str = 'count'
+    contar_distintos: str = None
+    # Filtro por igualdade aplicado antes da agregação: {coluna: valor}
+    filtro: dict = field(default_factory=dict)
+    # Troca os valores de x na exibição (ex.: respostas longas com quebras de linha)
+    rotulos_x: dict = None
+    rotulos: dict = field(default_factory=dict)
+    titulo_y: str = None
+    cor: str = None
+    layout: dict = field(default_factory=dict)
+    tracos: dict = field(default_factory=dict)
+
+
+def agregar(df, especs, peso=None):
+    """Agrega `df` para todas as especificações de uma vez.
+
+    Um único groupby pelas colunas de agrupamento, de filtro e de contagem distinta de todas as
+    especificações gera uma tabela reduzida; cada gráfico é então um recorte dessa tabela.
+    Com `peso`, cada linha de `df` vale o valor dessa coluna (para fontes já agregadas).
+    """
+    chaves = []
+    for espec in especs.values():
+        for col in [espec.x, *espec.filtro, espec.contar_distintos]:
+            if col is not None and col not in chaves:
+                chaves.append(col)
+
+    agrupado = df.groupby(chaves, dropna=False, observed=True, sort=False)
+    if peso is None:
+        base = agrupado.size().rename('_linhas').reset_index()
+    else:
+        base = agrupado[peso].sum().rename('_linhas').reset_index()
+
+    tabelas = {}
+    for nome, espec in especs.items():
+        recorte = base
+        for col, valor in espec.filtro.items():
+            recorte = recorte[recorte[col] == valor]
+        recorte = recorte[recorte['_linhas'] > 0]
+        if espec.contar_distintos is None:
+            tabela = recorte.groupby(espec.x, observed=True)['_linhas'].sum()
+        else:
+            tabela = recorte.groupby(espec.x, observed=True)[espec.contar_distintos].nunique()
+        tabelas[nome] = tabela.rename(espec.y).reset_index()
+    return tabelas
+
+
+def figura(espec, tabela):
+    x = espec.x
+    if espec.rotulos_x:
+        x = f'{espec.x}_rotulo'
+        tabela = tabela.assign(**{x: tabela[espec.x].replace(espec.rotulos_x)})
+
+    fig = px.bar(
+        tabela, x=x, y=espec.y, title=espec.titulo, labels=espec.rotulos, text=espec.y,
+        color_discrete_sequence=[espec.cor] if espec.cor else None,
+    )
+    layout = {**LAYOUT_BARRAS, **espec.layout}
+    layout['yaxis'] = {**layout['yaxis'], 'title': espec.titulo_y or espec.rotulos.get(espec.y, espec.y)}
+    fig.update_layout(**layout)
+    if espec.tracos:
+        fig.update_traces(**espec.tracos)
+    return fig
+
+
+def gerar_graficos(df, especs, peso=None):
+    # {nome: (tabela agregada, figura)} para cada especificação
+    tabelas = agregar(df, especs, peso)
+    return {nome: (tabelas[nome], figura(espec, tabelas[nome])) for nome, espec in especs.items()}
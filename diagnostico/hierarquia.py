@@ -0,0 +1,91 @@
+# Filtros em cascata estado -> cidade -> escola -> turma -> professor. As opções de cada nível só
+# mostram os valores que existem dentro do que já foi escolhido nos níveis acima, então nenhuma
+# combinação escolhida resulta em zero linhas.
+import numpy as np
+import pandas as pd
+
+HIERARQUIA = ('estado_escola', 'cidade_escola', 'nome_escola', 'nome_turma', 'id_professor')
+
+ROTULOS = {
+    'estado_escola': 'Estado',
+    'cidade_escola': 'Cidade',
+    'nome_escola': 'Escola',
+    'nome_turma': 'Turma',
+    'id_professor': 'Professor',
+}
+
+
+def _agrupar(grupos, num_grupos):
+    # Elementos ordenados por grupo e o início de cada grupo (listas de adjacência num só vetor)
+    ordem = np.argsort(grupos, kind='stable')
+    inicios = np.searchsorted(grupos[ordem], np.arange(-1, num_grupos + 1))
+    # inicios[0] pula os elementos do grupo -1 (nulos)
+    return ordem, inicios[1:]
+
+
+def _reunir(ordem, inicios, grupos):
+    # Elementos de todos os `grupos`, sem laço em Python
+    comecos = inicios[grupos]
+    tamanhos = inicios[grupos + 1] - comecos
+    deslocamentos = np.repeat(comecos - np.cumsum(tamanhos) + tamanhos, tamanhos)
+    return ordem[deslocamentos + np.arange(tamanhos.sum())]
+
+
+class IndiceHierarquia:
+    """Mapas pai -> filhos entre os níveis da hierarquia de um dataset.
+
+    Cada nó de um nível é um caminho (ex.: a cidade "São Domingos" de GO é um nó e a de BA
+    é outro), então os filhos de um nó são sempre os que existem abaixo daquele caminho.
+    As opções de um nível são os rótulos dos filhos dos nós escolhidos no nível de cima.
+    """
+
+    def __init__(self, df, niveis=HIERARQUIA):
+        self.niveis = niveis
+        caminhos = df[list(niveis)].drop_duplicates()
+        self._rotulos, self._codigos_rotulo = [], []
+        self._rotulo_no = []
+        self._filhos, self._nos_por_rotulo = [], []
+
+        nos_anteriores, num_anteriores = np.zeros(len(caminhos), dtype=np.int64), 1
+        for coluna in niveis:
+            codigos, rotulos = pd.factorize(caminhos[coluna], sort=True)
+            chaves = nos_anteriores * (len(rotulos) + 1) + (codigos + 1)
+            nos, _ = pd.factorize(chaves)
+            num_nos = nos.max() + 1 if len(nos) else 0
+            _, primeiros = np.unique(nos, return_index=True)
+
+            self._rotulos.append(rotulos)
+            self._codigos_rotulo.append({rotulo: i for i, rotulo in enumerate(rotulos.tolist())})
+            self._rotulo_no.append(codigos[primeiros])
+            self._filhos.append(_agrupar(nos_anteriores[primeiros], num_anteriores))
+            self._nos_por_rotulo.append(_agrupar(codigos[primeiros], len(rotulos)))
+            nos_anteriores, num_anteriores = nos, num_nos
+
+    def opcoes(self, nivel, pais=None):
+        """Rótulos e nós do `nivel` abaixo dos nós `pais` do nível de cima (None: todos)."""
+        if pais is None:
+            return self._rotulos[nivel].tolist(), None
+        nos = _reunir(*self._filhos[nivel], pais)
+        # Marca os rótulos presentes em vez de ordenar os nós; a última posição recebe os nulos (-1)
+        presentes = np.zeros(len(self._rotulos[nivel]) + 1, dtype=bool)
+        presentes[self._rotulo_no[nivel][nos]] = True
+        return self._rotulos[nivel][presentes[:-1]].tolist(), nos
+
+    def escolher(self, nivel, nos, selecionados):
+        """Nós do `nivel` entre `nos` (None: todos) com algum dos rótulos `selecionados`."""
+        if not selecionados:
+            return nos
+        codigos = [self._codigos_rotulo[nivel][rotulo] for rotulo in selecionados if rotulo in self._codigos_rotulo[nivel]]
+        codigos = np.array(codigos, dtype=np.int64)
+        if nos is None:
+            return _reunir(*self._nos_por_rotulo[nivel], codigos)
+        return nos[np.isin(self._rotulo_no[nivel][nos], codigos)]
+
+
+def aplicar_hierarquia(df, selecoes):
+    # Linhas de `df` dentro das escolhas {coluna: valores}; colunas sem escolha não filtram
+    mascara = np.ones(len(df), dtype=bool)
+    for coluna, valores in selecoes.items():
+        if valores:
+            mascara &= df[coluna].isin(valores).to_numpy()
+    return df[mascara]
@@ -0,0 +1,242 @@
+# Indicadores e tabelas de cada página, calculados só com pandas para que possam ser
+# usados tanto pelas páginas do Streamlit quanto pelo relatório em linha de comando.
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from diagnostico.calendario import comparacao_anual, serie_mensal
+from diagnostico.evolucao import Niveis, alunos_com_melhoria as filtrar_melhoria, calcular_evolucao, funil_etapas
+
+RESPOSTAS_AJUSTADAS = {
+    'Falta de conhecimento do que fazer após a sondagem': 'Falta de conhecimento<br>do que fazer<br>após a sondagem',
+    'Falta de conhecimento sobre sondagem': 'Falta de conhecimento<br>sobre sondagem',
+    'Falta de materiais práticos para realizar a sondagem': 'Falta de materiais<br>práticos para<br>realizar a sondagem',
+    'Falta de visibilidade do nível da turma': 'Falta de visibilidade<br>do nível da turma',
+    'Não tenho dificuldade com sondagem': 'Não tenho dificuldade<br>com sondagem'
+}
+
+@dataclass
+class Resultado:
+    indicadores: dict = field(default_factory=dict)
+    tabelas: dict = field(default_factory=dict)
+
+
+def contagem_por_dia(df, coluna_data, coluna_id, nome):
+    datas = pd.to_datetime(df[coluna_data])
+    return df.groupby(datas.dt.date)[coluna_id].nunique().reset_index(name=nome)
+
+
+# ------------------------- MAIN.PY -------------------------------------
+def indicadores_logins(logins):
+    df_onboardings = logins[logins['onboarding_completo'] == 1]
+    return {
+        'total_logins': logins['id_professor'].nunique(),
+        'total_onboardings': df_onboardings['id_professor'].nunique(),
+    }
+
+
+def relatorio_logins(logins):
+    df_onboardings = logins[logins['onboarding_completo'] == 1]
+    return Resultado(
+        indicadores_logins(logins),
+        {
+            'professores_por_dia': contagem_por_dia(logins, 'data_criacao', 'id_professor', 'total_professores'),
+            'onboardings_por_dia': contagem_por_dia(df_onboardings, 'data_criacao', 'id_professor', 'total_professores'),
+        },
+    )
+
+
+# ------------------------- (0) ONBOARDING ------------------------------
+def indicadores_onboarding(respostas):
+    respondeu_todas = respostas[respostas['status_resposta'] == 'Respondeu todas']
+    nao_respondeu_todas = respostas[respostas['status_resposta'] == 'Não respondeu todas']
+    return {
+        'total_professores': respondeu_todas['id_professor'].nunique(),
+        'total_professores_n': nao_respondeu_todas['id_professor'].nunique(),
+    }
+
+
+def resumo_respostas(respostas):
+    resumo = respostas.groupby(['pergunta', 'resposta']).size().reset_index(name='count')
+    resumo['resposta_ajustada'] = resumo['resposta'].replace(RESPOSTAS_AJUSTADAS)
+    return resumo
+
+
+def indicadores_onboarding_resumo(professores_status):
+    # Mesmos indicadores de indicadores_onboarding, a partir do número de professores por status
+    por_status = professores_status.set_index('status_resposta')['professores']
+    return {
+        'total_professores': int(por_status.get('Respondeu todas', 0)),
+        'total_professores_n': int(por_status.get('Não respondeu todas', 0)),
+    }
+
+
+def resumo_respostas_status(resumo, status):
+    # Equivalente a resumo_respostas(respostas[status_resposta == status]), a partir do resumo pré-calculado
+    resumo = resumo[resumo['status_resposta'] == status].drop(columns='status_resposta').reset_index(drop=True)
+    resumo['resposta_ajustada'] = resumo['resposta'].replace(RESPOSTAS_AJUSTADAS)
+    return resumo
+
+
+def relatorio_onboarding(resumo, professores_status):
+    # Lê os mesmos datasets incrementais da página (0), sem a tabela completa de respostas
+    return Resultado(
+        indicadores_onboarding_resumo(professores_status),
+        {
+            'respostas_onboarding_completo': resumo_respostas_status(resumo, 'Respondeu todas'),
+            'respostas_onboarding_incompleto': resumo_respostas_status(resumo, 'Não respondeu todas'),
+        },
+    )
+
+
+# ------------------------- COORTES DE PROFESSORES ----------------------
+def relatorio_coortes(coortes):
+    return Resultado({'total_coortes': len(coortes)}, {'coortes_professores': coortes})
+
+
+# ------------------------- (1) PROFESSORES -----------------------------
+def indicadores_professores(turmas):
+    total_professores = turmas['id_professor'].nunique()
+    professores_onboarding_completo = turmas[turmas['flag_onboarding'] == 'Onboarding Completo']['id_professor'].nunique()
+    return {
+        'total_professores': turmas[turmas['id_professor'] != 0]['id_professor'].nunique(),
+        'total_turmas': turmas[turmas['id_turma'] != 0]['id_turma'].nunique(),
+        'total_alunos': turmas[turmas['id_aluno'] != 0]['id_aluno'].nunique(),
+        'professores_onboarding_completo': professores_onboarding_completo,
+        # Cálculo seguro da taxa (evita divisão por zero)
+        'taxa_onboarding_completo': (professores_onboarding_completo / total_professores * 100) if total_professores > 0 else 0,
+    }
+
+
+def tempo_cadastro_por_dia(turmas):
+    # Minutos entre o primeiro e o último cadastro de professor de cada dia
+    datas = pd.to_datetime(turmas['data_cadastro_professor'])
+    por_dia = datas.groupby(datas.dt.date).agg(['min', 'max'])
+    tempo = (por_dia['max'] - por_dia['min']).dt.total_seconds() / 60
+    return tempo.rename_axis('data_cadastro_professor').reset_index(name='tempo_medio_cadastro')
+
+
+def relatorio_professores(turmas):
+    return Resultado(
+        indicadores_professores(turmas),
+        {
+            'professores_por_dia': contagem_por_dia(turmas, 'data_cadastro_professor', 'id_professor', 'total_professores'),
+            'professores_por_estado': turmas.groupby('estado_escola')['id_professor'].nunique().reset_index(name='total_professores'),
+            'turmas_por_estado': turmas.groupby('estado_escola', dropna=False)['id_turma'].nunique().reset_index(name='total_turmas'),
+        },
+    )
+
+
+# ------------------------- (2) TURMAS ----------------------------------
+def indicadores_turmas(turmas):
+    return {
+        'total_professores': turmas['id_professor'].nunique(),
+        'total_turmas': turmas['id_turma'].nunique(),
+        'total_alunos': turmas['id_aluno'].nunique(),
+    }
+
+
+def relatorio_turmas(turmas):
+    return Resultado(
+        indicadores_turmas(turmas),
+        {'professores_por_dia': contagem_por_dia(turmas, 'data_cadastro_professor', 'id_professor', 'total_professores')},
+    )
+
+
+# ------------------------- (3) E (5) TURMAS COM MELHORIA ---------------
+def indicadores_evidencia(turmas):
+    df_filtrado = turmas[turmas['porcentagem_melhoria'] >= 50]
+    return {
+        'soma_alunos': turmas['total_alunos'].sum(),
+        'alunos_evid': turmas['alunos_com_melhoria'].sum(),
+        'total_professores': turmas['id_professor'].nunique(),
+        'total_turmas': turmas['id_turma'].nunique(),
+        'total_professores_50': df_filtrado['id_professor'].nunique(),
+    }
+
+
+def evidencia_por_mes(turmas):
+    # Série mensal (ano, mês) das páginas (3) e (5), em ordem de calendário
+    return serie_mensal(
+        turmas,
+        total_sondagens=('id_turma', 'size'),
+        total_professores=('id_professor', 'nunique'),
+        total_turmas=('id_turma', 'nunique'),
+        porcentagem_melhoria=('porcentagem_melhoria', 'mean'),
+    )
+
+
+def relatorio_evidencia(turmas):
+    por_mes = evidencia_por_mes(turmas)
+    por_estado = turmas.groupby('estado_escola').agg(
+        total_turmas=('id_turma', 'nunique'),
+        porcentagem_melhoria=('porcentagem_melhoria', 'mean'),
+    ).reset_index()
+    return Resultado(indicadores_evidencia(turmas), {
+        'evidencia_por_mes': por_mes,
+        'sondagens_ano_a_ano': comparacao_anual(por_mes, 'total_sondagens').reset_index(names='mes'),
+        'evidencia_por_estado': por_estado,
+    })
+
+
+# ------------------------- (4) HIPÓTESES -------------------------------
+def indicadores_hipoteses(df):
+    return {
+        'total_alunos': df['id_aluno'].nunique(),
+        'total_turmas': df['id_turma'].nunique(),
+        'total_escolas': df['cod_inep'].nunique(),
+    }
+
+
+def resumo_hipoteses(df):
+    return df.groupby(['num_sondagem', 'nome_hipotese']).size().unstack(fill_value=0)
+
+
+def evolucao_hipoteses(df, niveis):
+    # Alunos sem sondagem vêm do LEFT JOIN com a hipótese nula e ficam de fora
+    sondagens = df.dropna(subset=['ordem_hipotese', 'data_criacao_sondagem'])
+    return calcular_evolucao(
+        sondagens['id_aluno'], sondagens['data_criacao_sondagem'], sondagens['ordem_hipotese'], niveis,
+    )
+
+
+def funil_hipoteses(df, niveis, definicao='amplitude'):
+    # Ids dos alunos que melhoraram e quantos alunos passaram por cada etapa. Roda no pool de processos:
+    # devolve só ids e contagens, e não as métricas de cada aluno, para o resultado voltar pequeno
+    evolucao = evolucao_hipoteses(df, niveis)
+    return filtrar_melhoria(evolucao, definicao).index.to_numpy(), funil_etapas(evolucao, niveis)
+
+
+def relatorio_hipoteses(df, niveis_hipoteses):
+    niveis = Niveis.de_tabela(niveis_hipoteses)
+    evolucao = evolucao_hipoteses(df, niveis)
+    etapas = funil_etapas(evolucao, niveis)
+    indicadores = indicadores_hipoteses(df)
+    indicadores['total_alunos_com_melhoria'] = len(filtrar_melhoria(evolucao))
+    indicadores['ganho_liquido_medio'] = round(evolucao.alunos['ganho_liquido'].mean(), 2)
+    indicadores['mediana_dias_ate_alfabetica'] = evolucao.alunos['dias_ate_alfabetica'].median()
+    funil = pd.DataFrame({'etapa': list(etapas), 'alunos': list(etapas.values())})
+    return Resultado(indicadores, {
+        'resumo_hipoteses': resumo_hipoteses(df).reset_index(),
+        'funil_hipoteses': funil,
+        'transicoes_hipoteses': evolucao.transicoes.rename_axis('de').reset_index(),
+    })
+
+
+# Relatórios de cada página: (dataset usado, função que calcula os indicadores e tabelas)
+RELATORIOS = {
+    'main': ('logins', relatorio_logins),
+    'onboarding': ('respostas_onboarding_resumo', relatorio_onboarding),
+    'professores': ('professores', relatorio_professores),
+    'coortes_professores': ('coortes_professores', relatorio_coortes),
+    'turmas': ('turmas', relatorio_turmas),
+    'turmas_com_melhoria': ('turmas_melhoria', relatorio_evidencia),
+    'turmas_com_melhoria_aplicavel': ('turmas_melhoria_aplicavel', relatorio_evidencia),
+    'hipoteses': ('hipoteses', relatorio_hipoteses),
+}
+
+# Datasets passados a cada relatório depois do principal
+AUXILIARES = {
+    'onboarding': ['professores_onboarding_status'],
+    'hipoteses': ['niveis_hipoteses'],
+}
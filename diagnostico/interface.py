@@ -0,0 +1,199 @@
+import os
+
+import plotly.express as px
+import plotly.graph_objs as go
+import streamlit as st
+
+from diagnostico.coortes import ETAPAS
+from diagnostico.dados import (
+    TempoEsgotado, atualizado_em, carregar, entrada_dataset, hierarquia_dataset, metricas, versao_snapshot,
+)
+from diagnostico.exportacao import FORMATOS, exportar, nova_sessao, novo_destino, remover_exportacao
+from diagnostico.geografia import METRICAS, UFS, geometrias, ids_municipios
+from diagnostico.hierarquia import HIERARQUIA, ROTULOS
+
+
+def exibir_atualizacao(*nomes):
+    data = atualizado_em(*nomes)
+    if data is not None:
+        versao = versao_snapshot()
+        snapshot = f" (snapshot {versao})" if versao is not None else ""
+        st.caption(f"Dados atualizados em {data:%d/%m/%Y às %H:%M}{snapshot}")
+
+
+def exibir_metricas():
+    with st.sidebar.expander("Métricas do cache"):
+        for grupo, valores in metricas().items():
+            st.caption(
+                f"{grupo.capitalize()}: {valores['execucoes']} execuções, "
+                f"{valores['duplicatas_evitadas']} duplicatas evitadas, "
+                f"{valores['em_andamento']} em andamento"
+            )
+
+
+def exibir_indisponivel(secao):
+    st.warning(
+        f"Os dados de {secao} demoraram demais para carregar e a consulta foi cancelada. "
+        "As demais seções continuam disponíveis; tente novamente em alguns minutos."
+    )
+
+
+def carregar_secao(nome, secao):
+    # Devolve None (e mostra um aviso no lugar da seção) se a consulta estourar o tempo máximo
+    try:
+        return carregar(nome)
+    except TempoEsgotado:
+        exibir_indisponivel(secao)
+        return None
+
+
+def selecionar_hierarquia(nome, niveis=HIERARQUIA, local=st.sidebar, titulo="Filtrar por {}:", df=None):
+    """Multiselects em cascata para os `niveis` da hierarquia do dataset `nome`.
+
+    As opções de cada nível já vêm restritas às escolhas dos níveis de cima. Sem `df`, vêm do
+    índice da versão atual do dataset inteiro, que ignora os demais filtros da página; com `df`
+    (o DataFrame que as escolhas vão filtrar), só aparecem opções com linhas nele.
+    Devolve {coluna: valores escolhidos}.
+    """
+    indice = hierarquia_dataset(nome, df)
+    selecoes, nos = {}, None
+    for nivel, coluna in enumerate(HIERARQUIA):
+        opcoes, nos = indice.opcoes(nivel, nos)
+        if coluna not in niveis:
+            continue
+        chave = f"hierarquia_{nome}_{coluna}"
+        # Escolhas que deixaram de existir (mudou um nível de cima) saem antes de desenhar o widget
+        if chave in st.session_state:
+            existentes = set(opcoes)
+            st.session_state[chave] = [valor for valor in st.session_state[chave] if valor in existentes]
+        selecoes[coluna] = local.multiselect(titulo.format(ROTULOS[coluna]), opcoes, key=chave)
+        nos = indice.escolher(nivel, nos, selecoes[coluna])
+    return selecoes
+
+
+def exibir_exportacao(nome):
+    # Gera o arquivo em lotes com os dados do snapshot da página, na pasta da sessão, e oferece o download
+    with st.expander("Clique aqui para exportar os microdados"):
+        formato = st.radio("Formato", list(FORMATOS), horizontal=True, key=f"exportacao_formato_{nome}")
+        chave_arquivo = f"exportacao_arquivo_{nome}"
+
+        if st.button("Gerar arquivo", key=f"exportacao_gerar_{nome}"):
+            # O arquivo anterior desta sessão não será mais oferecido
+            remover_exportacao(st.session_state.pop(chave_arquivo, None))
+            if 'exportacao_sessao' not in st.session_state:
+                st.session_state['exportacao_sessao'] = nova_sessao()
+            destino = novo_destino(st.session_state['exportacao_sessao'], nome, formato, versao_snapshot())
+            barra = st.progress(0.0, text="Exportando...")
+
+            try:
+                total = len(entrada_dataset(nome).dados)
+
+                def progresso(linhas):
+                    barra.progress(min(linhas / total, 1.0) if total else 0.0, text=f"{linhas} linhas exportadas")
+
+                linhas = exportar(nome, destino, formato, progresso=progresso)
+            except TempoEsgotado:
+                remover_exportacao(destino)
+                exibir_indisponivel("exportação")
+            else:
+                barra.progress(1.0, text=f"{linhas} linhas exportadas")
+                st.session_state[chave_arquivo] = destino
+
+        destino = st.session_state.get(chave_arquivo)
+        if not destino or not os.path.exists(destino):
+            return
+        with open(destino, 'rb') as arquivo:
+            st.download_button(
+                "Baixar arquivo",
+                arquivo,
+                file_name=os.path.basename(destino),
+                key=f"exportacao_baixar_{nome}",
+            )
+
+
+def exibir_coortes():
+    # Grade de coortes (semana de cadastro x etapa do funil), lida pronta do cache
+    coortes = carregar_secao('coortes_professores', 'coortes de professores')
+    if coortes is None:
+        return
+
+    st.markdown("### Funil de Professores por Semana de Cadastro")
+    exibir_atualizacao('coortes_professores')
+    semanas = coortes['coorte'].dt.strftime('%d/%m/%Y')
+    rotulos = [rotulo for _, rotulo in ETAPAS]
+    porcentagens = coortes[[f'pct_{etapa}' for etapa, _ in ETAPAS]].to_numpy()
+    quantidades = coortes[[etapa for etapa, _ in ETAPAS]].to_numpy()
+
+    fig = go.Figure(go.Heatmap(
+        z=porcentagens,
+        x=rotulos,
+        y=semanas,
+        customdata=quantidades,
+        text=porcentagens,
+        texttemplate='%{text:.0f}%',
+        colorscale='Blues',
+        zmin=0,
+        zmax=100,
+        hovertemplate='Semana de %{y}<br>%{x}: %{customdata} professores (%{z:.2f}%)<extra></extra>',
+    ))
+    fig.update_layout(
+        xaxis_title='Etapa', yaxis_title='Semana de cadastro', yaxis_autorange='reversed',
+        height=max(400, 25 * len(coortes)),
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+    with st.expander("Clique aqui para a tabela de coortes"):
+        st.dataframe(coortes)
+
+
+def exibir_mapa(chave):
+    # Mapa coroplético dos indicadores por UF (ou pelos municípios de uma UF), lidos prontos do cache
+    rollup = carregar_secao('rollup_geografico', 'mapa')
+    if rollup is None:
+        return
+
+    st.markdown("### Mapa por Estado e Município")
+    exibir_atualizacao('rollup_geografico')
+    col1, col2 = st.columns(2)
+    metrica = col1.selectbox("Indicador", list(METRICAS), format_func=METRICAS.get, key=f"mapa_metrica_{chave}")
+    siglas = sorted(rollup.loc[rollup['nivel'] == 'uf', 'sigla_uf'])
+    regiao = col2.selectbox("Região", ['Brasil', *siglas], key=f"mapa_regiao_{chave}")
+
+    if regiao == 'Brasil':
+        dados = rollup[rollup['nivel'] == 'uf']
+        geojson = geometrias('uf', 'brasil')
+        ids = dados['codigo_uf'].astype(str)
+    else:
+        codigo_uf = UFS[regiao][0]
+        dados = rollup[(rollup['nivel'] == 'municipio') & (rollup['codigo_uf'] == codigo_uf)]
+        geojson = geometrias('municipio', 'estado', codigo_uf)
+        ids = dados['chave_municipio'].map(ids_municipios(geojson)) if geojson is not None else None
+
+    if geojson is not None:
+        ids = ids.where(ids.isin({feature['id'] for feature in geojson['features']}))
+
+    # Sem o GeoJSON local (ou sem nenhuma área reconhecida), mostra os mesmos números em barras
+    if geojson is None or ids.isna().all():
+        st.caption("Geometrias não encontradas; defina GEOJSON_UF e GEOJSON_MUNICIPIOS para ver o mapa.")
+        fig = px.bar(dados.sort_values(metrica, ascending=False), x='nome', y=metrica, labels={'nome': '', metrica: METRICAS[metrica]})
+        st.plotly_chart(fig, use_container_width=True)
+        return
+
+    reconhecidas = ids.notna()
+    fig = go.Figure(go.Choropleth(
+        geojson=geojson,
+        locations=ids[reconhecidas],
+        featureidkey='id',
+        z=dados.loc[reconhecidas, metrica],
+        text=dados.loc[reconhecidas, 'nome'],
+        colorscale='Blues',
+        marker_line_width=0.5,
+        colorbar_title=METRICAS[metrica],
+        hovertemplate='<b>%{text}</b><br>%{z}<extra></extra>',
+    ))
+    fig.update_geos(fitbounds='locations', visible=False)
+    fig.update_layout(height=600, margin={'l': 0, 'r': 0, 't': 0, 'b': 0})
+    st.plotly_chart(fig, use_container_width=True)
+
+    with st.expander("Clique aqui para a tabela do mapa"):
+        st.dataframe(dados)
@@ -0,0 +1,73 @@
+# Cálculo da melhoria por turma a partir da leitura única das sondagens (fatos_sondagem),
+# no lugar das CTEs alunos_totais / alunos_melhoria / alunos_com_melhoria de cada página.
+import numpy as np
+import pandas as pd
+
+from diagnostico.evolucao import DEFINICOES_MELHORIA, Niveis, calcular_evolucao
+
+# Variantes calculadas sobre os mesmos fatos; uma nova variante não gera outra consulta ao banco
+VARIANTES = {
+    'turmas_melhoria': {},
+    # Página (5): só conta na turma quem teve hipótese aplicável (ordem > 1, ou seja, diferente de "Não se aplica")
+    'turmas_melhoria_aplicavel': {'ordem_minima_total': 2},
+}
+
+
+def preparar_fatos(fatos):
+    # Chaves inteiras pequenas para que os groupby trabalhem sobre inteiros e não sobre objetos
+    fatos = fatos.copy()
+    for col in ('id_aluno', 'id_turma', 'id_professor', 'id_avaliacao'):
+        fatos[col] = pd.to_numeric(fatos[col], downcast='integer')
+    fatos['mes_sondagem'] = pd.to_numeric(fatos['mes_sondagem'], errors='coerce').fillna(0).astype(np.int8)
+    fatos['ordem_hipotese'] = fatos['ordem_hipotese'].astype(np.int8)
+    fatos['data_sondagem'] = pd.to_datetime(fatos['data_sondagem'])
+    # Ano da sondagem (pela data de criação), que junto com o mês forma a chave do calendário
+    fatos['ano_sondagem'] = fatos['data_sondagem'].dt.year.fillna(0).astype(np.int16)
+    return fatos
+
+
+def progresso_por_aluno(fatos, niveis_hipoteses):
+    # Métricas de evolução de cada aluno com turma, professor, ano e mês da primeira sondagem
+    niveis = Niveis.de_tabela(niveis_hipoteses)
+    evolucao = calcular_evolucao(fatos['id_aluno'], fatos['data_sondagem'], fatos['ordem_hipotese'], niveis)
+    primeiras = fatos.iloc[evolucao.linhas_iniciais]
+    alunos = evolucao.alunos.copy()
+    for col in ('id_turma', 'id_professor', 'ano_sondagem', 'mes_sondagem'):
+        alunos[col] = primeiras[col].to_numpy()
+    return alunos
+
+
+def melhoria_por_turma(fatos, turmas, niveis_hipoteses, ordem_minima_total=None, definicao='amplitude'):
+    """Alunos com melhoria por turma, ano e mês (inteiros; ver calendario), para as páginas (3) e (5).
+
+    A melhoria de cada aluno segue `definicao` (ver evolucao.DEFINICOES_MELHORIA). O total
+    de alunos da turma é o número de alunos cadastrados ou, com `ordem_minima_total`,
+    só os que tiveram alguma hipótese com ordem maior ou igual a esse valor.
+    """
+    alunos = progresso_por_aluno(fatos, niveis_hipoteses)
+    com_melhoria = alunos[DEFINICOES_MELHORIA[definicao](alunos)]
+    contagem = (
+        com_melhoria.groupby(['id_turma', 'id_professor', 'ano_sondagem', 'mes_sondagem'])
+        .size()
+        .reset_index(name='alunos_com_melhoria')
+    )
+
+    turmas = turmas[turmas['cod_inep'].notna()]
+    if ordem_minima_total is None:
+        totais = turmas.set_index('id_turma')['total_alunos']
+    else:
+        aplicaveis = fatos.loc[fatos['ordem_hipotese'] >= ordem_minima_total, ['id_turma', 'id_aluno']]
+        totais = aplicaveis.groupby('id_turma')['id_aluno'].nunique()
+
+    resultado = contagem.merge(
+        turmas.drop(columns=['id_professor', 'total_alunos', 'cod_inep']), on='id_turma', how='inner',
+    )
+    resultado['total_alunos'] = resultado['id_turma'].map(totais).fillna(0).astype(int)
+    resultado = resultado[resultado['total_alunos'] > 0].copy()
+    resultado['porcentagem_melhoria'] = (resultado['alunos_com_melhoria'] / resultado['total_alunos'] * 100).round(2)
+
+    return resultado[[
+        'id_turma', 'cod_inep_turma', 'nome_turma', 'ano_turma', 'nome_escola', 'cidade_escola',
+        'estado_escola', 'id_professor', 'total_alunos', 'alunos_com_melhoria', 'porcentagem_melhoria',
+        'ano_sondagem', 'mes_sondagem',
+    ]].reset_index(drop=True)
@@ -0,0 +1,39 @@
+# Detecção de mudanças nas tabelas de origem: cada dataset do snapshot guarda a assinatura das suas
+# tabelas (diretas ou, pelas DEPENDENCIAS, indiretas) do momento em que foi materializado, e o
+# aquecimento só refaz os datasets cuja assinatura mudou.
+import json
+
+from diagnostico.consultas import DEPENDENCIAS, TABELAS
+
+TODAS_AS_TABELAS = sorted({tabela for tabelas in TABELAS.values() for tabela in tabelas})
+
+
+def tabelas_do_dataset(nome):
+    # Tabelas de origem do dataset; None se alguma parte dele não tem as tabelas declaradas
+    if nome in DEPENDENCIAS:
+        tabelas = set()
+        for dep in DEPENDENCIAS[nome]:
+            tabelas_dep = tabelas_do_dataset(dep)
+            if tabelas_dep is None:
+                return None
+            tabelas |= tabelas_dep
+        return tabelas
+    return set(TABELAS[nome]) if nome in TABELAS else None
+
+
+def assinatura_dataset(nome, assinaturas_tabelas):
+    """Assinatura do dataset a partir de {tabela: assinatura}; None quando não dá para saber.
+
+    Datasets sem tabelas declaradas, ou com alguma tabela sem assinatura (ex.: sem permissão
+    no information_schema), não têm assinatura e são sempre considerados alterados.
+    """
+    tabelas = tabelas_do_dataset(nome)
+    if tabelas is None or assinaturas_tabelas is None or not tabelas <= assinaturas_tabelas.keys():
+        return None
+    return json.dumps([[tabela, assinaturas_tabelas[tabela]] for tabela in sorted(tabelas)])
+
+
+def afetado(nome, anteriores, atuais):
+    # `anteriores`: {dataset: assinatura} do snapshot; `atuais`: {tabela: assinatura} lidas agora
+    atual = assinatura_dataset(nome, atuais)
+    return atual is None or anteriores.get(nome) != atual
@@ -0,0 +1,85 @@
+# Respostas do questionário de onboarding agregadas por professor, mantidas de forma incremental a
+# partir do id (auto incremento) de questionnaire_response. O resumo por status, pergunta e resposta e a
+# contagem de professores por status são calculados a partir delas, como datasets derivados.
+import os
+import threading
+import time
+
+import pandas as pd
+
+from diagnostico.consultas import (
+    marca_respostas_onboarding_query, respostas_onboarding_incremental_query, respostas_onboarding_query,
+)
+
+# De quanto em quanto tempo as respostas são relidas do zero (respostas apagadas ou editadas não mudam a marca)
+RECONSTRUCAO_PADRAO = int(os.getenv('ONBOARDING_RECONSTRUCAO', '86400'))  # segundos
+# Quantos ids antes da marca são relidos a cada atualização: uma resposta com id menor pode ser gravada
+# (commit) depois de uma com id maior, e reler um professor não conta nada em dobro
+SOBREPOSICAO_PADRAO = int(os.getenv('ONBOARDING_SOBREPOSICAO', '1000'))
+
+CHAVES = ['status_resposta', 'pergunta', 'resposta']
+
+
+def _por_professor(respostas):
+    return respostas.groupby(['id_professor'] + CHAVES).size().rename('count').reset_index()
+
+
+def resumo_respostas(por_professor):
+    # Contagem de respostas por status, pergunta e resposta
+    resumo = por_professor.groupby(CHAVES)['count'].sum()
+    return resumo[resumo > 0].astype(int).rename('count').reset_index()
+
+
+def status_professores(por_professor):
+    # Quantos professores há em cada status de resposta
+    status = por_professor.drop_duplicates('id_professor')['status_resposta'].value_counts()
+    return status.rename_axis('status_resposta').rename('professores').reset_index()
+
+
+class RespostasOnboarding:
+    """Contagem das respostas do onboarding de cada professor, por status, pergunta e resposta.
+
+    Numa atualização, os professores com respostas novas desde a última marca são lidos de
+    novo e as linhas deles são substituídas, já que uma resposta nova pode mudar o status do
+    professor e, com ele, todas as suas respostas. Cada atualização devolve um DataFrame
+    novo; os anteriores não são alterados.
+    """
+
+    def __init__(self, ler, reconstrucao=RECONSTRUCAO_PADRAO, sobreposicao=SOBREPOSICAO_PADRAO):
+        self._ler = ler
+        self.reconstrucao = reconstrucao
+        self.sobreposicao = sobreposicao
+        self._lock = threading.Lock()
+        self._marca = None
+        self._reconstruido_em = None
+        self._por_professor = None
+
+    def _marca_atual(self):
+        return self._ler(marca_respostas_onboarding_query)['marca'].iloc[0]
+
+    def _reconstruir(self):
+        marca = self._marca_atual()
+        self._por_professor = _por_professor(self._ler(respostas_onboarding_query))
+        self._marca = marca
+        self._reconstruido_em = time.monotonic()
+
+    def _atualizar_incremental(self):
+        # A marca nova é lida antes das respostas: o que chegar entre as duas leituras é lido de novo
+        # na próxima vez, sem contar em dobro, porque as linhas do professor são sempre substituídas
+        marca = self._marca_atual()
+        if pd.isna(marca):
+            return
+        desde = int(self._marca) - self.sobreposicao
+        novos = _por_professor(self._ler(respostas_onboarding_incremental_query, {'marca': desde}))
+        afetados = self._por_professor['id_professor'].isin(novos['id_professor'].unique())
+        self._por_professor = pd.concat([self._por_professor[~afetados], novos], ignore_index=True)
+        self._marca = max(int(marca), int(self._marca))
+
+    def atualizar(self):
+        with self._lock:
+            if (self._marca is None or pd.isna(self._marca)
+                    or time.monotonic() - self._reconstruido_em > self.reconstrucao):
+                self._reconstruir()
+            else:
+                self._atualizar_incremental()
+            return self._por_professor
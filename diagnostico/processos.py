@@ -0,0 +1,122 @@
+# Transformações pesadas em pandas executadas num pool de processos, para que o cálculo de uma
+# sessão não segure o GIL do processo do Streamlit e trave as demais sessões.
+#
+# O DataFrame de entrada vai para o processo filho em formato Arrow IPC numa área de memória
+# compartilhada, sem pickle nem envio pelo pipe; o filho ainda copia as colunas ao montar o DataFrame.
+# O resultado volta por pickle, então as transformações devolvem só agregados, ids e contagens.
+# Transformações leves (um groupby) rodam no próprio processo: o envio custaria mais que o cálculo.
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from diagnostico.indicadores import funil_hipoteses
+
+logger = logging.getLogger(__name__)
+
+# Número de processos do pool; 0 executa as transformações no próprio processo
+PROCESSOS = int(os.getenv('PROCESSOS_TRANSFORMACAO', '2'))
+
+# Transformações que podem ser enviadas ao pool: nome -> função (de módulo, para o processo filho importar)
+TRANSFORMACOES = {
+    'funil_hipoteses': funil_hipoteses,
+}
+
+_lock = threading.Lock()
+_pool = None
+
+
+def _arrow_disponivel():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _obter_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            # spawn: o processo do Streamlit tem muitas threads, e fork com threads ativas não é seguro
+            _pool = ProcessPoolExecutor(max_workers=PROCESSOS, mp_context=multiprocessing.get_context('spawn'))
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+    return _pool
+
+
+def _para_memoria_compartilhada(df):
+    import pyarrow as pa
+
+    tabela = pa.Table.from_pandas(df, preserve_index=True)
+    # Primeiro mede o tamanho do stream e depois escreve direto na área compartilhada, sem cópia intermediária
+    medidor = pa.MockOutputStream()
+    with pa.ipc.new_stream(medidor, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+    tamanho = medidor.size()
+
+    memoria = shared_memory.SharedMemory(create=True, size=max(tamanho, 1))
+    destino = pa.FixedSizeBufferWriter(pa.py_buffer(memoria.buf))
+    with pa.ipc.new_stream(destino, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+    destino.close()
+    return memoria, tamanho
+
+
+def _anexar(nome):
+    # O processo filho só lê a área; quem cria é quem remove (unlink). Os filhos do pool usam o mesmo
+    # resource_tracker do processo principal, então o registro feito ao anexar é desfeito pelo unlink.
+    try:
+        return shared_memory.SharedMemory(name=nome, track=False)
+    except TypeError:  # Python < 3.13 não tem o parâmetro track
+        return shared_memory.SharedMemory(name=nome)
+
+
+def _executar_arrow(nome, nome_memoria, tamanho, args, kwargs):
+    import pyarrow as pa
+
+    memoria = _anexar(nome_memoria)
+    try:
+        # O Arrow lê a tabela direto da memória compartilhada; o to_pandas copia as colunas para o DataFrame
+        tabela = pa.ipc.open_stream(pa.py_buffer(memoria.buf[:tamanho])).read_all()
+        df = tabela.to_pandas()
+        del tabela
+        return TRANSFORMACOES[nome](df, *args, **kwargs)
+    finally:
+        df = None
+        try:
+            memoria.close()
+        except BufferError:
+            # Algum objeto ainda aponta para a área; ela é liberada quando ele for coletado
+            pass
+
+
+def _executar_pickle(nome, df, args, kwargs):
+    return TRANSFORMACOES[nome](df, *args, **kwargs)
+
+
+def executar(nome, df, *args, **kwargs):
+    """Executa a transformação `nome` sobre `df` no pool de processos e devolve o resultado.
+
+    Sem pool configurado (PROCESSOS_TRANSFORMACAO=0) a transformação roda no próprio processo.
+    Sem pyarrow, o DataFrame vai para o pool por pickle.
+    """
+    if PROCESSOS <= 0:
+        return TRANSFORMACOES[nome](df, *args, **kwargs)
+    pool = _obter_pool()
+    if not _arrow_disponivel():
+        return pool.submit(_executar_pickle, nome, df, args, kwargs).result()
+
+    try:
+        memoria, tamanho = _para_memoria_compartilhada(df)
+    except Exception as e:
+        # Colunas que o Arrow não converte (ex.: tipos misturados) seguem pelo caminho com pickle
+        logger.debug("Transformação %s enviada por pickle: %s", nome, e)
+        return pool.submit(_executar_pickle, nome, df, args, kwargs).result()
+    try:
+        return pool.submit(_executar_arrow, nome, memoria.name, tamanho, args, kwargs).result()
+    finally:
+        memoria.close()
+        memoria.unlink()
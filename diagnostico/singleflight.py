@@ -0,0 +1,60 @@
+import threading
+
+
+class _Chamada:
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.erro = None
+
+
+class SingleFlight:
+    """Deduplica chamadas idênticas em andamento.
+
+    Enquanto uma chamada para a chave está em execução, as demais threads que
+    pedem a mesma chave esperam por ela e recebem o mesmo resultado (ou o mesmo erro).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._chamadas = {}
+        self.execucoes = 0
+        self.duplicatas_evitadas = 0
+
+    def em_andamento(self, chave):
+        return chave in self._chamadas
+
+    def executar(self, chave, funcao):
+        with self._lock:
+            chamada = self._chamadas.get(chave)
+            dono = chamada is None
+            if dono:
+                chamada = self._chamadas[chave] = _Chamada()
+                self.execucoes += 1
+            else:
+                self.duplicatas_evitadas += 1
+
+        if not dono:
+            chamada.evento.wait()
+            if chamada.erro is not None:
+                raise chamada.erro
+            return chamada.resultado
+
+        try:
+            chamada.resultado = funcao()
+        except BaseException as e:
+            chamada.erro = e
+            raise
+        finally:
+            with self._lock:
+                del self._chamadas[chave]
+            chamada.evento.set()
+        return chamada.resultado
+
+    def metricas(self):
+        with self._lock:
+            return {
+                'execucoes': self.execucoes,
+                'duplicatas_evitadas': self.duplicatas_evitadas,
+                'em_andamento': len(self._chamadas),
+            }
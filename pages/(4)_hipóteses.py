@@ -1,143 +1,23 @@
 import streamlit as st
 import pandas as pd
-from sqlalchemy import create_engine
-import os 
-from dotenv import load_dotenv
-from pandas.api.types import is_datetime64_any_dtype, is_numeric_dtype
 import plotly.graph_objs as go
 
-load_dotenv()
-# ------------------------- CONEXÃO COM O BANCO DE DADOS -----------------
-user = os.getenv('DB_USER')
-password = os.getenv('DB_PASSWORD')
-host = os.getenv('DB_HOST')
-database = os.getenv('DB_NAME')
-
-connection_string = f'mysql+pymysql://{user}:{password}@{host}/{database}'
-engine = create_engine(connection_string)
-
-
-query = """
-WITH alunos_totais AS (
-    SELECT 
-        c.id AS turma_id,
-        c.name AS nome_turma,
-        t.id AS professor_id,
-        COUNT(DISTINCT s.id) AS total_alunos
-    FROM 
-        class c
-    INNER JOIN 
-        student s ON s.class_id = c.id
-    INNER JOIN
-        teacher t ON t.id = c.teacher_id
-    GROUP BY 
-        c.id, c.name, t.id
-),
-contagem_sondagens AS (
-    SELECT 
-        c.id AS turma_id,
-        COUNT(DISTINCT da.id) AS sondagens_realizadas
-    FROM 
-        diagnostic_assessment da
-    INNER JOIN 
-        class c ON da.class_id = c.id
-    INNER JOIN 
-        teacher t ON da.teacher_id = t.id
-    GROUP BY 
-        c.id
-),
-alunos_detalhes AS (
-    SELECT 
-        s.id AS aluno_id,
-        s.name AS nome_aluno,
-        c.id AS turma_id,
-        c.name AS nome_turma,
-        c.year AS ano_turma,
-        t.id AS professor_id,
-        sc.name AS nome_escola,
-        sc.municipio AS cidade_escola,
-        sc.uf AS estado_escola,
-        s.created_at AS data_cadastro_aluno,
-        t.onboarding_completed
-    FROM 
-        student s
-    INNER JOIN 
-        class c ON s.class_id = c.id
-    INNER JOIN 
-        teacher t ON t.id = c.teacher_id
-    LEFT JOIN 
-        school sc ON c.cod_inep = sc.cod_inep
-),
-ranked_hypotheses AS (
-    SELECT
-        das.student_id,
-        s.name AS nome_aluno,
-        s.class_id AS id_turma,
-        t.id AS id_professor,
-        t.auth_id AS id_nova_escola,
-        c.name AS nome_turma,
-        c.year AS ano_turma,
-        sc.cod_inep AS cod_inep,
-        sc.name AS nome_escola,
-        sc.municipio AS cidade_escola,
-        sc.uf AS estado_escola,
-        dh.name AS nome_hipotese,
-        da.month AS mes_de_aplicacao,
-        da.created_at,
-        da.updated_at,
-        ROW_NUMBER() OVER(PARTITION BY das.student_id ORDER BY da.created_at ASC) AS num_sondagem
-    FROM
-        diagnostic_assessment_students das
-    INNER JOIN
-        diagnostic_assessment da ON das.diagnostic_assessment_id = da.id
-    INNER JOIN
-        diagnostic_assessment_type_hypothesis dh ON das.hypothesis_id = dh.id
-    INNER JOIN
-        student s ON das.student_id = s.id
-    INNER JOIN
-        class c ON s.class_id = c.id
-    INNER JOIN
-        teacher t ON t.id = c.teacher_id  
-    INNER JOIN
-        school sc ON c.cod_inep = sc.cod_inep
-    WHERE t.auth_id NOT IN ('3','6','18','64','1466346', '1581795','175689','1980922','2051263','2241909','2347872','2607842','2988478','3457137','3693288','3693431','3912304','4681737','4813648','5106338','5326020','5331581','5722986','5726715','5740041','5844577','6132779', '6183405', '6361801','6447188','6470829','6491287')
-)
-SELECT 
-    ad.turma_id AS id_turma,
-    ad.nome_turma AS nome_turma,
-    ad.ano_turma,
-    ad.professor_id AS id_professor,
-    ad.nome_escola,
-    ad.cidade_escola,
-    ad.estado_escola,
-    ad.aluno_id AS id_aluno,
-    ad.nome_aluno,
-    ad.data_cadastro_aluno,
-    CASE 
-        WHEN ad.onboarding_completed = 1 THEN 'Onboarding Completo'
-        ELSE 'Onboarding Não Completo'
-    END AS flag_onboarding,
-    CASE 
-        WHEN ad.turma_id IS NOT NULL THEN 'Tem Turma'
-        ELSE 'Sem Turma'
-    END AS flag_turma,
-    COALESCE(cs.sondagens_realizadas, 0) AS flag_sondagens,  -- Número de sondagens realizadas (0 se nenhuma)
-    rh.nome_hipotese,
-    rh.mes_de_aplicacao,
-    rh.created_at AS data_criacao_sondagem,
-    rh.updated_at AS data_atualizacao_sondagem,
-    rh.num_sondagem,
-    rh.cod_inep
-FROM 
-    alunos_detalhes ad
-LEFT JOIN 
-    contagem_sondagens cs ON ad.turma_id = cs.turma_id  -- Contagem de sondagens por turma
-LEFT JOIN 
-    ranked_hypotheses rh ON ad.aluno_id = rh.student_id  -- Dados de sondagens para cada aluno
-ORDER BY 
-    ad.turma_id, ad.aluno_id, rh.num_sondagem;
-"""
-df = pd.read_sql(query, engine)
+from diagnostico.aquecimento import iniciar_aquecimento
+from diagnostico.calendario import nome_mes, numero_mes
+from diagnostico.filtros import filter_dataframe
+from diagnostico.dados import carregar, estatisticas_dataset, fixar_snapshot, niveis_hipoteses, transicoes_hipoteses
+from diagnostico.hierarquia import aplicar_hierarquia
+from diagnostico.indicadores import indicadores_hipoteses, resumo_hipoteses
+from diagnostico.processos import executar
+from diagnostico.interface import carregar_secao, exibir_atualizacao, exibir_exportacao, selecionar_hierarquia
+
+iniciar_aquecimento()
+# Todas as leituras desta execução vêm do mesmo snapshot dos dados
+fixar_snapshot()
+
+df = carregar_secao('hipoteses', 'hipóteses')
+if df is None:
+    st.stop()
 
 # tratar colunas que são inteiros
 # integer_columns = ['id_aluno', 'id_turma', 'ano_turma', 'num_sondagem']
@@ -145,106 +25,33 @@ df = pd.read_sql(query, engine)
 #     if col in df.columns:
 #         df[col] = df[col].astype(int)
 
-# função para filtrar o DataFrame
-def filter_dataframe(df: pd.DataFrame) -> pd.DataFrame:
-    modify = st.sidebar.checkbox("Adicionar Filtros", key="filter_checkbox")
-
-    if not modify:
-        return df
-
-    df = df.copy()
-
-    for col in df.columns:
-        if is_datetime64_any_dtype(df[col]):
-            df[col] = df[col].dt.tz_localize(None)
-
-        if is_numeric_dtype(df[col]):
-            if df[col].isnull().any():  
-                df[col] = df[col].fillna(0) 
-            if (df[col] == df[col].astype(int)).all():  
-                df[col] = df[col].astype(int)  
-
-
-    modification_container = st.sidebar.container()
-
-    with modification_container:
-        to_filter_columns = st.multiselect(
-            "Filtrar pela Coluna: ", 
-            df.columns,
-            key="multiselect_columns"
-        )
-        for i, column in enumerate(to_filter_columns):
-            left, right = st.columns((1, 20))
-
-            if isinstance(df[column].dtype, pd.CategoricalDtype) or df[column].nunique() < 10:
-                user_cat_input = right.multiselect(
-                    f"Values for {column}",
-                    df[column].unique(),
-                    default=list(df[column].unique()),
-                    key=f"multiselect_{column}_{i}"
-                )
-                df = df[df[column].isin(user_cat_input)]
-            elif is_numeric_dtype(df[column]):
-                _min = float(df[column].min())
-                _max = float(df[column].max())
-                step = (_max - _min) / 100
-                user_num_input = right.slider(
-                    f"Values for {column}",
-                    min_value=_min,
-                    max_value=_max,
-                    value=(_min, _max),
-                    step=step,
-                    key=f"slider_{column}_{i}"
-                )
-                df = df[df[column].between(*user_num_input)]
-            elif is_datetime64_any_dtype(df[column]):
-                user_date_input = right.date_input(
-                    f"Values for {column}",
-                    value=(
-                        df[column].min(),
-                        df[column].max(),
-                    ),
-                    key=f"date_input_{column}_{i}"
-                )
-                if len(user_date_input) == 2:
-                    user_date_input = tuple(map(pd.to_datetime, user_date_input))
-                    start_date, end_date = user_date_input
-                    df = df.loc[df[column].between(start_date, end_date)]
-            else:
-                user_text_input = right.text_input(
-                    f"Digite uma substring pelo que quer filtrar de {column}",
-                    key=f"text_input_{column}_{i}"
-                )
-                if user_text_input:
-                    df = df[df[column].astype(str).str.contains(user_text_input)]
-
-    return df
-
 # Exibir a página com filtros
 st.markdown("## Hipóteses da evidência de aprendizagem ")
+exibir_atualizacao('hipoteses')
 
-filtered_df = filter_dataframe(df)
+filtered_df = filter_dataframe(df, 'hipoteses', preencher_nulos=True)
 
 st.write("Dados Filtrados:")
 st.dataframe(filtered_df)
+exibir_exportacao('hipoteses')
 
 st.write("###Resumo dos Dados Filtrados:")
 
 # Resumo
-total_alunos = filtered_df['id_aluno'].nunique()
+indicadores = indicadores_hipoteses(filtered_df)
+total_alunos = indicadores['total_alunos']
 st.write(f"Total de Alunos: {total_alunos}")
 
-total_turmas = filtered_df['id_turma'].nunique()
+total_turmas = indicadores['total_turmas']
 st.write(f"Total de Turmas: {total_turmas}")
 
-total_escolas = filtered_df['cod_inep'].nunique()
+total_escolas = indicadores['total_escolas']
 st.write(f"Total de Escolas: {total_escolas}")
 
-resumo_hipoteses = filtered_df.groupby(['num_sondagem', 'nome_hipotese']).size().unstack(fill_value=0)
 st.markdown("### Resumo de Hipóteses por Ranking:")
-st.dataframe(resumo_hipoteses)
+st.dataframe(resumo_hipoteses(filtered_df))
 
-df = pd.read_sql(query, engine)
+df = carregar('hipoteses')
 
 # Tratar colunas que são inteiros
 integer_columns = ['id_aluno', 'id_turma', 'ano_turma', 'cod_inep', 'num_sondagem']
@@ -305,17 +112,19 @@ ranking_desejado = 1
 
 # Sidebar para filtros adicionais
 st.sidebar.title("Filtros")
-selected_turma = st.sidebar.multiselect("Filtrar por Turma:", df['nome_turma'].unique())
-selected_escola = st.sidebar.multiselect("Filtrar por Escola:", df['nome_escola'].unique())
-
-# Aplicar filtros
-df_filtered = df[df['num_sondagem'] == ranking_desejado]
+# Primeiras sondagens dentro dos filtros da barra lateral
+df_filtered = filtered_df[filtered_df['num_sondagem'] == ranking_desejado]
 
-if selected_turma:
-    df_filtered = df_filtered[df_filtered['nome_turma'].isin(selected_turma)]
+# Estado -> escola -> turma em cascata: cada lista só mostra o que existe dentro das escolhas de cima
+# e dos filtros acima, para que nenhuma escolha resulte num gráfico vazio
+selecoes = selecionar_hierarquia(
+    'hipoteses', niveis=('estado_escola', 'nome_escola', 'nome_turma'), df=df_filtered,
+)
+selected_estado = selecoes['estado_escola']
+selected_escola = selecoes['nome_escola']
+selected_turma = selecoes['nome_turma']
 
-if selected_escola:
-    df_filtered = df_filtered[df_filtered['nome_escola'].isin(selected_escola)]
+df_filtered = aplicar_hierarquia(df_filtered, selecoes)
 
 # Criar e exibir o gráfico de gauge atualizado com os filtros aplicados
 # st.title("Visualização do Resumo de Hipóteses por Ranking")
@@ -323,36 +132,13 @@ if selected_escola:
 
 # Supondo que você já tenha carregado o DataFrame df com as colunas 'student_id', 'nome_hipotese', e 'num_sondagem'
 
-# Criar um mapeamento para a ordem das hipóteses
-ordem_hipoteses = {
-    'Não se aplica': 1,
-    'Pré-silábica': 2,
-    'Silábica s/ valor': 3,
-    'Silábica c/ valor': 4,
-    'Silábico-alfabética': 5,
-    'Alfabética': 6
-}
-
-# Adicionar uma coluna de ordem ao DataFrame
-df['ordering'] = df['nome_hipotese'].map(ordem_hipoteses)
-
-# Agrupar por aluno e calcular a primeira e a última hipótese
-progresso_alunos = df.groupby('id_aluno')['ordering'].agg(['min', 'max'])
-
-# Identificar alunos que tiveram qualquer melhoria
-alunos_com_melhoria = progresso_alunos[progresso_alunos['min'] < progresso_alunos['max']]
+# Alunos com melhoria e o funil de progressão
+alunos_com_melhoria_ids, funil_etapas = executar(
+    'funil_hipoteses', df[['id_aluno', 'data_criacao_sondagem', 'ordem_hipotese']], niveis_hipoteses(),
+)
 
 # Contar o número total de alunos que tiveram melhoria
-total_alunos_com_melhoria = len(alunos_com_melhoria)
-
-# Mapeando cada etapa do funil
-funil_etapas = {}
-
-for etapa in ordem_hipoteses.keys():
-    etapa_order = ordem_hipoteses[etapa]
-    alunos_na_etapa = progresso_alunos[(progresso_alunos['min'] < etapa_order) & 
-                                       (progresso_alunos['max'] >= etapa_order)]
-    funil_etapas[etapa] = len(alunos_na_etapa)
+total_alunos_com_melhoria = len(alunos_com_melhoria_ids)
 
 
 st.write(f"Total de alunos com qualquer melhoria: {total_alunos_com_melhoria}")
@@ -361,17 +147,6 @@ st.write("Mapa de Funil de Progressão:")
 for etapa, quantidade in funil_etapas.items():
     st.write(f"Alunos que atingiram {etapa}: {quantidade}")
 
-st.dataframe(alunos_com_melhoria)
-
-# Adicionar uma coluna de ordem ao DataFrame
-df['ordering'] = df['nome_hipotese'].map(ordem_hipoteses)
-
-# Agrupar por aluno e calcular a primeira e a última hipótese
-progresso_alunos = df.groupby('id_aluno')['ordering'].agg(['min', 'max'])
-
-# Identificar alunos que tiveram qualquer melhoria
-alunos_com_melhoria_ids = progresso_alunos[progresso_alunos['min'] < progresso_alunos['max']].index
-
 # Filtrar o DataFrame original para esses alunos
 alunos_com_melhoria = df[df['id_aluno'].isin(alunos_com_melhoria_ids)]
 
@@ -392,6 +167,52 @@ import streamlit as st
 st.write("Evolução Completa dos Alunos com Melhoria:")
 st.dataframe(alunos_com_melhoria_evolucao)
 
+# Transições entre hipóteses em sondagens consecutivas do mesmo aluno
+st.title("Transições entre Hipóteses")
+
+# As opções de mês vêm das estatísticas do dataset, calculadas uma vez por versão
+meses = estatisticas_dataset('hipoteses')['mes_de_aplicacao'].valores
+if meses is None:
+    meses = df['mes_de_aplicacao'].unique()
+# Meses como inteiros, para ordenar pelo calendário qualquer que seja o tipo vindo do banco
+selected_mes = st.sidebar.multiselect(
+    "Filtrar transições por Mês:", sorted(int(mes) for mes in numero_mes(meses).dropna().unique()), format_func=nome_mes,
+)
+
+transicoes = transicoes_hipoteses({
+    'nome_turma': selected_turma,
+    'nome_escola': selected_escola,
+    'estado_escola': selected_estado,
+    'mes_de_aplicacao': selected_mes,
+})
+
+st.write(f"Total de transições: {int(transicoes.to_numpy().sum())}")
+
+fig_heatmap = go.Figure(go.Heatmap(
+    z=transicoes.to_numpy(),
+    x=list(transicoes.columns),
+    y=list(transicoes.index),
+    colorscale='Blues',
+    hovertemplate='De %{y} para %{x}: %{z}<extra></extra>',
+))
+fig_heatmap.update_layout(xaxis_title='Hipótese seguinte', yaxis_title='Hipótese anterior', yaxis_autorange='reversed')
+st.plotly_chart(fig_heatmap)
+
+niveis = list(transicoes.index)
+origens, destinos, valores = [], [], []
+for i, de in enumerate(niveis):
+    for j, para in enumerate(niveis):
+        if transicoes.iat[i, j] > 0:
+            origens.append(i)
+            destinos.append(len(niveis) + j)
+            valores.append(int(transicoes.iat[i, j]))
+
+fig_sankey = go.Figure(go.Sankey(
+    node=dict(label=niveis + niveis, pad=15, thickness=15),
+    link=dict(source=origens, target=destinos, value=valores),
+))
+st.plotly_chart(fig_sankey)
+
 from pyecharts import options as opts
 from pyecharts.charts import Pie
 from streamlit_echarts import st_pyecharts
@@ -0,0 +1,114 @@
+# Description: Gera o relatório de diagnóstico sem abrir o Streamlit, com os mesmos dados e indicadores
+# das páginas, em CSV, Parquet e/ou HTML.
+#
+# Uso: python relatorio.py --saida relatorios/ --formatos csv html
+import argparse
+import html
+import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from datetime import datetime
+from pathlib import Path
+
+from diagnostico.dados import carregar, fixar_snapshot
+from diagnostico.indicadores import AUXILIARES, RELATORIOS
+
+FORMATOS = ('csv', 'parquet', 'html')
+
+logger = logging.getLogger('relatorio')
+
+
+def gerar_pagina(pagina):
+    nome_dataset, calcular = RELATORIOS[pagina]
+    dados = carregar(nome_dataset)
+    return dados, calcular(dados, *[carregar(nome) for nome in AUXILIARES.get(pagina, [])])
+
+
+def parquet_disponivel():
+    # Parquet depende do pyarrow, que não faz parte do requirements.txt
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def salvar_tabela(df, destino, formato):
+    if formato == 'csv':
+        df.to_csv(destino.with_suffix('.csv'), index=False)
+    elif formato == 'parquet':
+        df.to_parquet(destino.with_suffix('.parquet'), index=False)
+
+
+def montar_html(resultados, gerado_em):
+    partes = [
+        '<html><head><meta charset="utf-8"><title>Relatório de Sondagens Diagnósticas</title></head><body>',
+        f'<h1>Relatório de Sondagens Diagnósticas</h1><p>Gerado em {gerado_em:%d/%m/%Y às %H:%M}</p>',
+    ]
+    for pagina, (_, resultado) in resultados.items():
+        partes.append(f'<h2>{html.escape(pagina)}</h2><ul>')
+        for nome, valor in resultado.indicadores.items():
+            partes.append(f'<li>{html.escape(nome)}: {html.escape(str(valor))}</li>')
+        partes.append('</ul>')
+        for nome, tabela in resultado.tabelas.items():
+            partes.append(f'<h3>{html.escape(nome)}</h3>')
+            partes.append(tabela.to_html(index=False))
+    partes.append('</body></html>')
+    return '\n'.join(partes)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera o relatório de diagnóstico sem o Streamlit.")
+    parser.add_argument('--saida', default='relatorios', help="Pasta de destino (padrão: relatorios)")
+    parser.add_argument('--formatos', nargs='+', choices=FORMATOS, default=['csv', 'html'])
+    parser.add_argument('--paginas', nargs='+', choices=list(RELATORIOS), default=list(RELATORIOS))
+    parser.add_argument('--incluir-dados', action='store_true', help="Salva também os microdados de cada página")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    gerado_em = datetime.now()
+    saida = Path(args.saida) / f'{gerado_em:%Y-%m-%d_%H%M}'
+    saida.mkdir(parents=True, exist_ok=True)
+
+    # As páginas são independentes: as consultas e os cálculos rodam em paralelo, todas sobre o
+    # mesmo snapshot (com o cache em SQLite, o publicado pelo aquecimento do Streamlit)
+    snapshot = fixar_snapshot()
+    if snapshot is not None:
+        logger.info("Snapshot %s, de %s", snapshot.versao, f'{snapshot.criado_em:%d/%m/%Y %H:%M}')
+    resultados = {}
+    erros = {}
+    with ThreadPoolExecutor(max_workers=len(args.paginas)) as executor:
+        futuros = {pagina: executor.submit(copy_context().run, gerar_pagina, pagina) for pagina in args.paginas}
+        for pagina, futuro in futuros.items():
+            try:
+                resultados[pagina] = futuro.result()
+            except Exception as e:
+                logger.error("Erro ao gerar a página %s: %s", pagina, e)
+                erros[pagina] = e
+
+    formatos_tabela = [formato for formato in args.formatos if formato != 'html']
+    if 'parquet' in formatos_tabela and not parquet_disponivel():
+        logger.error("Instale o pyarrow para gerar arquivos Parquet; o formato será ignorado.")
+        formatos_tabela.remove('parquet')
+    for pagina, (dados, resultado) in resultados.items():
+        pasta = saida / pagina
+        pasta.mkdir(exist_ok=True)
+        tabelas = dict(resultado.tabelas)
+        if args.incluir_dados:
+            tabelas['dados'] = dados
+        for formato in formatos_tabela:
+            for nome, tabela in tabelas.items():
+                salvar_tabela(tabela, pasta / nome, formato)
+        logger.info("Página %s: %s", pagina, resultado.indicadores)
+
+    if 'html' in args.formatos:
+        (saida / 'relatorio.html').write_text(montar_html(resultados, gerado_em), encoding='utf-8')
+
+    logger.info("Relatório salvo em %s", saida)
+    return 1 if erros else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
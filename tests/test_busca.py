@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from diagnostico import busca
+from diagnostico.busca import IndiceChaves, IndiceTrigramas, contem, normalizar
+
+NOMES = pd.Series([
+    'São José', 'SAO JOSE', 'Escola Estadual Água Branca', 'Ana', 'ana maria', 'Zé', None, 'Óbidos', 'José', 'a',
+    'Escola Municipal São Paulo', 'ão', 'Aná', '',
+])
+
+
+def _forca_bruta(serie, texto):
+    texto = normalizar(texto)
+    return np.array([valor is not None and texto in normalizar(valor) for valor in serie])
+
+
+def test_normalizar_tira_acentos_e_maiusculas():
+    assert normalizar('São Paulo') == 'sao paulo'
+    assert normalizar('ÁGUA') == 'agua'
+    assert normalizar('abc') == 'abc'
+
+
+@pytest.mark.parametrize('texto', ['', 'a', 'sa', 'são', 'jose', 'JOSÉ', 'escola', 'ao', 'o jo', 'xyz', 'a branca', 'ó'])
+def test_indice_igual_a_forca_bruta(texto):
+    esperado = _forca_bruta(NOMES, texto)
+    if not texto:
+        # Sem texto, todas as linhas não nulas
+        esperado = NOMES.notna().to_numpy()
+    np.testing.assert_array_equal(IndiceTrigramas(NOMES).buscar(texto), esperado)
+
+
+def test_indice_em_lotes_pequenos(monkeypatch):
+    # Lotes de poucas letras passam pelos mesmos caminhos da construção de um índice grande
+    monkeypatch.setattr(busca, 'LETRAS_POR_LOTE', 7)
+    nomes = pd.Series([f'turma {i} {"ab" * (i % 5)}' for i in range(200)])
+    indice = IndiceTrigramas(nomes)
+    for texto in ('turma 1', 'abab', '9 a', '199', 'b'):
+        np.testing.assert_array_equal(indice.buscar(texto), _forca_bruta(nomes, texto))
+
+
+def test_indice_de_serie_vazia():
+    indice = IndiceTrigramas(pd.Series([], dtype=object))
+    assert len(indice.buscar('abc')) == 0
+
+
+def test_contem_igual_ao_indice():
+    for texto in ('sao', 'ANA', 'escola m', 'q'):
+        np.testing.assert_array_equal(contem(NOMES, texto), IndiceTrigramas(NOMES).buscar(texto))
+
+
+# ------------------------- ÍNDICE DE CHAVES ----------------------------
+ESCOLAS = pd.Series(['São José', 'SAO JOSE', 'Santa Rita', None, 'são josé', 'Bela Vista', 'Santa Rita', 'santo andré'])
+
+
+def test_chaves_juntam_grafias():
+    indice = IndiceChaves(ESCOLAS)
+    assert indice.chaves.tolist() == ['bela vista', 'santa rita', 'santo andre', 'sao jose']
+    # Rótulo de exibição: a primeira grafia encontrada
+    assert indice.rotulos['sao jose'] == 'São José'
+    assert sorted(indice.linhas(['sao jose']).tolist()) == [0, 1, 4]
+
+
+def test_posicoes_ordenadas_e_iguais_ao_isin():
+    indice = IndiceChaves(ESCOLAS)
+    chaves = ['sao jose', 'santa rita', 'nao existe']
+    posicoes = indice.posicoes(chaves)
+    esperado = np.flatnonzero(ESCOLAS.map(lambda v: v is not None and normalizar(v) in chaves))
+    np.testing.assert_array_equal(posicoes, esperado)
+    assert len(indice.posicoes([])) == 0
+
+
+def test_linhas_com_prefixo():
+    indice = IndiceChaves(ESCOLAS)
+    assert sorted(indice.linhas_com_prefixo('SANT').tolist()) == [2, 6, 7]
+    assert sorted(indice.linhas_com_prefixo('').tolist()) == [0, 1, 2, 4, 5, 6, 7]
+    assert len(indice.linhas_com_prefixo('zzz')) == 0
@@ -0,0 +1,111 @@
+import os
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from diagnostico.cache import BackendSQLite, CacheCompartilhado, MemoriaPorVersao
+
+
+@pytest.fixture
+def caminho(tmp_path):
+    pasta = tmp_path / 'cache'
+    return str(pasta / 'cache.sqlite3')
+
+
+def test_pasta_e_arquivo_privados(caminho):
+    BackendSQLite(caminho)
+    assert os.stat(os.path.dirname(caminho)).st_mode & 0o777 == 0o700
+    assert os.stat(caminho).st_mode & 0o077 == 0
+
+
+def test_recusa_pasta_com_acesso_de_outros(tmp_path):
+    pasta = tmp_path / 'aberta'
+    pasta.mkdir()
+    pasta.chmod(0o755)
+    with pytest.raises(PermissionError):
+        BackendSQLite(str(pasta / 'cache.sqlite3'))
+
+
+def test_entradas_compartilhadas_entre_processos(caminho):
+    # Dois backends no mesmo arquivo fazem o papel de dois processos
+    um, outro = BackendSQLite(caminho), BackendSQLite(caminho)
+    assert outro.ler('turmas') is None
+    gravada = um.gravar('turmas', pd.DataFrame({'id_turma': [1, 2]}))
+    lida = outro.ler('turmas')
+    assert lida.versao == gravada.versao
+    pd.testing.assert_frame_equal(lida.dados, gravada.dados)
+    # Sem mudança de versão, a mesma cópia desserializada é devolvida
+    assert outro.ler('turmas') is lida
+    nova = um.gravar('turmas', pd.DataFrame({'id_turma': [3]}))
+    assert outro.ler('turmas').versao == nova.versao > gravada.versao
+    um.remover(['turmas'])
+    assert outro.ler('turmas') is None
+
+
+def test_entrada_grande_demais_fica_so_em_memoria(caminho):
+    um, outro = BackendSQLite(caminho), BackendSQLite(caminho)
+    um._conexao().setlimit(sqlite3.SQLITE_LIMIT_LENGTH, 1000)
+    entrada = um.gravar('professores', pd.DataFrame({'nome': ['x' * 2000]}))
+    assert um.ler('professores') is entrada
+    assert 'professores' in um.versoes()
+    assert outro.ler('professores') is None
+
+
+def test_lease_de_um_processo_por_vez(caminho):
+    um, outro = BackendSQLite(caminho), BackendSQLite(caminho)
+    assert um.adquirir('aquecimento', 60)
+    # O dono pode renovar; outro processo espera
+    assert um.adquirir('aquecimento', 60)
+    assert not outro.adquirir('aquecimento', 60)
+    um.liberar('aquecimento')
+    assert outro.adquirir('aquecimento', 60)
+    # Lease vencido pode ser assumido
+    assert outro.adquirir('dataset:turmas', -1)
+    assert um.adquirir('dataset:turmas', 60)
+
+
+def test_snapshots_publicados_entre_processos(caminho):
+    um, outro = CacheCompartilhado(backend=BackendSQLite(caminho)), CacheCompartilhado(backend=BackendSQLite(caminho))
+    assert outro.snapshot_atual() is None
+
+    chaves = []
+    for valor in range(3):
+        versao = um.nova_versao()
+        chave, _ = um.materializar('turmas', versao, pd.DataFrame({'valor': [valor]}))
+        um.publicar_snapshot(versao, {'turmas': chave}, {'turmas': 'assinatura'})
+        chaves.append(chave)
+        snapshot = outro.snapshot_atual()
+        assert snapshot.versao == versao
+        assert snapshot.assinaturas == {'turmas': 'assinatura'}
+        assert outro.entrada(snapshot.chaves['turmas']).dados['valor'].tolist() == [valor]
+
+    # O snapshot anterior continua legível; os mais antigos são removidos
+    assert outro.entrada(chaves[1]) is not None
+    assert outro.entrada(chaves[0]) is None
+    assert um.versoes_vivas('turmas') == {outro.entrada(chave).versao for chave in chaves[1:]}
+
+
+# ------------------------- VALORES POR VERSÃO --------------------------
+def test_memoria_guarda_as_versoes_vivas(caminho):
+    cache = CacheCompartilhado(backend=BackendSQLite(caminho))
+    memoria = MemoriaPorVersao(cache)
+    calculos = []
+
+    def obter(versao):
+        return memoria.obter(('turmas', 'estatisticas'), versao, lambda: calculos.append(versao) or versao * 10)
+
+    versoes = []
+    for valor in range(3):
+        versao = cache.nova_versao()
+        chave, entrada = cache.materializar('turmas', versao, pd.DataFrame({'valor': [valor]}))
+        cache.publicar_snapshot(versao, {'turmas': chave})
+        versoes.append(entrada.versao)
+        assert obter(entrada.versao) == entrada.versao * 10
+
+    # As versões do snapshot atual e do anterior continuam guardadas; a mais antiga é calculada de novo
+    assert obter(versoes[2]) == versoes[2] * 10
+    assert obter(versoes[1]) == versoes[1] * 10
+    assert calculos == versoes
+    obter(versoes[0])
+    assert calculos == versoes + versoes[:1]
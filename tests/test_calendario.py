@@ -0,0 +1,55 @@
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+from diagnostico.calendario import SEM_MES, comparacao_anual, dimensao_calendario, nome_mes, numero_mes, serie_mensal
+
+
+def test_nome_mes():
+    assert nome_mes(3) == 'Março'
+    assert nome_mes(np.int8(12)) == 'Dezembro'
+    assert nome_mes(0) == SEM_MES
+
+
+def test_numero_mes_de_qualquer_tipo():
+    meses = numero_mes(['3', 11, Decimal('2'), 4.0, None, 'março', 13, 2.5, '0'])
+    assert str(meses.dtype) == 'Int8'
+    assert meses.tolist() == [3, 11, 2, 4, pd.NA, pd.NA, pd.NA, pd.NA, 0]
+
+
+def test_numero_mes_ordena_como_numero():
+    # Como texto, '10' viria antes de '2'
+    assert sorted(numero_mes(['10', '2', '1']).tolist()) == [1, 2, 10]
+
+
+def test_dimensao_calendario():
+    dimensao = dimensao_calendario([202402, 202311, 202402, 202400])
+    assert dimensao['periodo'].tolist() == [202311, 202400, 202402]
+    assert dimensao['rotulo'].tolist() == ['Nov/2023', 'Sem/2024', 'Fev/2024']
+
+
+def test_serie_mensal_em_ordem_de_calendario():
+    df = pd.DataFrame({
+        'ano_sondagem': [2024, 2023, 2024, 2024, 2023],
+        'mes_sondagem': [10, 12, 2, 10, 12],
+        'alunos': [1, 2, 3, 4, 5],
+    })
+    serie = serie_mensal(df, alunos=('alunos', 'sum'))
+    assert serie.columns.tolist() == ['periodo', 'ano', 'mes', 'nome_mes', 'rotulo', 'alunos']
+    assert serie['periodo'].tolist() == [202312, 202402, 202410]
+    assert serie['alunos'].tolist() == [7, 3, 5]
+
+
+def test_comparacao_anual():
+    df = pd.DataFrame({
+        'ano_sondagem': [2023, 2023, 2024, 2024],
+        'mes_sondagem': [3, 4, 3, 5],
+        'alunos': [10, 5, 15, 8],
+    })
+    tabela = comparacao_anual(serie_mensal(df, alunos=('alunos', 'sum')), 'alunos')
+    assert tabela.index.tolist() == ['Março', 'Abril', 'Maio']
+    assert tabela.columns.tolist() == ['2023', '2024', 'variacao_%']
+    assert tabela.loc['Março', 'variacao_%'] == 50.0
+    assert np.isnan(tabela.loc['Abril', 'variacao_%'])
+    assert np.isnan(tabela.loc['Maio', 'variacao_%'])
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+from diagnostico.evolucao import (
+    Niveis, alunos_com_melhoria, calcular_evolucao, contar_transicoes, filtrar_transicoes, funil_etapas,
+    pares_transicao,
+)
+
+NIVEIS = pd.DataFrame({
+    'ordem_hipotese': [3, 1, 4, 2, 2],
+    'nome_hipotese': ['Silábico-alfabética', 'Pré-silábica', 'Alfabética ', 'Silábica', 'Silábica'],
+})
+
+# Sondagens fora de ordem; a ordem 9 não é um nível e fica de fora
+SONDAGENS = pd.DataFrame({
+    'id_aluno': [10, 20, 10, 20, 30, 10, 20, 40],
+    'data_criacao_sondagem': pd.to_datetime([
+        '2024-03-01', '2024-03-01', '2024-05-01', '2024-03-11', '2024-04-01', '2024-04-01', '2024-06-01', '2024-03-01',
+    ]),
+    'ordem_hipotese': [1, 3, 3, 4, 4, 2, 2, 9],
+    'id_turma': [1, 1, 1, 2, 2, 1, 2, 1],
+})
+
+
+def _evolucao():
+    niveis = Niveis.de_tabela(NIVEIS)
+    return calcular_evolucao(
+        SONDAGENS['id_aluno'], SONDAGENS['data_criacao_sondagem'], SONDAGENS['ordem_hipotese'], niveis,
+    ), niveis
+
+
+def test_niveis_de_tabela():
+    niveis = Niveis.de_tabela(NIVEIS)
+    assert niveis.ordens.tolist() == [1, 2, 3, 4]
+    assert niveis.nomes == ['Pré-silábica', 'Silábica', 'Silábico-alfabética', 'Alfabética']
+    assert niveis.alfabetica == 4
+    assert niveis.posicoes([4, 1, 9, 0]).tolist() == [3, 0, -1, -1]
+
+
+def test_niveis_sem_alfabetica_usa_a_maior_ordem():
+    niveis = Niveis.de_tabela(NIVEIS[NIVEIS['ordem_hipotese'] < 4])
+    assert niveis.alfabetica == 3
+
+
+def test_metricas_por_aluno():
+    evolucao, _ = _evolucao()
+    alunos = evolucao.alunos
+    assert alunos.index.tolist() == [10, 20, 30]
+    assert alunos['primeira'].tolist() == [1, 3, 4]
+    assert alunos['ultima'].tolist() == [3, 2, 4]
+    assert alunos['minima'].tolist() == [1, 2, 4]
+    assert alunos['maxima'].tolist() == [3, 4, 4]
+    assert alunos['num_sondagens'].tolist() == [3, 3, 1]
+    assert alunos['ganho_liquido'].tolist() == [2, -1, 0]
+    np.testing.assert_array_equal(alunos['dias_ate_alfabetica'].to_numpy(), [np.nan, 10, 0])
+    assert alunos['alfabetizado'].tolist() == [False, True, False]
+    # Primeira sondagem de cada aluno nos dados de entrada
+    assert evolucao.linhas_iniciais.tolist() == [0, 1, 4]
+
+
+def test_transicoes_entre_sondagens_seguidas():
+    evolucao, niveis = _evolucao()
+    esperado = np.zeros((4, 4), dtype=int)
+    # Aluno 10: 1 -> 2 -> 3; aluno 20: 3 -> 4 -> 2
+    for de, para in ((0, 1), (1, 2), (2, 3), (3, 1)):
+        esperado[de, para] += 1
+    np.testing.assert_array_equal(evolucao.transicoes.to_numpy(), esperado)
+    assert evolucao.transicoes.index.tolist() == niveis.nomes
+    np.testing.assert_array_equal(contar_transicoes([1, 2, 3, 4, 9], [2, 3, 4, 2, 1], niveis).to_numpy(), esperado)
+
+
+def test_pares_e_filtro_de_transicoes():
+    evolucao, niveis = _evolucao()
+    pares = pares_transicao(SONDAGENS, ['id_turma'])
+    assert len(pares) == 4
+    np.testing.assert_array_equal(filtrar_transicoes(pares, niveis).to_numpy(), evolucao.transicoes.to_numpy())
+    # Os atributos são os da sondagem de destino
+    so_turma_2 = filtrar_transicoes(pares, niveis, {'id_turma': [2], 'ausente': []})
+    assert so_turma_2.to_numpy().sum() == 2
+    assert so_turma_2.loc['Silábico-alfabética', 'Alfabética'] == 1
+    assert so_turma_2.loc['Alfabética', 'Silábica'] == 1
+
+
+def test_funil_etapas():
+    evolucao, niveis = _evolucao()
+    assert funil_etapas(evolucao, niveis) == {
+        'Pré-silábica': 0, 'Silábica': 1, 'Silábico-alfabética': 2, 'Alfabética': 1,
+    }
+
+
+def test_definicoes_de_melhoria():
+    evolucao, _ = _evolucao()
+    assert alunos_com_melhoria(evolucao).index.tolist() == [10, 20]
+    assert alunos_com_melhoria(evolucao, 'primeira_ultima').index.tolist() == [10]
+    assert alunos_com_melhoria(evolucao, 'alfabetizacao').index.tolist() == [20]
+
+
+def test_sem_sondagens():
+    evolucao = calcular_evolucao([], [], [], Niveis.de_tabela(NIVEIS))
+    assert evolucao.alunos.empty
+    assert evolucao.transicoes.to_numpy().sum() == 0
@@ -0,0 +1,51 @@
+import pandas as pd
+
+from diagnostico.graficos import EspecGrafico, agregar, gerar_graficos
+
+RESPOSTAS = pd.DataFrame({
+    'pergunta': ['formacao', 'formacao', 'formacao', 'experiencia', 'experiencia', 'formacao'],
+    'resposta': ['Sim', 'Não', 'Sim', '1 ano', '5 anos', 'Sim'],
+    'id_professor': [1, 2, 3, 1, 2, 1],
+})
+
+ESPECS = {
+    'formacao': EspecGrafico('Formação', 'resposta', filtro={'pergunta': 'formacao'}),
+    'professores': EspecGrafico(
+        'Professores', 'resposta', y='professores', contar_distintos='id_professor', filtro={'pergunta': 'formacao'},
+    ),
+    'perguntas': EspecGrafico('Perguntas', 'pergunta'),
+}
+
+
+def _como_dict(tabela, espec):
+    return dict(zip(tabela[espec.x], tabela[espec.y]))
+
+
+def test_cada_espec_igual_a_um_groupby_proprio():
+    tabelas = agregar(RESPOSTAS, ESPECS)
+    assert _como_dict(tabelas['formacao'], ESPECS['formacao']) == {'Sim': 3, 'Não': 1}
+    assert _como_dict(tabelas['professores'], ESPECS['professores']) == {'Sim': 2, 'Não': 1}
+    assert _como_dict(tabelas['perguntas'], ESPECS['perguntas']) == {'formacao': 4, 'experiencia': 2}
+    assert tabelas['professores'].columns.tolist() == ['resposta', 'professores']
+
+
+def test_peso_de_fonte_ja_agregada():
+    agregado = RESPOSTAS.groupby(['pergunta', 'resposta', 'id_professor']).size().rename('n').reset_index()
+    assert all(
+        _como_dict(agregar(agregado, ESPECS, peso='n')[nome], espec) == _como_dict(agregar(RESPOSTAS, ESPECS)[nome], espec)
+        for nome, espec in ESPECS.items()
+    )
+
+
+def test_categorias_sem_linhas_ficam_de_fora():
+    df = RESPOSTAS.assign(resposta=pd.Categorical(RESPOSTAS['resposta'], categories=['Sim', 'Não', 'Talvez', '1 ano', '5 anos']))
+    tabela = agregar(df, {'formacao': ESPECS['formacao']})['formacao']
+    assert 'Talvez' not in tabela['resposta'].tolist()
+
+
+def test_gerar_graficos_com_rotulos():
+    espec = EspecGrafico('Formação', 'resposta', filtro={'pergunta': 'formacao'}, rotulos_x={'Não': 'Não<br>possui'})
+    tabela, fig = gerar_graficos(RESPOSTAS, {'formacao': espec})['formacao']
+    assert sorted(fig.data[0].x.tolist()) == ['Não<br>possui', 'Sim']
+    assert fig.layout.title.text == 'Formação'
+    assert len(tabela) == 2
@@ -0,0 +1,61 @@
+import pandas as pd
+
+from diagnostico.hierarquia import HIERARQUIA, IndiceHierarquia, aplicar_hierarquia
+
+ESCOLAS = pd.DataFrame([
+    ('GO', 'São Domingos', 'Escola A', 'Turma 1', 1),
+    ('GO', 'São Domingos', 'Escola A', 'Turma 2', 2),
+    ('GO', 'Goiânia', 'Escola B', 'Turma 1', 3),
+    ('BA', 'São Domingos', 'Escola C', 'Turma 1', 4),
+    ('BA', 'Salvador', 'Escola A', 'Turma 3', 5),
+    ('BA', 'Salvador', None, 'Turma 4', 6),
+], columns=list(HIERARQUIA))
+
+
+def _cascata(indice, selecoes):
+    # Opções de cada nível depois das escolhas dos níveis de cima, como na barra lateral
+    opcoes, nos = [], None
+    for nivel, coluna in enumerate(HIERARQUIA):
+        rotulos, nos = indice.opcoes(nivel, nos)
+        opcoes.append(rotulos)
+        nos = indice.escolher(nivel, nos, selecoes.get(coluna))
+    return opcoes
+
+
+def _forca_bruta(df, selecoes):
+    opcoes = []
+    for coluna in HIERARQUIA:
+        opcoes.append(sorted(df[coluna].dropna().unique().tolist()))
+        if selecoes.get(coluna):
+            df = df[df[coluna].isin(selecoes[coluna])]
+    return opcoes
+
+
+def test_sem_escolhas_mostra_todos_os_valores():
+    opcoes = _cascata(IndiceHierarquia(ESCOLAS), {})
+    assert opcoes == _forca_bruta(ESCOLAS, {})
+
+
+def test_cidade_homonima_e_um_no_por_estado():
+    selecoes = {'estado_escola': ['GO'], 'cidade_escola': ['São Domingos']}
+    opcoes = _cascata(IndiceHierarquia(ESCOLAS), selecoes)
+    # A escola C é da São Domingos da BA
+    assert opcoes[2] == ['Escola A']
+    assert opcoes == _forca_bruta(ESCOLAS, selecoes)
+
+
+def test_escolhas_em_niveis_intermediarios():
+    indice = IndiceHierarquia(ESCOLAS)
+    for selecoes in (
+        {'nome_escola': ['Escola A']},
+        {'cidade_escola': ['São Domingos', 'Salvador'], 'nome_turma': ['Turma 1']},
+        {'estado_escola': ['BA'], 'nome_escola': ['Escola B']},
+        {'estado_escola': ['SP']},
+    ):
+        assert _cascata(indice, selecoes) == _forca_bruta(ESCOLAS, selecoes)
+
+
+def test_aplicar_hierarquia():
+    selecoes = {'estado_escola': ['GO'], 'nome_turma': ['Turma 1'], 'id_professor': []}
+    assert aplicar_hierarquia(ESCOLAS, selecoes)['id_professor'].tolist() == [1, 3]
+    assert len(aplicar_hierarquia(ESCOLAS, {})) == len(ESCOLAS)
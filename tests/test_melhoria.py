@@ -0,0 +1,72 @@
+import pandas as pd
+
+from diagnostico.melhoria import VARIANTES, melhoria_por_turma, preparar_fatos, progresso_por_aluno
+
+NIVEIS = pd.DataFrame({
+    'ordem_hipotese': [1, 2, 3, 4],
+    'nome_hipotese': ['Não se aplica', 'Pré-silábica', 'Silábica', 'Alfabética'],
+})
+
+# Fatos como vêm do banco: mês em texto e ids como objetos
+FATOS = pd.DataFrame([
+    (1, 100, 7, 50, '3', 2, '2024-03-05'),
+    (1, 100, 7, 51, '4', 3, '2024-04-05'),
+    (2, 100, 7, 50, '3', 3, '2024-03-06'),
+    (2, 100, 7, 52, '5', 3, '2024-05-01'),
+    (3, 100, 7, 50, '3', 1, '2024-03-01'),
+    (4, 200, 8, 60, '2', 4, '2024-02-01'),
+    (4, 200, 8, 61, '11', 2, '2023-11-01'),
+    (5, 300, 9, 70, None, 2, '2024-03-01'),
+    (5, 300, 9, 71, '4', 4, '2024-04-01'),
+], columns=['id_aluno', 'id_turma', 'id_professor', 'id_avaliacao', 'mes_sondagem', 'ordem_hipotese', 'data_sondagem'],
+    dtype=object)
+
+TURMAS = pd.DataFrame({
+    'id_turma': [100, 200, 300],
+    'cod_inep': ['11', '22', None],
+    'cod_inep_turma': ['t100', 't200', 't300'],
+    'nome_turma': ['1º A', '1º B', '1º C'],
+    'ano_turma': [1, 1, 1],
+    'nome_escola': ['Escola A', 'Escola B', 'Escola C'],
+    'cidade_escola': ['Goiânia', 'Salvador', 'Recife'],
+    'estado_escola': ['GO', 'BA', 'PE'],
+    'id_professor': [7, 8, 9],
+    'total_alunos': [4, 2, 3],
+})
+
+
+def test_preparar_fatos():
+    fatos = preparar_fatos(FATOS)
+    # Mês sem valor vira 0 ("Sem mês"); o ano vem da data
+    assert fatos['mes_sondagem'].tolist() == [3, 4, 3, 5, 3, 2, 11, 0, 4]
+    assert fatos['ano_sondagem'].tolist() == [2024] * 6 + [2023, 2024, 2024]
+    assert fatos['id_aluno'].dtype.kind == 'i'
+
+
+def test_progresso_leva_turma_e_mes_da_primeira_sondagem():
+    alunos = progresso_por_aluno(preparar_fatos(FATOS), NIVEIS)
+    assert alunos.loc[4, ['id_turma', 'ano_sondagem', 'mes_sondagem']].tolist() == [200, 2023, 11]
+    assert alunos.loc[1, ['primeira', 'ultima']].tolist() == [2, 3]
+
+
+def test_melhoria_por_turma():
+    resultado = melhoria_por_turma(preparar_fatos(FATOS), TURMAS, NIVEIS)
+    # A turma 300 não tem código INEP e fica de fora
+    assert resultado['id_turma'].tolist() == [100, 200]
+    assert resultado['alunos_com_melhoria'].tolist() == [1, 1]
+    assert resultado['total_alunos'].tolist() == [4, 2]
+    assert resultado['porcentagem_melhoria'].tolist() == [25.0, 50.0]
+    assert resultado[['ano_sondagem', 'mes_sondagem']].values.tolist() == [[2024, 3], [2023, 11]]
+
+
+def test_total_so_com_hipotese_aplicavel():
+    resultado = melhoria_por_turma(preparar_fatos(FATOS), TURMAS, NIVEIS, **VARIANTES['turmas_melhoria_aplicavel'])
+    # O aluno 3 só teve "Não se aplica" e sai do total da turma 100
+    assert resultado['total_alunos'].tolist() == [2, 1]
+    assert resultado['porcentagem_melhoria'].tolist() == [50.0, 100.0]
+
+
+def test_outra_definicao_de_melhoria():
+    resultado = melhoria_por_turma(preparar_fatos(FATOS), TURMAS, NIVEIS, definicao='alfabetizacao')
+    # Só o aluno 4 chegou à hipótese alfabética
+    assert resultado['id_turma'].tolist() == [200]